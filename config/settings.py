@@ -142,7 +142,7 @@ AUTH_USER_MODEL = 'users.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.AllowAny',
@@ -154,6 +154,12 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
 }
 
+# Кэш пользователей для аутентификации по JWT. False — пользователь загружается из базы данных на каждый запрос.
+AUTH_USER_CACHE = (os.getenv('AUTH_USER_CACHE') or 'True') == 'True'
+AUTH_USER_CACHE_TIMEOUT = 5 * 60
+AUTH_USER_LOCAL_CACHE_TIMEOUT = 30
+AUTH_USER_LOCAL_CACHE_SIZE = 1024
+
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL")
 CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND")
 CELERY_TIMEZONE = TIME_ZONE
@@ -166,12 +172,79 @@ CELERY_BEAT_SCHEDULE = {
         "task": "habits.tasks.send_telegram",
         "schedule": timedelta(minutes=1),
     },
+    "drain_outbox": {
+        "task": "habits.tasks.drain_outbox",
+        "schedule": timedelta(seconds=10),
+    },
+    "maintain_completion_partitions": {
+        "task": "habits.tasks.maintain_completion_partitions",
+        "schedule": timedelta(hours=6),
+    },
+    "purge_outbox": {
+        "task": "habits.tasks.purge_outbox",
+        "schedule": timedelta(hours=1),
+    },
 }
 
 CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
 
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
-TELEGRAM_URL = 'https://api.telegram.org/bot'
+TELEGRAM_URL = os.getenv('TELEGRAM_URL') or 'https://api.telegram.org/bot'
+TELEGRAM_TIMEOUT = float(os.getenv('TELEGRAM_TIMEOUT') or 5)
+TELEGRAM_MAX_WORKERS = int(os.getenv('TELEGRAM_MAX_WORKERS') or 8)
+# Лимиты Telegram Bot API: не больше 30 сообщений в секунду на бота и 1 сообщения в секунду в один чат.
+# TELEGRAM_PER_CHAT_LIMIT ограничивает количество сообщений в один чат за один проход очереди.
+TELEGRAM_GLOBAL_RATE = int(os.getenv('TELEGRAM_GLOBAL_RATE') or 30)
+TELEGRAM_PER_CHAT_LIMIT = int(os.getenv('TELEGRAM_PER_CHAT_LIMIT') or 3)
+
+OUTBOX_BATCH_SIZE = TELEGRAM_GLOBAL_RATE * 10
+
+REMINDER_SHARDS = int(os.getenv('REMINDER_SHARDS') or 4)
+REMINDER_CATCHUP_LIMIT = timedelta(hours=1)
+# "sql" — выборка напоминаний из PostgreSQL, "redis" — из отсортированного множества Redis.
+REMINDER_BACKEND = os.getenv('REMINDER_BACKEND') or 'sql'
+TIMING_WHEEL_REDIS_URL = os.getenv('TIMING_WHEEL_REDIS_URL') or CELERY_BROKER_URL or 'redis://localhost:6379/0'
+TIMING_WHEEL_KEY = 'habits:timing_wheel'
+# Максимальная длина сводки напоминаний; Telegram принимает сообщения не длиннее 4096 символов.
+REMINDER_DIGEST_MAX_LENGTH = int(os.getenv('REMINDER_DIGEST_MAX_LENGTH') or 4096)
+DISPATCH_BATCH_SIZE = 1000
+HABITS_BULK_MAX_ITEMS = 500
+USERS_STREAM_CHUNK_SIZE = 2000
+HABITS_EXPORT_CHUNK_SIZE = 2000
+HABITS_IMPORT_BATCH_SIZE = 5000
+HABITS_IMPORT_MAX_REJECTS = 1000
+# Отметки о выполнении привычек: секции создаются на COMPLETION_PARTITIONS_AHEAD месяцев вперед,
+# секции старше COMPLETION_RETENTION_MONTHS месяцев отсоединяются (0 — хранить все).
+COMPLETION_PARTITIONS_AHEAD = 3
+COMPLETION_RETENTION_MONTHS = int(os.getenv('COMPLETION_RETENTION_MONTHS') or 0)
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_RETRY_BASE = 30
+OUTBOX_RETRY_MAX = 60 * 60
+# Срок, на который захваченные уведомления уходят из очереди на время отправки.
+OUTBOX_CLAIM_TIMEOUT = 5 * 60
+# Отправленные и недоставленные уведомления старше OUTBOX_RETENTION_DAYS дней удаляются из очереди
+# порциями по OUTBOX_PURGE_BATCH_SIZE записей (0 — хранить все).
+OUTBOX_RETENTION_DAYS = int(os.getenv('OUTBOX_RETENTION_DAYS') or 30)
+OUTBOX_PURGE_BATCH_SIZE = 10000
+
+# Кэш ответов (лента опубликованных привычек). Без CACHE_REDIS_URL используется кэш в памяти процесса.
+CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL')
+if CACHE_REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+PUBLISHED_CACHE_TIMEOUT = int(os.getenv('PUBLISHED_CACHE_TIMEOUT') or 5 * 60)
+PUBLISHED_CACHE_LOCK_TIMEOUT = 10
+PUBLISHED_CACHE_LOCK_WAIT = 2
 
 CORS_ALLOWED_ORIGINS = ['http://localhost:8000', ]
 CSRF_TRUSTED_ORIGINS = ['http://localhost:8000', ]
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from habits.models import Habit
+from habits.models import Habit, NotificationOutbox
 
 
 @admin.register(Habit)
@@ -24,3 +24,28 @@ class HabitAdmin(admin.ModelAdmin):
     )
     list_filter = ("owner",)
     search_fields = ("action",)
+
+    def save_model(self, request, obj, form, change):
+        obj.reschedule()
+        super().save_model(request, obj, form, change)
+
+
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    """
+    Пользовательский интерфейс администратора для очереди уведомлений.
+
+    Атрибуты:
+    - list_display: кортеж имен полей для отображения в виде списка.
+    - list_filter: кортеж имен полей, которые будут использоваться в качестве фильтров в представлении списка.
+    - search_fields: кортеж имен полей, которые будут использоваться для поиска в представлении списка.
+    """
+    list_display = (
+        "tg_chat_id",
+        "status",
+        "attempts",
+        "next_attempt_at",
+        "sent_at",
+    )
+    list_filter = ("status",)
+    search_fields = ("tg_chat_id", "idempotency_key")
@@ -0,0 +1,261 @@
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.settings import api_settings
+
+from config import settings
+from habits.models import Habit
+from habits.serializers import HabitBulkSerializer
+from habits.signals import sync_bulk_changes
+from habits.validators import constraint_validation
+
+NOT_FOUND = "Привычка не найдена."
+# Поля привычки, которые проверяют правила HabitSerializer.Meta.validators.
+RULE_FIELDS = ("related_habit", "reward", "pleasant_habit_sign", "duration", "periodicity")
+
+
+def check_batch(items):
+    """
+    Проверяет, что пакет — непустой список не длиннее HABITS_BULK_MAX_ITEMS.
+    """
+
+    if not isinstance(items, list) or not items:
+        raise ValidationError("Ожидается непустой список.")
+    if len(items) > settings.HABITS_BULK_MAX_ITEMS:
+        raise ValidationError(f"Не больше {settings.HABITS_BULK_MAX_ITEMS} элементов за запрос.")
+
+
+def resolve_related_habits(validated, errors, owner_id):
+    """
+    Заменяет ID связанных привычек пакета объектами, загружая их одним запросом.
+
+    Загружаются только привычки владельца пакета: для чужих ID и ID, которых нет в базе данных,
+    в errors добавляется одна и та же ошибка элемента.
+
+    Параметры:
+    validated (list[dict]): проверенные данные элементов.
+    errors (list[dict]): ошибки элементов в порядке пакета.
+    owner_id (int): ID владельца пакета.
+    """
+
+    ids = {data["related_habit"] for data in validated if data.get("related_habit")}
+    related = Habit.objects.filter(owner_id=owner_id).in_bulk(ids) if ids else {}
+    message = PrimaryKeyRelatedField.default_error_messages["does_not_exist"]
+    for index, data in enumerate(validated):
+        pk = data.get("related_habit")
+        if pk:
+            if pk in related:
+                data["related_habit"] = related[pk]
+            else:
+                errors[index].setdefault("related_habit", []).append(message.format(pk_value=pk))
+        elif "related_habit" in data:
+            data["related_habit"] = None
+
+
+def check_rules(validated, errors, instances):
+    """
+    Применяет правила HabitSerializer.Meta.validators к элементам с загруженными связанными привычками.
+
+    Сериализатор элемента проверяет правила, пока связанная привычка — только ID, поэтому признак приятной
+    привычки проверяется здесь. При изменении правила применяются к привычке с учетом изменений;
+    сохраненная связанная привычка остается ID и повторно не проверяется.
+
+    Параметры:
+    validated (list[dict]): проверенные данные элементов.
+    errors (list[dict]): ошибки элементов в порядке пакета.
+    instances (list[Habit]): изменяемые привычки элементов или None для новых привычек.
+    """
+
+    for index, (data, instance) in enumerate(zip(validated, instances)):
+        if errors[index]:
+            continue
+        state = {}
+        if instance is not None:
+            state = {name: getattr(instance, Habit._meta.get_field(name).attname) for name in RULE_FIELDS}
+        state.update(data)
+        for validator in HabitBulkSerializer.Meta.validators:
+            try:
+                validator(state)
+            except ValidationError as exc:
+                errors[index].setdefault(api_settings.NON_FIELD_ERRORS_KEY, []).extend(exc.detail)
+
+
+def validate_items(serializers, owner_id):
+    """
+    Проверяет все элементы пакета и собирает ошибки по каждому элементу.
+
+    Параметры:
+    serializers (list[HabitBulkSerializer]): сериализаторы элементов.
+    owner_id (int): ID владельца пакета.
+
+    Возврат:
+    - list[dict]: проверенные данные элементов.
+
+    Исключения:
+    ValidationError: список ошибок по элементам в порядке пакета ({} для корректных элементов).
+    """
+
+    errors = [{} if serializer.is_valid() else dict(serializer.errors) for serializer in serializers]
+    validated = [dict(serializer.validated_data) for serializer in serializers]
+    resolve_related_habits(validated, errors, owner_id)
+    check_rules(validated, errors, [serializer.instance for serializer in serializers])
+    if any(errors):
+        raise ValidationError(errors)
+    return validated
+
+
+class RollbackProbe(Exception):
+    """
+    Откатывает точку сохранения пробной записи элемента.
+    """
+
+
+def write_batch(habits, write):
+    """
+    Записывает пакет привычек одним запросом.
+
+    Если база данных отклонила пакет, каждая привычка записывается заново в своей точке сохранения,
+    которая затем откатывается, чтобы найти элементы, нарушившие ограничение. Так ошибка ограничения
+    возвращается для вызвавшего ее элемента; если ограничение нарушает только сочетание элементов,
+    возвращается ошибка всего пакета.
+
+    Параметры:
+    habits (list[Habit]): привычки пакета.
+    write (callable): запись списка привычек.
+
+    Возврат:
+    - list[dict]: ошибки привычек в порядке пакета, если пакет отклонен.
+
+    Исключения:
+    ValidationError: ошибка всего пакета, если элементы по отдельности ограничения не нарушают.
+    """
+
+    try:
+        with constraint_validation():
+            write(habits)
+        return []
+    except ValidationError as batch_error:
+        errors = []
+        for habit in habits:
+            try:
+                with constraint_validation():
+                    write([habit])
+                    raise RollbackProbe
+            except RollbackProbe:
+                errors.append({})
+            except ValidationError as exc:
+                errors.append(exc.detail)
+        if not any(errors):
+            raise batch_error
+        return errors
+
+
+def bulk_create_habits(user, items):
+    """
+    Создает пакет привычек пользователя одним INSERT в одной транзакции.
+
+    Связанные привычки загружаются только из привычек пользователя и проверяются правилами сериализатора;
+    нарушение ограничения базы данных возвращается как ошибка вызвавшего его элемента.
+
+    Параметры:
+    user (User): владелец привычек.
+    items (list[dict]): данные привычек.
+
+    Возврат:
+    - list[Habit]: созданные привычки.
+    """
+
+    check_batch(items)
+    validated = validate_items([HabitBulkSerializer(data=item) for item in items], user.id)
+    now = timezone.now()
+    habits = []
+    for data in validated:
+        habit = Habit(**data, owner=user)
+        habit.reschedule(now)
+        habits.append(habit)
+
+    def write(batch):
+        Habit.objects.bulk_create(batch)
+        sync_bulk_changes(batch)
+
+    errors = write_batch(habits, write)
+    if errors:
+        raise ValidationError(errors)
+    return habits
+
+
+def bulk_update_habits(user, items):
+    """
+    Частично обновляет пакет привычек пользователя одним UPDATE в одной транзакции.
+
+    Каждый элемент содержит id привычки и изменяемые поля. Привычки захватываются одним запросом
+    SELECT ... FOR UPDATE; чужие и несуществующие привычки возвращаются как ошибки элементов.
+
+    Параметры:
+    user (User): владелец привычек.
+    items (list[dict]): изменения привычек.
+
+    Возврат:
+    - list[Habit]: обновленные привычки.
+    """
+
+    check_batch(items)
+    if not all(isinstance(item, dict) for item in items):
+        raise ValidationError("Каждый элемент должен быть объектом.")
+    with transaction.atomic():
+        ids = [item.get("id") for item in items]
+        habits = (
+            Habit.objects.select_related("owner").select_for_update(of=("self",))
+            .in_bulk([pk for pk in ids if isinstance(pk, int)])
+        )
+        habits = {pk: habit for pk, habit in habits.items() if habit.owner_id == user.id}
+        missing = [{} if pk in habits else {"id": [NOT_FOUND]} for pk in ids]
+        if any(missing):
+            raise ValidationError(missing)
+
+        validated = validate_items([
+            HabitBulkSerializer(habits[pk], data=item, partial=True) for pk, item in zip(ids, items)
+        ], user.id)
+        now = timezone.now()
+        fields = {"next_fire_at", "updated_at"}
+        for pk, data in zip(ids, validated):
+            habit = habits[pk]
+            for attr, value in data.items():
+                setattr(habit, attr, value)
+            fields.update(data)
+            habit.reschedule(now)
+            habit.updated_at = now
+        updated = [habits[pk] for pk in dict.fromkeys(ids)]
+
+        def write(batch):
+            Habit.objects.bulk_update(batch, sorted(fields))
+            sync_bulk_changes(batch)
+
+        errors = dict(zip(dict.fromkeys(ids), write_batch(updated, write)))
+        if errors:
+            raise ValidationError([errors[pk] for pk in ids])
+    return updated
+
+
+def bulk_delete_habits(user, ids):
+    """
+    Удаляет пакет привычек пользователя в одной транзакции.
+
+    Параметры:
+    user (User): владелец привычек.
+    ids (list[int]): ID привычек.
+
+    Возврат:
+    - int: количество удаленных привычек.
+    """
+
+    check_batch(ids)
+    with transaction.atomic():
+        habits = Habit.objects.filter(owner_id=user.id, pk__in=[pk for pk in ids if isinstance(pk, int)])
+        found = set(habits.values_list("id", flat=True))
+        missing = [{} if pk in found else {"id": [NOT_FOUND]} for pk in ids]
+        if any(missing):
+            raise ValidationError(missing)
+        habits.delete()
+    return len(found)
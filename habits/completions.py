@@ -0,0 +1,138 @@
+from django.db import IntegrityError, transaction
+from django.http import Http404
+from rest_framework.exceptions import ValidationError
+
+from habits import partitions, stats
+from habits.bulk import NOT_FOUND, check_batch
+from habits.models import Habit, HabitCompletion
+from habits.serializers import HabitCompletionBulkSerializer
+from habits.validators import CompletionTimeValidator
+
+# Код ошибки PostgreSQL check_violation: в том числе «no partition of relation found for row».
+CHECK_VIOLATION = "23514"
+
+
+def get_partition_errors(completions):
+    """
+    Проверяет одним запросом к каталогу, что для месяцев отметок есть присоединенные секции.
+
+    Запись отметок не создает секции: создание и присоединение секции блокирует всю таблицу отметок,
+    поэтому секции создает только задача maintain_completion_partitions.
+
+    Параметры:
+    completions (list[HabitCompletion]): новые отметки.
+
+    Возврат:
+    - list[dict]: ошибки каждой отметки; пустой словарь, если секция есть.
+    """
+
+    months = set(partitions.list_partitions().values())
+    errors = []
+    for completion in completions:
+        month = partitions.month_start(completion.completed_at)
+        errors.append({} if month in months else {
+            "completed_at": [CompletionTimeValidator.partition_message.format(month)],
+        })
+    return errors
+
+
+def insert_completions(completions):
+    """
+    Записывает отметки о выполнении одним INSERT.
+
+    Если секцию месяца отметки отсоединили после проверки get_partition_errors, запись отклоняется
+    с ошибками каждой отметки.
+
+    Параметры:
+    completions (list[HabitCompletion]): новые отметки.
+    """
+
+    try:
+        with transaction.atomic():
+            HabitCompletion.objects.bulk_create(completions)
+    except IntegrityError as exc:
+        if getattr(exc.__cause__, "pgcode", None) != CHECK_VIOLATION or exc.__cause__.diag.constraint_name:
+            raise
+        raise ValidationError(get_partition_errors(completions)) from exc
+
+
+def save_completions(completions):
+    """
+    Записывает отметки о выполнении и в той же транзакции обновляет статистику их привычек.
+
+    Параметры:
+    completions (list[HabitCompletion]): новые отметки.
+
+    Возврат:
+    - list[HabitCompletion]: записанные отметки.
+    """
+
+    with transaction.atomic():
+        insert_completions(completions)
+        stats.record_completions(completions)
+    return completions
+
+
+def complete_habit(user, habit_id, data):
+    """
+    Отмечает выполнение привычки пользователя.
+
+    Параметры:
+    user (User): владелец привычки.
+    habit_id (int): ID привычки.
+    data (dict): проверенные данные отметки (completed_at).
+
+    Возврат:
+    - HabitCompletion: записанная отметка.
+
+    Исключения:
+    Http404: привычки нет или она принадлежит другому пользователю.
+    """
+
+    if not Habit.objects.filter(pk=habit_id, owner_id=user.id).exists():
+        raise Http404
+    completion = HabitCompletion(habit_id=habit_id, owner_id=user.id, **data)
+    errors = get_partition_errors([completion])[0]
+    if errors:
+        raise ValidationError(errors)
+    save_completions([completion])
+    return completion
+
+
+def bulk_complete_habits(user, items):
+    """
+    Записывает пакет отметок о выполнении привычек пользователя одним INSERT.
+
+    Все элементы пакета проверяются целиком: привычки пакета — одним запросом, секции месяцев отметок — еще одним.
+    Если хотя бы один элемент некорректен, ничего не записывается.
+
+    Параметры:
+    user (User): владелец привычек.
+    items (list[dict]): отметки: ID привычки (habit) и необязательное время выполнения (completed_at).
+
+    Возврат:
+    - list[HabitCompletion]: записанные отметки.
+    """
+
+    check_batch(items)
+    serializers = [HabitCompletionBulkSerializer(data=item) for item in items]
+    errors = [{} if serializer.is_valid() else dict(serializer.errors) for serializer in serializers]
+    ids = {serializer.validated_data["habit"] for serializer in serializers if "habit" in serializer.validated_data}
+    owned = set(Habit.objects.filter(owner_id=user.id, pk__in=ids).values_list("id", flat=True)) if ids else set()
+    for serializer, item_errors in zip(serializers, errors):
+        habit_id = serializer.validated_data.get("habit")
+        if habit_id is not None and habit_id not in owned:
+            item_errors.setdefault("habit", []).append(NOT_FOUND)
+    if any(errors):
+        raise ValidationError(errors)
+
+    completions = [
+        HabitCompletion(owner_id=user.id, habit_id=data["habit"],
+                        **{key: value for key, value in data.items() if key != "habit"})
+        for data in (serializer.validated_data for serializer in serializers)
+    ]
+    errors = get_partition_errors(completions)
+    if any(errors):
+        raise ValidationError(errors)
+    save_completions(completions)
+    return completions
@@ -0,0 +1,64 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def get_list_validators(request, queryset):
+    """
+    Рассчитывает валидаторы списка привычек одним агрегирующим запросом, без выборки и сериализации строк.
+
+    ETag зависит от пользователя, адреса запроса (курсор, размер страницы), количества привычек
+    и максимального времени их изменения, поэтому меняется при создании, изменении и удалении привычки.
+    Last-Modified для списка не рассчитывается: удаление привычки не меняет максимальное время изменения,
+    и клиент с If-Modified-Since получил бы устаревший ответ 304.
+
+    Параметры:
+    request (Request): текущий запрос.
+    queryset (QuerySet): привычки списка.
+
+    Возврат:
+    - str: ETag.
+    """
+
+    stats = queryset.order_by().aggregate(last_modified=Max("updated_at"), count=Count("id"))
+    source = f"{request.user.pk}:{request.get_full_path()}:{stats['count']}:{stats['last_modified']}"
+    return quote_etag(hashlib.md5(source.encode()).hexdigest())
+
+
+def get_object_validators(habit):
+    """
+    Рассчитывает валидаторы привычки по ее версии — времени последнего изменения с точностью до микросекунды.
+
+    Возврат:
+    - tuple: ETag и время последнего изменения (Unix timestamp).
+    """
+
+    etag = quote_etag(f"{habit.pk}-{int(habit.updated_at.timestamp() * 1_000_000)}")
+    return etag, int(habit.updated_at.timestamp())
+
+
+def evaluate_preconditions(request, etag, last_modified):
+    """
+    Проверяет условные заголовки запроса (If-None-Match, If-Modified-Since, If-Match, If-Unmodified-Since).
+
+    Возврат:
+    - HttpResponse: ответ 304 или 412, если условие сработало, иначе None.
+    """
+
+    return get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+
+def set_validators(response, etag, last_modified):
+    """
+    Добавляет в ответ заголовки ETag и Last-Modified.
+
+    Возврат:
+    - Response: тот же ответ.
+    """
+
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified)
+    return response
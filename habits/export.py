@@ -0,0 +1,70 @@
+from django.db import transaction
+
+from config import settings
+from habits.models import Habit
+from habits.serializers import HabitSerializer, ValuesSerializer
+from users.renderers import CSVRenderer, NDJSONRenderer
+
+RENDERERS = {renderer.format: renderer for renderer in (NDJSONRenderer, CSVRenderer)}
+EXPORT_FORMATS = tuple(RENDERERS)
+
+_values_serializer = None
+
+
+def get_values_serializer():
+    """
+    Возвращает общий для процесса ValuesSerializer для HabitSerializer.
+    """
+
+    global _values_serializer
+    if _values_serializer is None:
+        _values_serializer = ValuesSerializer(HabitSerializer)
+    return _values_serializer
+
+
+def get_export_queryset(owner_id=None, published=False):
+    """
+    Возвращает привычки для выгрузки, упорядоченные по id.
+
+    Параметры:
+    owner_id (int): выгрузить привычки этого пользователя.
+    published (bool): выгрузить все опубликованные привычки.
+    """
+
+    queryset = Habit.objects.order_by("id")
+    if owner_id is not None:
+        queryset = queryset.filter(owner_id=owner_id)
+    if published:
+        queryset = queryset.filter(is_published=True)
+    return queryset
+
+
+def export_habits(queryset, export_format, chunk_size=None):
+    """
+    Выгружает привычки построчно в формате NDJSON или CSV.
+
+    Строки читаются серверным курсором (QuerySet.iterator) порциями по chunk_size и сериализуются
+    ValuesSerializer по одной, поэтому первые строки выдаются до окончания выборки, а память не зависит
+    от количества привычек. Курсор читается в транзакции: в режиме autocommit Django объявляет его WITH HOLD,
+    и PostgreSQL выполняет весь запрос до выдачи первой строки.
+
+    Параметры:
+    queryset (QuerySet): привычки из get_export_queryset().
+    export_format (str): один из EXPORT_FORMATS.
+    chunk_size (int): количество строк, читаемых из курсора за раз. По умолчанию — HABITS_EXPORT_CHUNK_SIZE.
+
+    Возврат:
+    - generator[bytes]: строки выгрузки.
+    """
+
+    values_serializer = get_values_serializer()
+    rows = queryset.values(*values_serializer.value_fields).iterator(
+        chunk_size=chunk_size or settings.HABITS_EXPORT_CHUNK_SIZE
+    )
+    data = values_serializer.iter_representation(rows)
+    renderer = RENDERERS[export_format]
+    with transaction.atomic():
+        if renderer is CSVRenderer:
+            yield from renderer.render_rows(data, header=[name for name, _, _ in values_serializer.columns])
+        else:
+            yield from renderer.render_rows(data)
@@ -0,0 +1,110 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeTelegramHandler(BaseHTTPRequestHandler):
+    """
+    Обработчик запросов sendMessage, имитирующий API Telegram Bot.
+    """
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.handle_send_message(parse_qs(urlparse(self.path).query))
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.handle_send_message(parse_qs(self.rfile.read(length).decode()))
+
+    def handle_send_message(self, params):
+        server = self.server
+        if not urlparse(self.path).path.endswith("/sendMessage"):
+            return self.respond(404, {"ok": False, "error_code": 404, "description": "Not Found"})
+        if server.latency:
+            time.sleep(server.latency)
+        roll = server.random()
+        if roll < server.error_429_rate:
+            server.count("rate_limited")
+            return self.respond(429, {
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {server.retry_after}",
+                "parameters": {"retry_after": server.retry_after},
+            })
+        if roll < server.error_429_rate + server.error_5xx_rate:
+            server.count("errors")
+            return self.respond(502, {"ok": False, "error_code": 502, "description": "Bad Gateway"})
+        server.count("ok")
+        chat_id = (params.get("chat_id") or [""])[0]
+        text = (params.get("text") or [""])[0]
+        return self.respond(200, {"ok": True, "result": {"chat": {"id": chat_id}, "text": text}})
+
+    def respond(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if status == 429:
+            self.send_header("Retry-After", str(self.server.retry_after))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeTelegramServer(ThreadingHTTPServer):
+    """
+    Локальная замена API Telegram Bot для нагрузочного тестирования отправки напоминаний.
+
+    Атрибуты:
+    latency: задержка ответа в секундах.
+    error_429_rate: доля запросов, на которые возвращается 429 с retry_after.
+    retry_after: значение retry_after в ответах 429.
+    error_5xx_rate: доля запросов, на которые возвращается 502.
+    stats: количество ответов по типам.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0), latency=0.0, error_429_rate=0.0, retry_after=1,
+                 error_5xx_rate=0.0, seed=None):
+        super().__init__(address, FakeTelegramHandler)
+        self.latency = latency
+        self.error_429_rate = error_429_rate
+        self.retry_after = retry_after
+        self.error_5xx_rate = error_5xx_rate
+        self.stats = {"ok": 0, "rate_limited": 0, "errors": 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        """
+        Адрес сервера в формате TELEGRAM_URL.
+        """
+
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/bot"
+
+    def random(self):
+        with self._lock:
+            return self._random.random()
+
+    def count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def start(self):
+        """
+        Запускает сервер в фоновом потоке.
+        """
+
+        thread = threading.Thread(target=self.serve_forever, name="fake-telegram", daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,115 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+
+from config import settings
+
+VERSION_KEY = "habits:published:version"
+HITS_KEY = "habits:published:hits"
+MISSES_KEY = "habits:published:misses"
+
+
+def get_version():
+    """
+    Возвращает текущую версию кэша ленты опубликованных привычек.
+    """
+
+    cache.add(VERSION_KEY, 1, timeout=None)
+    return cache.get(VERSION_KEY, 1)
+
+
+def bump_version():
+    """
+    Увеличивает версию кэша ленты: закэшированные страницы прежней версии больше не читаются и истекают по TTL.
+    """
+
+    cache.add(VERSION_KEY, 1, timeout=None)
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 2, timeout=None)
+
+
+def get_page_key(url):
+    """
+    Возвращает ключ страницы ленты для текущей версии кэша.
+
+    Параметры:
+    url (str): полный адрес запроса, включая курсор и размер страницы.
+
+    Возврат:
+    - str: ключ кэша.
+    """
+
+    digest = hashlib.sha1(url.encode()).hexdigest()
+    return f"habits:published:v{get_version()}:{digest}"
+
+
+def _count(key):
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+
+def get_or_build(url, build):
+    """
+    Возвращает страницу ленты из кэша или строит ее и сохраняет в кэш.
+
+    Защита от лавины запросов: страницу строит только запрос, захвативший блокировку (cache.add),
+    остальные ждут ее появления в кэше до PUBLISHED_CACHE_LOCK_WAIT секунд, а затем строят страницу сами,
+    не записывая ее в кэш.
+
+    Параметры:
+    url (str): полный адрес запроса.
+    build (callable): функция, возвращающая данные страницы.
+
+    Возврат:
+    - tuple: данные страницы и признак попадания в кэш.
+    """
+
+    key = get_page_key(url)
+    data = cache.get(key)
+    if data is not None:
+        _count(HITS_KEY)
+        return data, True
+    _count(MISSES_KEY)
+
+    lock_key = f"{key}:lock"
+    if not cache.add(lock_key, 1, timeout=settings.PUBLISHED_CACHE_LOCK_TIMEOUT):
+        deadline = time.monotonic() + settings.PUBLISHED_CACHE_LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            data = cache.get(key)
+            if data is not None:
+                return data, True
+        return build(), False
+    try:
+        data = build()
+        cache.set(key, data, timeout=settings.PUBLISHED_CACHE_TIMEOUT)
+    finally:
+        cache.delete(lock_key)
+    return data, False
+
+
+def get_stats():
+    """
+    Возвращает счетчики попаданий и промахов кэша ленты и его текущую версию.
+    """
+
+    values = cache.get_many([HITS_KEY, MISSES_KEY, VERSION_KEY])
+    return {
+        "hits": values.get(HITS_KEY, 0),
+        "misses": values.get(MISSES_KEY, 0),
+        "version": values.get(VERSION_KEY, 1),
+    }
+
+
+def reset_stats():
+    """
+    Обнуляет счетчики попаданий и промахов кэша ленты.
+    """
+
+    cache.delete_many([HITS_KEY, MISSES_KEY])
@@ -0,0 +1,355 @@
+import csv
+import io
+import json
+import time
+from datetime import datetime, timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import Field, SkipField, empty
+from rest_framework.settings import api_settings
+
+from config import settings
+from habits import feed_cache, timing_wheel
+from habits.models import Habit, get_next_fire_at
+from habits.serializers import HabitSerializer
+from habits.validators import constraint_validation
+from users.models import User
+
+IMPORT_FORMATS = ("csv", "ndjson")
+# Поля привычки, принимаемые из файла; владелец указывается почтой в колонке owner.
+IMPORT_FIELDS = ("place", "time", "action", "pleasant_habit_sign", "periodicity", "reward", "duration", "is_published")
+# Колонки промежуточной таблицы и таблицы привычек, заполняемые импортом.
+COPY_COLUMNS = ("owner_id", *IMPORT_FIELDS, "next_fire_at", "updated_at")
+STAGING_TABLE = "habits_import_staging"
+OWNER_NOT_FOUND = "Пользователь с такой почтой не найден."
+
+
+def parse_rows(stream, import_format):
+    """
+    Читает строки файла импорта по одной, не загружая файл в память.
+
+    Параметры:
+    stream (file): двоичный файл CSV с заголовком или NDJSON.
+    import_format (str): один из IMPORT_FORMATS.
+
+    Возврат:
+    - generator[tuple]: пары (номер строки файла, данные строки). Вместо данных некорректной строки NDJSON —
+      ValidationError.
+    """
+
+    text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    if import_format == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            # Пустая ячейка CSV означает значение по умолчанию.
+            yield reader.line_num, {key: value for key, value in row.items() if value != ""}
+        return
+    for line_num, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            yield line_num, ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [f"Некорректный JSON: {exc}"]})
+            continue
+        if not isinstance(row, dict):
+            row = ValidationError({api_settings.NON_FIELD_ERRORS_KEY: ["Ожидается объект."]})
+        yield line_num, row
+
+
+def to_copy_value(value):
+    """
+    Преобразует значение в текстовый формат COPY PostgreSQL.
+    """
+
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, timedelta):
+        return f"{value.total_seconds()} seconds"
+    if isinstance(value, str):
+        return value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+def get_field_parser(field):
+    """
+    Возвращает функцию разбора значения поля сериализатора.
+
+    Дата со временем с часовым поясом в формате ISO 8601 разбирается datetime.fromisoformat с часовым поясом поля,
+    определенным один раз; остальные значения и ошибки обрабатывает run_validation самого поля DRF.
+    """
+
+    if not isinstance(field, serializers.DateTimeField):
+        return field.run_validation
+    field_timezone = field.timezone if hasattr(field, "timezone") else field.default_timezone()
+    if field_timezone is None:
+        return field.run_validation
+
+    def parse(value):
+        if isinstance(value, str):
+            try:
+                parsed = datetime.fromisoformat(value)
+            except ValueError:
+                parsed = None
+            if parsed is not None and parsed.tzinfo is not None:
+                return parsed.astimezone(field_timezone)
+        return field.run_validation(value)
+
+    return parse
+
+
+class HabitImporter:
+    """
+    Загружает привычки из CSV или NDJSON пакетами через COPY в промежуточную таблицу
+    и один INSERT ... SELECT в таблицу привычек на пакет.
+
+    Файл читается потоком. Поля строк разбираются полями HabitSerializer, затем к пакету применяется каждое
+    правило из HabitSerializer.Meta.validators. Владельцы пакета находятся по почте одним запросом,
+    найденные запоминаются. Каждый пакет записывается в своей транзакции; отклоненные строки
+    не прерывают импорт, а попадают в отчет с номером строки и ошибками.
+    Связанные привычки не импортируются.
+
+    Атрибуты:
+    batch_size: количество строк в одном COPY.
+    parsers: функции разбора значений полей HabitSerializer.
+    validators: правила проверки привычки.
+    owners: почта -> (ID, ID телеграмм чата) найденных пользователей.
+    imported: количество загруженных привычек.
+    rejected: количество отклоненных строк.
+    rejects: первые HABITS_IMPORT_MAX_REJECTS отклоненных строк: номер строки и ошибки.
+    """
+
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size or settings.HABITS_IMPORT_BATCH_SIZE
+        serializer = HabitSerializer()
+        self.parsers = {name: get_field_parser(serializer.fields[name]) for name in IMPORT_FIELDS}
+        self.validators = HabitSerializer.Meta.validators
+        self.owners = {}
+        self.imported = 0
+        self.rejected = 0
+        self.rejects = []
+
+    def run(self, stream, import_format):
+        """
+        Импортирует файл.
+
+        Параметры:
+        stream (file): двоичный файл.
+        import_format (str): один из IMPORT_FORMATS.
+
+        Возврат:
+        - dict: отчет import_report().
+        """
+
+        started = time.perf_counter()
+        batch = []
+        for line_num, row in parse_rows(stream, import_format):
+            batch.append((line_num, row))
+            if len(batch) >= self.batch_size:
+                self.load_batch(batch)
+                batch = []
+        if batch:
+            self.load_batch(batch)
+        return self.import_report(time.perf_counter() - started)
+
+    def import_report(self, elapsed):
+        """
+        Возвращает отчет об импорте: количество загруженных и отклоненных строк, время, строк в секунду
+        и отклоненные строки.
+        """
+
+        return {
+            "imported": self.imported,
+            "rejected": self.rejected,
+            "seconds": round(elapsed, 3),
+            "rows_per_sec": round(self.imported / elapsed, 1) if elapsed else 0,
+            "rejects": sorted(self.rejects, key=lambda reject: reject["line"]),
+        }
+
+    def reject(self, line_num, errors):
+        self.rejected += 1
+        if len(self.rejects) < settings.HABITS_IMPORT_MAX_REJECTS:
+            self.rejects.append({"line": line_num, "errors": errors})
+
+    def parse_row(self, row):
+        """
+        Разбирает значения строки полями сериализатора.
+
+        Возврат:
+        - tuple: (значения полей, ошибки полей).
+        """
+
+        values, errors = {}, {}
+        for name, parse in self.parsers.items():
+            try:
+                values[name] = parse(row.get(name, empty))
+            except SkipField:
+                values[name] = Habit._meta.get_field(name).get_default()
+            except ValidationError as exc:
+                errors[name] = exc.detail
+        if not row.get("owner") or not isinstance(row["owner"], str):
+            errors["owner"] = [Field.default_error_messages["required"]]
+        return values, errors
+
+    def validate_batch(self, batch):
+        """
+        Разбирает строки пакета и применяет к нему правила проверки привычки.
+
+        Параметры:
+        batch (list[tuple]): пары (номер строки, данные строки).
+
+        Возврат:
+        - list[tuple]: пары (номер строки, значения) корректных строк.
+        """
+
+        parsed = []
+        for line_num, row in batch:
+            if isinstance(row, ValidationError):
+                self.reject(line_num, row.detail)
+                continue
+            values, errors = self.parse_row(row)
+            if errors:
+                self.reject(line_num, errors)
+                continue
+            parsed.append((line_num, row["owner"], values))
+
+        for validator in self.validators:
+            valid = []
+            for line_num, email, values in parsed:
+                try:
+                    validator(values)
+                except ValidationError as exc:
+                    self.reject(line_num, {api_settings.NON_FIELD_ERRORS_KEY: exc.detail})
+                else:
+                    valid.append((line_num, email, values))
+            parsed = valid
+
+        self.resolve_owners({email for _, email, _ in parsed})
+        valid = []
+        for line_num, email, values in parsed:
+            if email in self.owners:
+                values["owner_id"], values["tg_chat_id"] = self.owners[email]
+                valid.append((line_num, values))
+            else:
+                self.reject(line_num, {"owner": [OWNER_NOT_FOUND]})
+        return valid
+
+    def resolve_owners(self, emails):
+        """
+        Находит одним запросом пользователей с почтами, которые еще не встречались.
+        """
+
+        missing = [email for email in emails if email not in self.owners]
+        if missing:
+            for email, user_id, tg_chat_id in User.objects.filter(email__in=missing).values_list(
+                    "email", "id", "tg_chat_id"):
+                self.owners[email] = (user_id, tg_chat_id)
+
+    def load_batch(self, batch):
+        """
+        Проверяет пакет и загружает корректные строки: COPY в промежуточную таблицу и INSERT ... SELECT
+        в таблицу привычек в одной транзакции.
+
+        Если база данных отклонила пакет, его строки загружаются по одной в точках сохранения общей транзакции,
+        и в отклоненные попадают только нарушившие ограничение строки с сообщением базы данных.
+        """
+
+        rows = self.validate_batch(batch)
+        if not rows:
+            return
+        now = timezone.now()
+        # Как в Habit.reschedule: напоминание планируется позже текущей минуты.
+        fire_after = now.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        for _, values in rows:
+            values["updated_at"] = now
+            values["next_fire_at"] = (
+                get_next_fire_at(values["time"], values["periodicity"], fire_after) if values["tg_chat_id"] else None
+            )
+
+        try:
+            self.imported += self.copy_rows(rows)
+        except ValidationError as exc:
+            if len(rows) == 1:
+                self.reject(rows[0][0], exc.detail)
+                return
+            with transaction.atomic():
+                for line_num, values in rows:
+                    try:
+                        self.imported += self.copy_rows([(line_num, values)])
+                    except ValidationError as row_exc:
+                        self.reject(line_num, row_exc.detail)
+
+    def copy_rows(self, rows):
+        """
+        Записывает строки в таблицу привычек в точке сохранения: COPY в промежуточную таблицу
+        и INSERT ... SELECT.
+
+        Параметры:
+        rows (list[tuple]): пары (номер строки, значения) с заполненными owner_id, next_fire_at и updated_at.
+
+        Возврат:
+        - int: количество записанных привычек.
+
+        Исключения:
+        - ValidationError: база данных отклонила строки; ни одна из них не записана.
+        """
+
+        buffer = io.StringIO()
+        for _, values in rows:
+            buffer.write("\t".join(to_copy_value(values[column]) for column in COPY_COLUMNS))
+            buffer.write("\n")
+        buffer.seek(0)
+
+        columns = ", ".join(COPY_COLUMNS)
+        with constraint_validation():
+            with connection.cursor() as cursor:
+                cursor.execute(self.get_staging_sql())
+                cursor.cursor.copy_expert(f"COPY {STAGING_TABLE} ({columns}) FROM STDIN", buffer)
+                cursor.execute(
+                    f"INSERT INTO {Habit._meta.db_table} ({columns}) SELECT {columns} FROM {STAGING_TABLE} "
+                    f"RETURNING id, next_fire_at"
+                )
+                schedule = dict(cursor.fetchall())
+                cursor.execute(f"DROP TABLE {STAGING_TABLE}")
+            # То же, что sync_bulk_changes, без создания экземпляров Habit.
+            if timing_wheel.is_enabled():
+                transaction.on_commit(lambda: timing_wheel.get_timing_wheel().sync(schedule))
+            if any(values["is_published"] for _, values in rows):
+                transaction.on_commit(feed_cache.bump_version)
+        return len(schedule)
+
+    @staticmethod
+    def get_staging_sql():
+        """
+        Возвращает SQL временной таблицы для COPY с типами колонок таблицы привычек.
+
+        Таблица удаляется после INSERT ... SELECT, а если пакет не записан — при откате его транзакции.
+        """
+
+        columns = ", ".join(
+            f"{field.column} {field.db_type(connection)}"
+            for field in (Habit._meta.get_field(name) for name in COPY_COLUMNS)
+        )
+        return f"CREATE TEMPORARY TABLE {STAGING_TABLE} ({columns})"
+
+
+def import_habits(stream, import_format, batch_size=None):
+    """
+    Импортирует привычки из файла CSV или NDJSON.
+
+    Параметры:
+    stream (file): двоичный файл.
+    import_format (str): один из IMPORT_FORMATS.
+    batch_size (int): количество строк в одном COPY. По умолчанию — HABITS_IMPORT_BATCH_SIZE.
+
+    Возврат:
+    - dict: количество загруженных (imported) и отклоненных (rejected) строк, время (seconds),
+      строк в секунду (rows_per_sec) и отклоненные строки (rejects).
+    """
+
+    return HabitImporter(batch_size).run(stream, import_format)
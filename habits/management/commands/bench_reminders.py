@@ -0,0 +1,174 @@
+import multiprocessing
+import time
+import tracemalloc
+
+from django.core.management import BaseCommand
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from config import settings
+from habits import outbox, timing_wheel
+from habits.fake_telegram import FakeTelegramServer
+from habits.models import Habit, NotificationOutbox
+from habits.services import configure_delivery_engine
+from habits.tasks import dispatch_due_habits, dispatch_from_wheel
+from habits.timing_wheel import get_timing_wheel
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = ("Нагрузочный тест напоминаний: создает N пользователей и M привычек, выполняет один тик рассылки "
+            "против локального сервера Telegram и выводит время, количество запросов, сообщений в секунду "
+            "и пик памяти.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--habits", type=int, default=1000)
+        parser.add_argument("--latency", type=float, default=0.0, help="Задержка ответа в миллисекундах.")
+        parser.add_argument("--error-429-rate", type=float, default=0.0)
+        parser.add_argument("--retry-after", type=int, default=1)
+        parser.add_argument("--error-5xx-rate", type=float, default=0.0)
+        parser.add_argument("--rate", type=int, default=settings.TELEGRAM_GLOBAL_RATE,
+                            help="Сообщений в секунду (TELEGRAM_GLOBAL_RATE).")
+        parser.add_argument("--per-chat-limit", type=int, default=settings.TELEGRAM_PER_CHAT_LIMIT,
+                            help="Сообщений в один чат за проход (TELEGRAM_PER_CHAT_LIMIT).")
+        parser.add_argument("--workers", type=int, default=settings.TELEGRAM_MAX_WORKERS)
+        parser.add_argument("--shards", type=int, default=1,
+                            help="Количество шардов рассылки, обрабатываемых параллельно, как воркерами Celery.")
+        parser.add_argument("--backend", choices=("sql", "redis"), default=settings.REMINDER_BACKEND,
+                            help="Источник наступивших напоминаний (REMINDER_BACKEND).")
+        parser.add_argument("--digest", action="store_true", help="Включить сводку напоминаний всем пользователям.")
+        parser.add_argument("--telegram-url", help="Адрес уже запущенного сервера вместо встроенного.")
+        parser.add_argument("--drain-timeout", type=float, default=600.0, help="Максимальное время отправки, сек.")
+        parser.add_argument("--keep", action="store_true", help="Не удалять созданные данные.")
+
+    def handle(self, *args, **options):
+        server = None
+        base_url = options["telegram_url"]
+        if not base_url:
+            server = FakeTelegramServer(
+                latency=options["latency"] / 1000,
+                error_429_rate=options["error_429_rate"],
+                retry_after=options["retry_after"],
+                error_5xx_rate=options["error_5xx_rate"],
+            )
+            server.start()
+            base_url = server.url
+        configure_delivery_engine(base_url=base_url, max_workers=options["workers"])
+        settings.TELEGRAM_GLOBAL_RATE = options["rate"]
+        settings.TELEGRAM_PER_CHAT_LIMIT = options["per_chat_limit"]
+        settings.REMINDER_BACKEND = options["backend"]
+
+        now = timezone.now().replace(second=0, microsecond=0)
+        users = self.seed(options["users"], options["habits"], now, options["digest"])
+        try:
+            self.run_tick(now, options["shards"], options["drain_timeout"])
+        finally:
+            if server:
+                self.stdout.write(f"fake telegram: {server.stats}")
+                server.shutdown()
+                server.server_close()
+            if not options["keep"]:
+                self.cleanup(users)
+
+    def seed(self, users_count, habits_count, now, digest=False):
+        """
+        Создает пользователей с чатами и привычки, время напоминания которых равно now.
+        """
+
+        started = time.perf_counter()
+        users = User.objects.bulk_create(
+            User(email=f"bench-{i}@bench.local", username=f"bench-{i}", tg_chat_id=str(10 ** 6 + i), password="!",
+                 reminder_digest=digest)
+            for i in range(users_count)
+        )
+        Habit.objects.bulk_create(
+            (
+                Habit(
+                    owner=users[i % users_count],
+                    action=f"Привычка {i}",
+                    place="Бенчмарк",
+                    time=now,
+                    next_fire_at=now,
+                    reward="Награда",
+                )
+                for i in range(habits_count)
+            ),
+            batch_size=5000,
+        )
+        if timing_wheel.is_enabled():
+            get_timing_wheel().schedule(dict(
+                Habit.objects.filter(owner__in=users).values_list("id", "next_fire_at")
+            ))
+        self.stdout.write(f"seeded {users_count} users, {habits_count} habits in {time.perf_counter() - started:.2f}s")
+        return users
+
+    @staticmethod
+    def dispatch_shard(now, shard, shards):
+        """
+        Обрабатывает один шард в отдельном процессе со своим соединением с БД, как воркер Celery.
+        """
+
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                if timing_wheel.is_enabled():
+                    dispatched = dispatch_from_wheel(now, drain=False)
+                else:
+                    dispatched = dispatch_due_habits(now, shard, shards, drain=False)
+            return dispatched, len(queries)
+        finally:
+            connections.close_all()
+
+    def run_tick(self, now, shards, drain_timeout):
+        """
+        Выполняет тик рассылки и отправляет очередь до конца, собирая метрики.
+        """
+
+        connections.close_all()
+        started = time.perf_counter()
+        with multiprocessing.get_context("fork").Pool(shards) as pool:
+            results = pool.starmap(self.dispatch_shard, [(now, shard, shards) for shard in range(shards)])
+        dispatch_time = time.perf_counter() - started
+        dispatched = sum(result[0] for result in results)
+        dispatch_queries = sum(result[1] for result in results)
+
+        tracemalloc.start()
+        with CaptureQueriesContext(connection) as queries:
+            totals = {"sent": 0, "retry": 0, "failed": 0}
+            drain_started = time.perf_counter()
+            while time.perf_counter() - drain_started < drain_timeout:
+                stats = outbox.drain_outbox()
+                for key in totals:
+                    totals[key] += stats[key]
+                if not any(stats.values()):
+                    next_attempt = (
+                        NotificationOutbox.objects.filter(status=NotificationOutbox.STATUS_PENDING)
+                        .order_by("next_attempt_at").values_list("next_attempt_at", flat=True).first()
+                    )
+                    if next_attempt is None:
+                        break
+                    time.sleep(max(0.0, min((next_attempt - timezone.now()).total_seconds(), 1.0)))
+            drain_time = time.perf_counter() - drain_started
+        _, memory_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        self.stdout.write(f"habits dispatched: {dispatched} in {shards} shards, {settings.REMINDER_BACKEND} backend")
+        self.stdout.write(f"dispatch: {dispatch_time:.3f}s, {dispatch_queries} queries")
+        self.stdout.write(f"drain: {drain_time:.3f}s, {len(queries)} queries")
+        self.stdout.write(f"messages: sent {totals['sent']}, retried {totals['retry']}, failed {totals['failed']}")
+        self.stdout.write(f"messages/sec: {totals['sent'] / drain_time if drain_time else 0:.1f}")
+        self.stdout.write(f"wall time: {dispatch_time + drain_time:.3f}s")
+        self.stdout.write(f"memory peak (drain): {memory_peak / 1024 / 1024:.1f} MiB")
+
+    def cleanup(self, users):
+        """
+        Удаляет созданные бенчмарком данные.
+        """
+
+        chat_ids = [user.tg_chat_id for user in users]
+        if timing_wheel.is_enabled():
+            get_timing_wheel().remove(list(Habit.objects.filter(owner__in=users).values_list("id", flat=True)))
+        NotificationOutbox.objects.filter(tg_chat_id__in=chat_ids).delete()
+        Habit.objects.filter(owner__in=users).delete()
+        User.objects.filter(pk__in=[user.pk for user in users]).delete()
@@ -0,0 +1,59 @@
+import time
+
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from habits.models import Habit
+from habits.serializers import HabitSerializer, ValuesSerializer
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = ("Микробенчмарк сериализации списка привычек: HabitSerializer(many=True) против ValuesSerializer. "
+            "Данные создаются в транзакции, которая откатывается.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000)
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        rows, repeat = options["rows"], options["repeat"]
+        with transaction.atomic():
+            user = User.objects.create(email="bench-serializers@bench.local", username="bench-serializers")
+            now = timezone.now()
+            Habit.objects.bulk_create(
+                Habit(owner=user, action=f"Привычка {i}", place="Бенчмарк", time=now, reward="Награда")
+                for i in range(rows)
+            )
+            habits = Habit.objects.filter(owner=user).order_by("id")
+            values_serializer = ValuesSerializer(HabitSerializer)
+
+            drf = self.measure(lambda: JSONRenderer().render(HabitSerializer(habits.all(), many=True).data), repeat)
+            fast = self.measure(
+                lambda: JSONRenderer().render(
+                    values_serializer.to_representation(habits.values(*values_serializer.value_fields))
+                ),
+                repeat,
+            )
+            transaction.set_rollback(True)
+
+        per_1k = 1000 / rows * 1000
+        self.stdout.write(f"HabitSerializer: {drf * per_1k:.2f} ms / 1k rows (query + serialization + JSON)")
+        self.stdout.write(f"ValuesSerializer: {fast * per_1k:.2f} ms / 1k rows (query + serialization + JSON)")
+        self.stdout.write(f"speed-up: {drf / fast:.1f}x")
+
+    @staticmethod
+    def measure(func, repeat):
+        """
+        Возвращает лучшее время выполнения func за repeat запусков, сек.
+        """
+
+        func()
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - started)
+        return best
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management import BaseCommand, CommandError
+
+from habits import export
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = ("Выгружает привычки в формате NDJSON или CSV: все, привычки одного пользователя или опубликованные. "
+            "Строки читаются серверным курсором, память не зависит от количества привычек.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=export.EXPORT_FORMATS, default="ndjson")
+        parser.add_argument("--owner", help="Почта пользователя, привычки которого выгружаются.")
+        parser.add_argument("--published", action="store_true", help="Выгрузить только опубликованные привычки.")
+        parser.add_argument("--output", help="Файл выгрузки. По умолчанию — стандартный вывод.")
+        parser.add_argument("--chunk-size", type=int, help="Строк, читаемых из курсора за раз.")
+
+    def handle(self, *args, **options):
+        owner_id = None
+        if options["owner"]:
+            owner_id = User.objects.filter(email=options["owner"]).values_list("id", flat=True).first()
+            if owner_id is None:
+                raise CommandError(f"Пользователь {options['owner']} не найден.")
+        queryset = export.get_export_queryset(owner_id=owner_id, published=options["published"])
+
+        started = time.perf_counter()
+        lines = 0
+        output = open(options["output"], "wb") if options["output"] else self.stdout.buffer
+        try:
+            for line in export.export_habits(queryset, options["format"], options["chunk_size"]):
+                output.write(line)
+                lines += 1
+        finally:
+            if options["output"]:
+                output.close()
+        elapsed = time.perf_counter() - started
+        rows = lines - 1 if options["format"] == "csv" else lines
+        self.stderr.write(f"exported {rows} habits in {elapsed:.2f}s")
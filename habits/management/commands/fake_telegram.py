@@ -0,0 +1,32 @@
+from django.core.management import BaseCommand
+
+from habits.fake_telegram import FakeTelegramServer
+
+
+class Command(BaseCommand):
+    help = "Запускает локальную замену API Telegram Bot. Укажите выведенный адрес в TELEGRAM_URL."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8081)
+        parser.add_argument("--latency", type=float, default=0.0, help="Задержка ответа в миллисекундах.")
+        parser.add_argument("--error-429-rate", type=float, default=0.0, help="Доля ответов 429.")
+        parser.add_argument("--retry-after", type=int, default=1, help="retry_after в ответах 429, секунды.")
+        parser.add_argument("--error-5xx-rate", type=float, default=0.0, help="Доля ответов 502.")
+
+    def handle(self, *args, **options):
+        server = FakeTelegramServer(
+            (options["host"], options["port"]),
+            latency=options["latency"] / 1000,
+            error_429_rate=options["error_429_rate"],
+            retry_after=options["retry_after"],
+            error_5xx_rate=options["error_5xx_rate"],
+        )
+        self.stdout.write(f"TELEGRAM_URL={server.url}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(str(server.stats))
@@ -0,0 +1,40 @@
+import json
+from pathlib import Path
+
+from django.core.management import BaseCommand, CommandError
+
+from habits import importer
+
+
+class Command(BaseCommand):
+    help = ("Импортирует привычки из CSV или NDJSON через COPY. Владелец привычки указывается почтой в колонке owner. "
+            "Выводит количество загруженных и отклоненных строк и строк в секунду.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Файл импорта.")
+        parser.add_argument("--format", choices=importer.IMPORT_FORMATS,
+                            help="Формат файла. По умолчанию — по расширению.")
+        parser.add_argument("--batch-size", type=int, help="Строк в одном COPY.")
+        parser.add_argument("--rejects", help="Файл NDJSON для отклоненных строк.")
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        import_format = options["format"] or path.suffix.lstrip(".").lower()
+        if import_format not in importer.IMPORT_FORMATS:
+            raise CommandError(f"Укажите --format: {', '.join(importer.IMPORT_FORMATS)}.")
+        try:
+            stream = path.open("rb")
+        except OSError as exc:
+            raise CommandError(exc)
+        with stream:
+            report = importer.import_habits(stream, import_format, options["batch_size"])
+
+        self.stdout.write(f"imported: {report['imported']}, rejected: {report['rejected']}")
+        self.stdout.write(f"time: {report['seconds']:.3f}s, rows/sec: {report['rows_per_sec']:.1f}")
+        if options["rejects"]:
+            with open(options["rejects"], "w", encoding="utf-8") as output:
+                for reject in report["rejects"]:
+                    output.write(json.dumps(reject, ensure_ascii=False) + "\n")
+        else:
+            for reject in report["rejects"][:10]:
+                self.stdout.write(f"line {reject['line']}: {json.dumps(reject['errors'], ensure_ascii=False)}")
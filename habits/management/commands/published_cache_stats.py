@@ -0,0 +1,19 @@
+from django.core.management import BaseCommand
+
+from habits import feed_cache
+
+
+class Command(BaseCommand):
+    help = "Выводит счетчики попаданий и промахов кэша ленты опубликованных привычек."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="Обнулить счетчики после вывода.")
+
+    def handle(self, *args, **options):
+        stats = feed_cache.get_stats()
+        total = stats["hits"] + stats["misses"]
+        ratio = stats["hits"] / total * 100 if total else 0
+        self.stdout.write(f"hits: {stats['hits']}, misses: {stats['misses']}, hit ratio: {ratio:.1f}%")
+        self.stdout.write(f"version: {stats['version']}")
+        if options["reset"]:
+            feed_cache.reset_stats()
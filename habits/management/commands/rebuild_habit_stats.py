@@ -0,0 +1,31 @@
+import time
+
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from habits import stats
+from habits.models import Habit
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает статистику выполнения привычек по всей истории отметок."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--habit", type=int, nargs="*", help="ID привычек. По умолчанию — все привычки.")
+        parser.add_argument("--chunk-size", type=int, default=1000, help="Привычек, пересчитываемых за раз.")
+
+    def handle(self, *args, **options):
+        habits = Habit.objects.order_by("id")
+        if options["habit"]:
+            habits = habits.filter(pk__in=options["habit"])
+        started = time.perf_counter()
+        rebuilt = 0
+        last_id = 0
+        while True:
+            chunk = list(habits.filter(pk__gt=last_id).values_list("id", flat=True)[:options["chunk_size"]])
+            if not chunk:
+                break
+            with transaction.atomic():
+                rebuilt += stats.rebuild_stats(Habit.objects.filter(pk__in=chunk))
+            last_id = chunk[-1]
+        self.stdout.write(f"rebuilt stats for {rebuilt} habits in {time.perf_counter() - started:.2f}s")
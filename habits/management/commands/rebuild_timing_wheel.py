@@ -0,0 +1,18 @@
+from django.core.management import BaseCommand
+
+from habits.models import Habit
+from habits.timing_wheel import get_timing_wheel
+
+
+class Command(BaseCommand):
+    help = "Пересобирает расписание напоминаний в Redis из next_fire_at привычек в PostgreSQL."
+
+    def handle(self, *args, **options):
+        rows = (
+            Habit.objects.filter(next_fire_at__isnull=False)
+            .exclude(owner__tg_chat_id="")
+            .values_list("id", "next_fire_at")
+            .iterator(chunk_size=10000)
+        )
+        count = get_timing_wheel().rebuild(rows)
+        self.stdout.write(f"Расписание пересобрано: {count} привычек.")
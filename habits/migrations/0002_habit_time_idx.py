@@ -0,0 +1,20 @@
+# Generated by Django 4.2 on 2026-10-18 07:02
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("habits", "0001_initial"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="habit",
+            index=models.Index(fields=["time"], name="habit_time_idx"),
+        ),
+    ]
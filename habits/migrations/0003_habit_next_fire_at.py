@@ -0,0 +1,27 @@
+# Generated by Django 4.2 on 2026-10-18 07:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0002_habit_time_idx"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="habit",
+            name="habit_time_idx",
+        ),
+        migrations.AddField(
+            model_name="habit",
+            name="next_fire_at",
+            field=models.DateTimeField(
+                blank=True,
+                editable=False,
+                null=True,
+                verbose_name="время следующего напоминания (UTC)",
+            ),
+        ),
+    ]
@@ -0,0 +1,58 @@
+from datetime import timedelta
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models, transaction
+from django.utils import timezone
+
+CHUNK_SIZE = 1000
+
+
+def backfill_next_fire_at(apps, schema_editor):
+    """
+    Заполняет next_fire_at для существующих привычек порциями по CHUNK_SIZE строк.
+
+    Каждая порция обновляется в отдельной короткой транзакции, поэтому блокируются только строки текущей порции.
+    """
+
+    Habit = apps.get_model("habits", "Habit")
+    now = timezone.now().replace(second=0, microsecond=0)
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            chunk = list(
+                Habit.objects.filter(id__gt=last_id, next_fire_at__isnull=True, owner__isnull=False)
+                .exclude(owner__tg_chat_id="")
+                .only("id", "time", "periodicity")
+                .order_by("id")[:CHUNK_SIZE]
+            )
+            if not chunk:
+                break
+            for habit in chunk:
+                period = timedelta(days=max(habit.periodicity or 1, 1))
+                fire_at = habit.time.replace(second=0, microsecond=0)
+                if fire_at < now:
+                    fire_at += period * -(-(now - fire_at) // period)
+                habit.next_fire_at = fire_at
+            Habit.objects.bulk_update(chunk, ["next_fire_at"])
+        last_id = chunk[-1].id
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("habits", "0003_habit_next_fire_at"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_next_fire_at, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name="habit",
+            index=models.Index(
+                condition=models.Q(("next_fire_at__isnull", False)),
+                fields=["next_fire_at"],
+                name="habit_next_fire_at_idx",
+            ),
+        ),
+    ]
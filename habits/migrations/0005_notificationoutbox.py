@@ -0,0 +1,107 @@
+# Generated by Django 4.2 on 2026-10-18 07:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0004_backfill_next_fire_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NotificationOutbox",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "tg_chat_id",
+                    models.CharField(max_length=50, verbose_name="ID телеграмм чата"),
+                ),
+                ("text", models.TextField(verbose_name="текст сообщения")),
+                (
+                    "idempotency_key",
+                    models.CharField(
+                        max_length=100, unique=True, verbose_name="ключ идемпотентности"
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "ожидает отправки"),
+                            ("sent", "отправлено"),
+                            ("failed", "не доставлено"),
+                        ],
+                        default="pending",
+                        max_length=10,
+                        verbose_name="статус",
+                    ),
+                ),
+                (
+                    "attempts",
+                    models.PositiveSmallIntegerField(
+                        default=0, verbose_name="количество попыток отправки"
+                    ),
+                ),
+                (
+                    "next_attempt_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        verbose_name="время следующей попытки",
+                    ),
+                ),
+                (
+                    "last_error",
+                    models.TextField(
+                        blank=True, default="", verbose_name="последняя ошибка"
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="дата создания"
+                    ),
+                ),
+                (
+                    "sent_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="дата отправки"
+                    ),
+                ),
+                (
+                    "habit",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="notifications",
+                        to="habits.habit",
+                        verbose_name="привычка",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "уведомление",
+                "verbose_name_plural": "очередь уведомлений",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="notificationoutbox",
+            index=models.Index(
+                condition=models.Q(("status", "pending")),
+                fields=["next_attempt_at"],
+                name="outbox_pending_idx",
+            ),
+        ),
+    ]
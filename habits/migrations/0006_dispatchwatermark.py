@@ -0,0 +1,43 @@
+# Generated by Django 4.2 on 2026-10-18 07:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0005_notificationoutbox"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DispatchWatermark",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(
+                        max_length=50, unique=True, verbose_name="название"
+                    ),
+                ),
+                (
+                    "value",
+                    models.DateTimeField(
+                        verbose_name="время, до которого напоминания обработаны"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "отметка рассылки",
+                "verbose_name_plural": "отметки рассылки",
+            },
+        ),
+    ]
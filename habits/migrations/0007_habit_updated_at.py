@@ -0,0 +1,20 @@
+# Generated by Django 4.2 on 2026-10-18 07:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0006_dispatchwatermark"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="habit",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, verbose_name="время последнего изменения"
+            ),
+        ),
+    ]
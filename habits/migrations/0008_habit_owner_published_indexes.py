@@ -0,0 +1,26 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("habits", "0007_habit_updated_at"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="habit",
+            index=models.Index(fields=["owner", "id"], name="habit_owner_id_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="habit",
+            index=models.Index(
+                condition=models.Q(("is_published", True)),
+                fields=["id"],
+                name="habit_published_id_idx",
+            ),
+        ),
+    ]
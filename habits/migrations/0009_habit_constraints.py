@@ -0,0 +1,158 @@
+# Generated by Django 4.2 on 2026-10-18 07:51
+
+import datetime
+from django.db import migrations, models
+
+CREATE_TRIGGERS = """
+CREATE FUNCTION habits_habit_check_related() RETURNS trigger AS $$
+DECLARE
+    related RECORD;
+BEGIN
+    SELECT pleasant_habit_sign, owner_id INTO related FROM habits_habit WHERE id = NEW.related_habit_id;
+    IF NOT FOUND THEN
+        RETURN NEW;
+    END IF;
+    IF NOT related.pleasant_habit_sign THEN
+        RAISE EXCEPTION 'related habit % is not pleasant', NEW.related_habit_id
+            USING ERRCODE = 'check_violation', CONSTRAINT = 'habit_related_pleasant';
+    END IF;
+    IF related.owner_id IS DISTINCT FROM NEW.owner_id THEN
+        RAISE EXCEPTION 'related habit % belongs to another owner', NEW.related_habit_id
+            USING ERRCODE = 'check_violation', CONSTRAINT = 'habit_related_same_owner';
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER habits_habit_check_related_insert
+    BEFORE INSERT ON habits_habit
+    FOR EACH ROW WHEN (NEW.related_habit_id IS NOT NULL)
+    EXECUTE FUNCTION habits_habit_check_related();
+
+CREATE TRIGGER habits_habit_check_related_update
+    BEFORE UPDATE OF related_habit_id, owner_id ON habits_habit
+    FOR EACH ROW WHEN (
+        NEW.related_habit_id IS NOT NULL
+        AND (OLD.related_habit_id IS DISTINCT FROM NEW.related_habit_id OR OLD.owner_id IS DISTINCT FROM NEW.owner_id)
+    )
+    EXECUTE FUNCTION habits_habit_check_related();
+
+CREATE FUNCTION habits_habit_check_referencing() RETURNS trigger AS $$
+BEGIN
+    IF NOT NEW.pleasant_habit_sign AND EXISTS (SELECT 1 FROM habits_habit WHERE related_habit_id = NEW.id) THEN
+        RAISE EXCEPTION 'habit % is related to other habits and must stay pleasant', NEW.id
+            USING ERRCODE = 'check_violation', CONSTRAINT = 'habit_related_pleasant';
+    END IF;
+    IF EXISTS (
+        SELECT 1 FROM habits_habit WHERE related_habit_id = NEW.id AND owner_id IS DISTINCT FROM NEW.owner_id
+    ) THEN
+        RAISE EXCEPTION 'habit % is related to habits of another owner', NEW.id
+            USING ERRCODE = 'check_violation', CONSTRAINT = 'habit_related_same_owner';
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER habits_habit_check_referencing
+    AFTER UPDATE OF pleasant_habit_sign, owner_id ON habits_habit
+    FOR EACH ROW WHEN (
+        OLD.pleasant_habit_sign IS DISTINCT FROM NEW.pleasant_habit_sign OR OLD.owner_id IS DISTINCT FROM NEW.owner_id
+    )
+    EXECUTE FUNCTION habits_habit_check_referencing();
+"""
+
+# Ограничения добавляются NOT VALID: существующие строки не проверяются, и ACCESS EXCLUSIVE держится только
+# на время изменения каталога. Существующие строки исправляет и проверяет миграция 0012_validate_habit_constraints.
+CHECKS = {
+    "habit_duration_max": "duration <= interval '120 seconds'",
+    "habit_periodicity_min": "periodicity >= 1",
+    "habit_periodicity_max": "periodicity <= 7",
+    "habit_reward_xor_related": "related_habit_id IS NULL OR reward IS NULL OR reward = ''",
+    "habit_pleasant_without_reward": (
+        "NOT pleasant_habit_sign OR (related_habit_id IS NULL AND (reward IS NULL OR reward = ''))"
+    ),
+}
+
+DROP_TRIGGERS = """
+DROP TRIGGER habits_habit_check_referencing ON habits_habit;
+DROP TRIGGER habits_habit_check_related_update ON habits_habit;
+DROP TRIGGER habits_habit_check_related_insert ON habits_habit;
+DROP FUNCTION habits_habit_check_referencing();
+DROP FUNCTION habits_habit_check_related();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0008_habit_owner_published_indexes"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    f"ALTER TABLE habits_habit ADD CONSTRAINT {name} CHECK ({check}) NOT VALID",
+                    f"ALTER TABLE habits_habit DROP CONSTRAINT {name}",
+                )
+                for name, check in CHECKS.items()
+            ],
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name="habit",
+                    constraint=models.CheckConstraint(
+                        check=models.Q(("duration__lte", datetime.timedelta(seconds=120))),
+                        name="habit_duration_max",
+                        violation_error_message="Время выполнения должно быть не больше 0:02:00.",
+                    ),
+                ),
+                migrations.AddConstraint(
+                    model_name="habit",
+                    constraint=models.CheckConstraint(
+                        check=models.Q(("periodicity__gte", 1)),
+                        name="habit_periodicity_min",
+                        violation_error_message="Периодичность должна быть не меньше 1.",
+                    ),
+                ),
+                migrations.AddConstraint(
+                    model_name="habit",
+                    constraint=models.CheckConstraint(
+                        check=models.Q(("periodicity__lte", 7)),
+                        name="habit_periodicity_max",
+                        violation_error_message="Нельзя выполнять привычку реже, чем 1 раз в 7 дней.",
+                    ),
+                ),
+                migrations.AddConstraint(
+                    model_name="habit",
+                    constraint=models.CheckConstraint(
+                        check=models.Q(
+                            ("related_habit__isnull", True),
+                            ("reward__isnull", True),
+                            ("reward", ""),
+                            _connector="OR",
+                        ),
+                        name="habit_reward_xor_related",
+                        violation_error_message="В модели не должно быть заполнено одновременно и поле вознаграждения, и поле связанной привычки. Можно заполнить только одно из двух полей.",
+                    ),
+                ),
+                migrations.AddConstraint(
+                    model_name="habit",
+                    constraint=models.CheckConstraint(
+                        check=models.Q(
+                            ("pleasant_habit_sign", False),
+                            models.Q(
+                                ("related_habit__isnull", True),
+                                models.Q(
+                                    ("reward__isnull", True), ("reward", ""), _connector="OR"
+                                ),
+                            ),
+                            _connector="OR",
+                        ),
+                        name="habit_pleasant_without_reward",
+                        violation_error_message="У приятной привычки не может быть вознаграждения или связанной привычки.",
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunSQL(CREATE_TRIGGERS, DROP_TRIGGERS),
+    ]
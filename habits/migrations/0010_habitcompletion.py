@@ -0,0 +1,83 @@
+# Generated by Django 4.2 on 2026-10-18 08:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+# Таблица секционирована по месяцам (UTC) по completed_at. Первичный ключ секционированной таблицы обязан включать
+# ключ секционирования, поэтому он составной. Секции на прошлый, текущий и три следующих месяца создаются здесь,
+# дальнейшие — задачей maintain_completion_partitions (habits.partitions).
+CREATE_TABLE = """
+CREATE TABLE habits_habitcompletion (
+    id bigint GENERATED BY DEFAULT AS IDENTITY,
+    completed_at timestamp with time zone NOT NULL,
+    habit_id bigint NOT NULL REFERENCES habits_habit (id) DEFERRABLE INITIALLY DEFERRED,
+    owner_id bigint NOT NULL REFERENCES users_user (id) DEFERRABLE INITIALLY DEFERRED,
+    PRIMARY KEY (id, completed_at)
+) PARTITION BY RANGE (completed_at);
+
+CREATE INDEX habit_completion_habit_idx ON habits_habitcompletion (habit_id, completed_at);
+CREATE INDEX habit_completion_owner_idx ON habits_habitcompletion (owner_id, completed_at);
+
+DO $$
+DECLARE
+    month timestamp;
+BEGIN
+    FOR offset_months IN -1..3 LOOP
+        month := date_trunc('month', now() AT TIME ZONE 'UTC') + make_interval(months => offset_months);
+        EXECUTE format(
+            'CREATE TABLE habits_habitcompletion_%s PARTITION OF habits_habitcompletion FOR VALUES FROM (%L) TO (%L)',
+            to_char(month, 'YYYYMM'), month AT TIME ZONE 'UTC', (month + interval '1 month') AT TIME ZONE 'UTC'
+        );
+    END LOOP;
+END;
+$$;
+"""
+
+DROP_TABLE = "DROP TABLE habits_habitcompletion;"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('habits', '0009_habit_constraints'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(CREATE_TABLE, DROP_TABLE),
+            ],
+            state_operations=[
+                migrations.CreateModel(
+                    name='HabitCompletion',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False,
+                                                   verbose_name='ID')),
+                        ('completed_at', models.DateTimeField(default=django.utils.timezone.now,
+                                                              verbose_name='время выполнения')),
+                        ('habit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                                    related_name='completions', to='habits.habit',
+                                                    verbose_name='привычка')),
+                        ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                                    related_name='habit_completions', to=settings.AUTH_USER_MODEL,
+                                                    verbose_name='пользователь')),
+                    ],
+                    options={
+                        'verbose_name': 'выполнение привычки',
+                        'verbose_name_plural': 'выполнения привычек',
+                    },
+                ),
+                migrations.AddIndex(
+                    model_name='habitcompletion',
+                    index=models.Index(fields=['habit', 'completed_at'], name='habit_completion_habit_idx'),
+                ),
+                migrations.AddIndex(
+                    model_name='habitcompletion',
+                    index=models.Index(fields=['owner', 'completed_at'], name='habit_completion_owner_idx'),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 4.2 on 2026-10-18 08:08
+
+from django.conf import settings
+import django.contrib.postgres.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("habits", "0010_habitcompletion"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HabitStats",
+            fields=[
+                (
+                    "habit",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to="habits.habit",
+                        verbose_name="привычка",
+                    ),
+                ),
+                (
+                    "current_streak",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="текущая серия"
+                    ),
+                ),
+                (
+                    "longest_streak",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="самая длинная серия"
+                    ),
+                ),
+                (
+                    "total_completions",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="всего выполнений"
+                    ),
+                ),
+                (
+                    "last_completed_on",
+                    models.DateField(
+                        blank=True, null=True, verbose_name="день последнего выполнения"
+                    ),
+                ),
+                (
+                    "window_end",
+                    models.DateField(
+                        blank=True, null=True, verbose_name="последний день окна"
+                    ),
+                ),
+                (
+                    "day_counts",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.PositiveIntegerField(),
+                        default=list,
+                        size=None,
+                        verbose_name="выполнения по дням окна",
+                    ),
+                ),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="habit_stats",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="пользователь",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "статистика привычки",
+                "verbose_name_plural": "статистика привычек",
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+from django.db import migrations
+
+# Строки, созданные до ограничений 0009 (например, через админку или shell), могут нарушать правила валидаторов.
+# Миграция не исправляет их сама, а останавливается и перечисляет такие привычки: их нужно исправить вручную
+# и повторить миграцию. VALIDATE CONSTRAINT держит SHARE UPDATE EXCLUSIVE и не блокирует чтение и запись
+# таблицы; миграция неатомарная, поэтому каждая проверка фиксируется отдельно и блокировки не накапливаются.
+VIOLATIONS = """
+SELECT id FROM habits_habit
+WHERE NOT (
+    duration <= interval '120 seconds'
+    AND periodicity BETWEEN 1 AND 7
+    AND (related_habit_id IS NULL OR reward IS NULL OR reward = '')
+    AND (NOT pleasant_habit_sign OR (related_habit_id IS NULL AND (reward IS NULL OR reward = '')))
+)
+ORDER BY id
+LIMIT %s
+"""
+MAX_REPORTED = 100
+
+CONSTRAINTS = [
+    "habit_duration_max",
+    "habit_periodicity_min",
+    "habit_periodicity_max",
+    "habit_reward_xor_related",
+    "habit_pleasant_without_reward",
+]
+
+
+def check_violations(apps, schema_editor):
+    """
+    Останавливает миграцию, если есть привычки, нарушающие ограничения 0009.
+    """
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(VIOLATIONS, [MAX_REPORTED])
+        ids = [habit_id for habit_id, in cursor.fetchall()]
+    if ids:
+        raise RuntimeError(
+            f"Привычки нарушают ограничения {', '.join(CONSTRAINTS)} (первые {MAX_REPORTED}): "
+            f"{', '.join(map(str, ids))}. Исправьте их и повторите миграцию."
+        )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("habits", "0011_habitstats"),
+    ]
+
+    operations = [
+        migrations.RunPython(check_violations, migrations.RunPython.noop),
+        *(
+            migrations.RunSQL(f"ALTER TABLE habits_habit VALIDATE CONSTRAINT {name}", migrations.RunSQL.noop)
+            for name in CONSTRAINTS
+        ),
+    ]
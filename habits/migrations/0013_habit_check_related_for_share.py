@@ -0,0 +1,38 @@
+from django.db import migrations
+
+# Триггер из 0009_habit_constraints читал связанную привычку без блокировки: привычку, которая ссылается
+# на приятную привычку, и снятие признака приятной привычки в параллельных транзакциях не видели друг друга,
+# и обе проверки проходили. FOR SHARE конфликтует с блокировкой строки при ее изменении, поэтому запись ссылки
+# и изменение связанной привычки выполняются по очереди, и вторая из них видит результат первой.
+CHECK_RELATED = """
+CREATE OR REPLACE FUNCTION habits_habit_check_related() RETURNS trigger AS $$
+DECLARE
+    related RECORD;
+BEGIN
+    SELECT pleasant_habit_sign, owner_id INTO related FROM habits_habit WHERE id = NEW.related_habit_id{lock};
+    IF NOT FOUND THEN
+        RETURN NEW;
+    END IF;
+    IF NOT related.pleasant_habit_sign THEN
+        RAISE EXCEPTION 'related habit % is not pleasant', NEW.related_habit_id
+            USING ERRCODE = 'check_violation', CONSTRAINT = 'habit_related_pleasant';
+    END IF;
+    IF related.owner_id IS DISTINCT FROM NEW.owner_id THEN
+        RAISE EXCEPTION 'related habit % belongs to another owner', NEW.related_habit_id
+            USING ERRCODE = 'check_violation', CONSTRAINT = 'habit_related_same_owner';
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0012_validate_habit_constraints"),
+    ]
+
+    operations = [
+        migrations.RunSQL(CHECK_RELATED.format(lock=" FOR SHARE"), CHECK_RELATED.format(lock="")),
+    ]
@@ -1,12 +1,37 @@
 from datetime import timedelta
 
+from django.contrib.postgres.fields import ArrayField
 from django.db import models
+from django.utils import timezone
 
 from config import settings
+from habits.validators import DurationValidator, PeriodicityValidator, RelatedHabitValidator, RewardValidator
 
 NULLABLE = {"blank": True, "null": True}
 
 
+def get_next_fire_at(start, periodicity, after):
+    """
+    Возвращает ближайшее время напоминания, не раньше указанного момента.
+
+    Напоминания повторяются от времени старта привычки с шагом в periodicity дней.
+
+    Параметры:
+    start (datetime): время старта привычки.
+    periodicity (int): периодичность в днях.
+    after (datetime): момент, начиная с которого ищется ближайшее напоминание.
+
+    Возврат:
+    - datetime: время ближайшего напоминания с точностью до минуты.
+    """
+
+    period = timedelta(days=max(periodicity or 1, 1))
+    fire_at = start.replace(second=0, microsecond=0)
+    if fire_at < after:
+        fire_at += period * -(-(after - fire_at) // period)
+    return fire_at
+
+
 class Habit(models.Model):
     owner = models.ForeignKey(to=settings.AUTH_USER_MODEL, on_delete=models.CASCADE, verbose_name="создатель привычки",
                               **NULLABLE, )
@@ -23,10 +48,192 @@ class Habit(models.Model):
     duration = models.DurationField(verbose_name="продолжительность выполнения привычки",
                                     default=timedelta(seconds=120))
     is_published = models.BooleanField(verbose_name="признак публичности", default=True)
+    next_fire_at = models.DateTimeField(verbose_name="время следующего напоминания (UTC)", editable=False,
+                                        **NULLABLE)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="время последнего изменения")
 
     def __str__(self):
         return f"{self.owner} будет {self.action} в {self.time} в {self.place}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Запоминает признак публичности, загруженный из базы данных, чтобы после сохранения
+        определить, затронуло ли изменение ленту опубликованных привычек.
+        """
+
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_is_published = instance.__dict__.get("is_published", False)
+        return instance
+
+    @property
+    def affects_published_feed(self):
+        """
+        Возвращает True, если привычка опубликована сейчас или была опубликована при загрузке.
+        """
+
+        return bool(self.is_published or getattr(self, "_loaded_is_published", False))
+
+    def get_next_fire_at(self, after):
+        """
+        Возвращает ближайшее время напоминания, не раньше указанного момента.
+
+        Параметры:
+        after (datetime): момент, начиная с которого ищется ближайшее напоминание.
+
+        Возврат:
+        - datetime: время ближайшего напоминания с точностью до минуты.
+        """
+
+        return get_next_fire_at(self.time, self.periodicity, after)
+
+    def reschedule(self, now=None):
+        """
+        Пересчитывает время следующего напоминания.
+
+        Напоминание планируется только для привычек владельцев, у которых указан ID телеграмм чата,
+        остальные привычки не попадают в частичный индекс планировщика.
+        Напоминание планируется позже текущей минуты: рассылка за текущую минуту могла уже пройти,
+        и напоминание с этим временем не попало бы ни в одно следующее окно рассылки.
+
+        Параметры:
+        now (datetime): текущее время. По умолчанию — timezone.now().
+
+        Возврат: None
+        """
+
+        if self.owner is not None and self.owner.tg_chat_id:
+            now = (now or timezone.now()).replace(second=0, microsecond=0)
+            self.next_fire_at = self.get_next_fire_at(now + timedelta(minutes=1))
+        else:
+            self.next_fire_at = None
+
     class Meta:
         verbose_name = "привычка"
         verbose_name_plural = "привычки"
+        indexes = [
+            models.Index(fields=["next_fire_at"], name="habit_next_fire_at_idx",
+                         condition=models.Q(next_fire_at__isnull=False)),
+            models.Index(fields=["owner", "id"], name="habit_owner_id_idx"),
+            models.Index(fields=["id"], name="habit_published_id_idx", condition=models.Q(is_published=True)),
+        ]
+        # Правила habits.validators на уровне базы данных. То, что связанная привычка приятная и принадлежит
+        # тому же пользователю, проверяют триггеры habits_habit_check_related (миграция 0009).
+        constraints = [
+            models.CheckConstraint(check=models.Q(duration__lte=DurationValidator.max_duration),
+                                   name="habit_duration_max", violation_error_message=DurationValidator.message),
+            models.CheckConstraint(check=models.Q(periodicity__gte=1), name="habit_periodicity_min",
+                                   violation_error_message=PeriodicityValidator.min_message),
+            models.CheckConstraint(check=models.Q(periodicity__lte=7), name="habit_periodicity_max",
+                                   violation_error_message=PeriodicityValidator.message),
+            models.CheckConstraint(
+                check=models.Q(related_habit__isnull=True) | models.Q(reward__isnull=True) | models.Q(reward=""),
+                name="habit_reward_xor_related", violation_error_message=RelatedHabitValidator.message,
+            ),
+            models.CheckConstraint(
+                check=models.Q(pleasant_habit_sign=False) | (
+                    models.Q(related_habit__isnull=True) & (models.Q(reward__isnull=True) | models.Q(reward=""))
+                ),
+                name="habit_pleasant_without_reward", violation_error_message=RewardValidator.message,
+            ),
+        ]
+
+
+class HabitCompletion(models.Model):
+    """
+    Отметка о выполнении привычки.
+
+    Таблица секционирована по месяцам по полю completed_at (PARTITION BY RANGE, миграция 0010),
+    поэтому запись и выборка за период затрагивают только секции нужных месяцев, а старые месяцы
+    отсоединяются от таблицы без удаления строк (habits.partitions). Первичный ключ таблицы — (id, completed_at).
+    """
+
+    habit = models.ForeignKey(Habit, on_delete=models.CASCADE, verbose_name="привычка", related_name="completions")
+    owner = models.ForeignKey(to=settings.AUTH_USER_MODEL, on_delete=models.CASCADE, verbose_name="пользователь",
+                              related_name="habit_completions")
+    completed_at = models.DateTimeField(default=timezone.now, verbose_name="время выполнения")
+
+    def __str__(self):
+        return f"{self.habit_id} выполнена {self.completed_at}"
+
+    class Meta:
+        verbose_name = "выполнение привычки"
+        verbose_name_plural = "выполнения привычек"
+        indexes = [
+            models.Index(fields=["habit", "completed_at"], name="habit_completion_habit_idx"),
+            models.Index(fields=["owner", "completed_at"], name="habit_completion_owner_idx"),
+        ]
+
+
+class HabitStats(models.Model):
+    """
+    Статистика выполнения привычки, обновляемая в той же транзакции, что и запись отметок (habits.stats).
+
+    Серия — дни с отметками, между которыми не больше periodicity дней. day_counts — количество отметок
+    за 30 дней, заканчивающихся window_end (индекс 0 — сам window_end), из которых при чтении
+    считаются отметки за последние 7 и 30 дней.
+    """
+
+    habit = models.OneToOneField(Habit, on_delete=models.CASCADE, primary_key=True, verbose_name="привычка",
+                                 related_name="stats")
+    owner = models.ForeignKey(to=settings.AUTH_USER_MODEL, on_delete=models.CASCADE, verbose_name="пользователь",
+                              related_name="habit_stats")
+    current_streak = models.PositiveIntegerField(default=0, verbose_name="текущая серия")
+    longest_streak = models.PositiveIntegerField(default=0, verbose_name="самая длинная серия")
+    total_completions = models.PositiveIntegerField(default=0, verbose_name="всего выполнений")
+    last_completed_on = models.DateField(verbose_name="день последнего выполнения", **NULLABLE)
+    window_end = models.DateField(verbose_name="последний день окна", **NULLABLE)
+    day_counts = ArrayField(models.PositiveIntegerField(), default=list, verbose_name="выполнения по дням окна")
+
+    def __str__(self):
+        return f"{self.habit_id}: серия {self.current_streak}, всего {self.total_completions}"
+
+    class Meta:
+        verbose_name = "статистика привычки"
+        verbose_name_plural = "статистика привычек"
+
+
+class NotificationOutbox(models.Model):
+    STATUS_PENDING = "pending"
+    STATUS_SENT = "sent"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = (
+        (STATUS_PENDING, "ожидает отправки"),
+        (STATUS_SENT, "отправлено"),
+        (STATUS_FAILED, "не доставлено"),
+    )
+
+    habit = models.ForeignKey(Habit, on_delete=models.SET_NULL, verbose_name="привычка",
+                              related_name="notifications", **NULLABLE)
+    tg_chat_id = models.CharField(max_length=50, verbose_name="ID телеграмм чата")
+    text = models.TextField(verbose_name="текст сообщения")
+    idempotency_key = models.CharField(max_length=100, unique=True, verbose_name="ключ идемпотентности")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING, verbose_name="статус")
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="количество попыток отправки")
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name="время следующей попытки")
+    last_error = models.TextField(blank=True, default="", verbose_name="последняя ошибка")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="дата создания")
+    sent_at = models.DateTimeField(verbose_name="дата отправки", **NULLABLE)
+
+    def __str__(self):
+        return f"{self.tg_chat_id}: {self.text[:50]} ({self.status})"
+
+    class Meta:
+        verbose_name = "уведомление"
+        verbose_name_plural = "очередь уведомлений"
+        indexes = [
+            models.Index(fields=["next_attempt_at"], name="outbox_pending_idx",
+                         condition=models.Q(status="pending")),
+        ]
+
+
+class DispatchWatermark(models.Model):
+    name = models.CharField(max_length=50, unique=True, verbose_name="название")
+    value = models.DateTimeField(verbose_name="время, до которого напоминания обработаны")
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+    class Meta:
+        verbose_name = "отметка рассылки"
+        verbose_name_plural = "отметки рассылки"
@@ -0,0 +1,305 @@
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from config import settings
+from habits.models import NotificationOutbox
+from habits.services import DeliveryStatus, TelegramMessage, get_delivery_engine
+
+# Ключ advisory-блокировки PostgreSQL, которая не дает нескольким воркерам отправлять очередь одновременно.
+DRAIN_LOCK_ID = 7002
+DIGEST_SEPARATOR = "\n\n"
+
+
+def build_notifications(habit, texts):
+    """
+    Формирует записи очереди уведомлений для напоминаний по привычке.
+
+    Ключ идемпотентности включает привычку, время напоминания и номер сообщения,
+    поэтому повторная постановка того же напоминания в очередь не создаст дубликатов.
+
+    Параметры:
+    habit (Habit): привычка с загруженным владельцем и заполненным next_fire_at.
+    texts (list[str]): тексты сообщений.
+
+    Возврат:
+    - list[NotificationOutbox]: несохраненные записи очереди.
+    """
+
+    fire_at = habit.next_fire_at.strftime("%Y%m%dT%H%M")
+    return [
+        NotificationOutbox(
+            habit=habit,
+            tg_chat_id=habit.owner.tg_chat_id,
+            text=text,
+            idempotency_key=f"habit:{habit.pk}:{fire_at}:{index}",
+        )
+        for index, text in enumerate(texts)
+    ]
+
+
+def build_digests(notifications, max_length):
+    """
+    Объединяет уведомления в сводки: по одному сообщению на чат, не длиннее max_length символов.
+
+    Тексты одного чата склеиваются в исходном порядке через пустую строку; если очередной текст
+    не помещается в сводку, начинается следующая. Ключ идемпотентности сводки строится по ключу
+    ее первого уведомления, поэтому повторная постановка того же набора напоминаний не создаст дубликатов.
+
+    Параметры:
+    notifications (list[NotificationOutbox]): несохраненные уведомления.
+    max_length (int): максимальная длина текста сводки.
+
+    Возврат:
+    - list[NotificationOutbox]: несохраненные сводки.
+    """
+
+    by_chat = defaultdict(list)
+    for notification in notifications:
+        by_chat[notification.tg_chat_id].append(notification)
+
+    digests = []
+    for tg_chat_id, chat_notifications in by_chat.items():
+        chunk = []
+        length = 0
+        for notification in chat_notifications:
+            added = len(notification.text) + (len(DIGEST_SEPARATOR) if chunk else 0)
+            if chunk and length + added > max_length:
+                digests.append(_make_digest(tg_chat_id, chunk))
+                chunk, length = [], 0
+                added = len(notification.text)
+            chunk.append(notification)
+            length += added
+        digests.append(_make_digest(tg_chat_id, chunk))
+    return digests
+
+
+def _make_digest(tg_chat_id, notifications):
+    return NotificationOutbox(
+        tg_chat_id=tg_chat_id,
+        text=DIGEST_SEPARATOR.join(notification.text for notification in notifications),
+        idempotency_key=f"digest:{notifications[0].idempotency_key}",
+    )
+
+
+def enqueue_notifications(notifications):
+    """
+    Сохраняет уведомления в очередь одним запросом, пропуская уже поставленные.
+    """
+
+    NotificationOutbox.objects.bulk_create(notifications, ignore_conflicts=True)
+
+
+def get_retry_delay(attempts, retry_after=None):
+    """
+    Возвращает задержку перед следующей попыткой отправки.
+
+    Если Telegram сообщил retry_after, используется он, иначе — экспоненциальная задержка,
+    ограниченная OUTBOX_RETRY_MAX.
+
+    Параметры:
+    attempts (int): количество уже сделанных попыток.
+    retry_after (int): время ожидания из ответа Telegram в секундах.
+
+    Возврат:
+    - timedelta: задержка.
+    """
+
+    if retry_after:
+        return timedelta(seconds=retry_after)
+    return timedelta(seconds=min(settings.OUTBOX_RETRY_BASE * 2 ** max(attempts - 1, 0), settings.OUTBOX_RETRY_MAX))
+
+
+def split_into_waves(notifications, per_chat_limit, rate):
+    """
+    Разбивает уведомления на волны отправки с учетом лимитов Telegram.
+
+    В одну волну попадает не больше rate сообщений и не больше одного сообщения в каждый чат.
+    Сообщения сверх per_chat_limit для одного чата остаются в очереди до следующего прохода.
+
+    Параметры:
+    notifications (list[NotificationOutbox]): уведомления в порядке отправки.
+    per_chat_limit (int): максимальное количество сообщений в один чат за проход.
+    rate (int): максимальное количество сообщений в секунду.
+
+    Возврат:
+    - list[list[NotificationOutbox]]: волны, между началом которых должна пройти секунда.
+    """
+
+    ranks = defaultdict(list)
+    per_chat = defaultdict(int)
+    for notification in notifications:
+        rank = per_chat[notification.tg_chat_id]
+        if rank < per_chat_limit:
+            ranks[rank].append(notification)
+            per_chat[notification.tg_chat_id] += 1
+    return [
+        ranks[rank][start:start + rate]
+        for rank in sorted(ranks)
+        for start in range(0, len(ranks[rank]), rate)
+    ]
+
+
+def apply_result(notification, result, now):
+    """
+    Обновляет запись очереди по результату отправки.
+
+    Возврат:
+    - bool: True, если Telegram ограничил частоту запросов.
+    """
+
+    if result.status == DeliveryStatus.OK:
+        notification.status = NotificationOutbox.STATUS_SENT
+        notification.sent_at = now
+        notification.last_error = ""
+        return False
+    notification.attempts += 1
+    notification.last_error = result.error
+    if result.status == DeliveryStatus.FAILED or notification.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+        notification.status = NotificationOutbox.STATUS_FAILED
+    else:
+        notification.next_attempt_at = now + get_retry_delay(notification.attempts, result.retry_after)
+    return result.retry_after is not None
+
+
+def claim_notifications(batch_size, now):
+    """
+    Захватывает уведомления, срок отправки которых наступил, в короткой транзакции.
+
+    Записи выбираются через SELECT ... FOR UPDATE SKIP LOCKED и разбиваются на волны; записи волн
+    помечаются отправляемыми: время следующей попытки сдвигается на OUTBOX_CLAIM_TIMEOUT.
+    Если воркер упадет во время отправки, записи вернутся в очередь по истечении этого срока.
+
+    Параметры:
+    batch_size (int): максимальное количество записей.
+    now (datetime): текущее время.
+
+    Возврат:
+    - list[list[NotificationOutbox]]: волны отправки.
+    """
+
+    with transaction.atomic():
+        notifications = list(
+            NotificationOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status=NotificationOutbox.STATUS_PENDING, next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "id")[:batch_size]
+        )
+        waves = split_into_waves(notifications, settings.TELEGRAM_PER_CHAT_LIMIT, settings.TELEGRAM_GLOBAL_RATE)
+        NotificationOutbox.objects.filter(pk__in=[n.pk for wave in waves for n in wave]).update(
+            next_attempt_at=now + timedelta(seconds=settings.OUTBOX_CLAIM_TIMEOUT),
+        )
+    return waves
+
+
+def save_results(notifications):
+    """
+    Сохраняет результаты отправки одной волны одним UPDATE в своей транзакции.
+    """
+
+    with transaction.atomic():
+        NotificationOutbox.objects.bulk_update(
+            notifications, ["status", "attempts", "next_attempt_at", "last_error", "sent_at"],
+        )
+
+
+def drain_outbox(batch_size=None):
+    """
+    Отправляет уведомления из очереди, срок отправки которых наступил.
+
+    Одновременно очередь отправляет только один воркер (advisory-блокировка сеанса), иначе
+    шарды рассылки, каждый из которых запускает отправку, вместе превысили бы лимит Telegram на бота.
+    Записи захватываются в короткой транзакции (claim_notifications), отправляются вне транзакции,
+    а результат каждой волны сохраняется сразу в своей транзакции: ошибка в следующей волне
+    не откатывает статусы уже доставленных уведомлений, и они не отправляются повторно.
+    Отправка идет волнами не чаще одной волны в секунду.
+    Если Telegram вернул 429, оставшиеся волны откладываются на retry_after без увеличения счетчика попыток.
+    Захваченные записи волн, до которых отправка не дошла из-за ошибки, сразу возвращаются в очередь.
+
+    Параметры:
+    batch_size (int): максимальное количество записей за проход. По умолчанию — OUTBOX_BATCH_SIZE.
+
+    Возврат:
+    - dict: количество отправленных, отложенных и недоставленных уведомлений.
+    """
+
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    engine = get_delivery_engine()
+    stats = {"sent": 0, "retry": 0, "failed": 0}
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", [DRAIN_LOCK_ID])
+        if not cursor.fetchone()[0]:
+            return stats
+    processed = []
+    waves = []
+    index = 0
+    try:
+        waves = claim_notifications(batch_size, timezone.now())
+        for index, wave in enumerate(waves):
+            started = time.monotonic()
+            results = engine.send_batch([TelegramMessage(n.tg_chat_id, n.text) for n in wave])
+            now = timezone.now()
+            retry_after = None
+            for notification, result in zip(wave, results):
+                if apply_result(notification, result, now):
+                    retry_after = max(retry_after or 0, result.retry_after)
+            if retry_after is not None:
+                for notification in (n for rest in waves[index + 1:] for n in rest):
+                    notification.next_attempt_at = now + timedelta(seconds=retry_after)
+                    wave.append(notification)
+            save_results(wave)
+            processed.extend(wave)
+            if retry_after is not None:
+                break
+            if index + 1 < len(waves):
+                time.sleep(max(0.0, 1 - (time.monotonic() - started)))
+    except Exception:
+        unsent = [n.pk for rest in waves[index + 1:] for n in rest]
+        if unsent:
+            NotificationOutbox.objects.filter(pk__in=unsent).update(next_attempt_at=timezone.now())
+        raise
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", [DRAIN_LOCK_ID])
+    for notification in processed:
+        if notification.status == NotificationOutbox.STATUS_SENT:
+            stats["sent"] += 1
+        elif notification.status == NotificationOutbox.STATUS_FAILED:
+            stats["failed"] += 1
+        else:
+            stats["retry"] += 1
+    return stats
+
+
+def purge_notifications(now, batch_size=None):
+    """
+    Удаляет из очереди отправленные и недоставленные уведомления старше OUTBOX_RETENTION_DAYS дней.
+
+    Записи удаляются порциями по batch_size, каждая порция — отдельным коротким DELETE. Старые записи
+    находятся в начале индекса первичного ключа, поэтому порция выбирается без просмотра всей таблицы.
+    Ожидающие отправки уведомления не удаляются.
+
+    Параметры:
+    now (datetime): текущее время.
+    batch_size (int): количество записей в одном DELETE. По умолчанию — OUTBOX_PURGE_BATCH_SIZE.
+
+    Возврат:
+    - int: количество удаленных уведомлений.
+    """
+
+    if not settings.OUTBOX_RETENTION_DAYS:
+        return 0
+    batch_size = batch_size or settings.OUTBOX_PURGE_BATCH_SIZE
+    expired = (
+        NotificationOutbox.objects.filter(created_at__lt=now - timedelta(days=settings.OUTBOX_RETENTION_DAYS))
+        .exclude(status=NotificationOutbox.STATUS_PENDING)
+        .order_by("id")
+    )
+    deleted = 0
+    while True:
+        count, _ = NotificationOutbox.objects.filter(pk__in=expired.values("pk")[:batch_size]).delete()
+        deleted += count
+        if count < batch_size:
+            return deleted
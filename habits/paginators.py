@@ -1,19 +1,39 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination
 
 
-class HabitPagination(PageNumberPagination):
+class HabitPagination(CursorPagination):
     """
     Пользовательский класс нумерации страниц для конечных точек API, связанных с привычками.
 
-    Этот класс наследуется от класса PageNumberPagination, предоставленного Django REST Framework.
-    Он переопределяет настройки нумерации страниц по умолчанию для настройки поведения API.
+    Этот класс наследуется от класса CursorPagination, предоставленного Django REST Framework.
+    Страницы выбираются по ключу (WHERE id > курсор ORDER BY id LIMIT n) без COUNT(*) и OFFSET,
+    поэтому время получения страницы не зависит от ее глубины. Ссылки next и previous содержат непрозрачный курсор.
 
     Атрибуты:
     page_size: количество элементов, отображаемых на странице. По умолчанию — 5.
-    page_query_param: параметр запроса, используемый для указания номера страницы. По умолчанию — «page_size».
+    page_size_query_param: параметр запроса, используемый для указания размера страницы. По умолчанию — «page_size».
     max_page_size: максимальное количество элементов, разрешенное на странице. По умолчанию — 100.
+    ordering: поле, по которому упорядочиваются привычки и строится курсор. По умолчанию — «id».
     """
 
     page_size = 5
-    page_query_param = "page_size"
+    page_size_query_param = "page_size"
     max_page_size = 100
+    ordering = "id"
+
+
+class CompletionPagination(CursorPagination):
+    """
+    Нумерация страниц отметок о выполнении привычки по ключу, от новых к старым.
+
+    Атрибуты:
+    page_size: количество отметок на странице. По умолчанию — 50.
+    page_size_query_param: параметр запроса, используемый для указания размера страницы.
+    max_page_size: максимальное количество отметок на странице.
+    ordering: поле, по которому упорядочиваются отметки и строится курсор.
+    """
+
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+    ordering = "-completed_at"
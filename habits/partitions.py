@@ -0,0 +1,155 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import connection
+
+from config import settings
+
+# Секционированная таблица отметок о выполнении привычек (миграция 0010).
+TABLE = "habits_habitcompletion"
+
+
+def month_start(moment):
+    """
+    Возвращает начало месяца (UTC), в который попадает момент.
+    """
+
+    moment = moment.astimezone(dt_timezone.utc)
+    return datetime(moment.year, moment.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(month, count):
+    """
+    Возвращает начало месяца, отстоящего от month на count месяцев.
+    """
+
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_name(month):
+    """
+    Возвращает имя секции месяца, например habits_habitcompletion_202610.
+    """
+
+    return f"{TABLE}_{month:%Y%m}"
+
+
+def get_retention_start(now):
+    """
+    Возвращает начало самого старого хранимого месяца или None, если COMPLETION_RETENTION_MONTHS = 0
+    и отметки хранятся без ограничения.
+    """
+
+    if not settings.COMPLETION_RETENTION_MONTHS:
+        return None
+    return add_months(month_start(now), -settings.COMPLETION_RETENTION_MONTHS)
+
+
+def list_partitions():
+    """
+    Возвращает присоединенные к таблице секции.
+
+    Возврат:
+    - dict: имя секции -> начало ее месяца. Секции с именами не по partition_name() не возвращаются.
+    """
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = %s",
+            [TABLE],
+        )
+        names = [name for name, in cursor.fetchall()]
+    partitions = {}
+    for name in names:
+        try:
+            partitions[name] = datetime.strptime(name[len(TABLE) + 1:], "%Y%m").replace(tzinfo=dt_timezone.utc)
+        except ValueError:
+            continue
+    return partitions
+
+
+def ensure_partitions(months):
+    """
+    Создает недостающие секции указанных месяцев.
+
+    Ранее отсоединенная секция месяца присоединяется обратно вместе со своими строками.
+
+    Параметры:
+    months (iterable[datetime]): моменты внутри нужных месяцев.
+
+    Возврат:
+    - list[str]: имена созданных или присоединенных секций.
+    """
+
+    attached = list_partitions()
+    created = []
+    with connection.cursor() as cursor:
+        for month in sorted({month_start(moment) for moment in months}):
+            name = partition_name(month)
+            if name in attached:
+                continue
+            bounds = [month, add_months(month, 1)]
+            cursor.execute("SELECT to_regclass(%s)", [name])
+            if cursor.fetchone()[0]:
+                cursor.execute(f"ALTER TABLE {TABLE} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)", bounds)
+            else:
+                cursor.execute(f"CREATE TABLE {name} PARTITION OF {TABLE} FOR VALUES FROM (%s) TO (%s)", bounds)
+            created.append(name)
+    return created
+
+
+def ensure_future_partitions(now, ahead=None):
+    """
+    Создает секции текущего и следующих ahead месяцев.
+
+    Параметры:
+    now (datetime): текущее время.
+    ahead (int): количество месяцев вперед. По умолчанию — COMPLETION_PARTITIONS_AHEAD.
+    """
+
+    ahead = settings.COMPLETION_PARTITIONS_AHEAD if ahead is None else ahead
+    current = month_start(now)
+    return ensure_partitions(add_months(current, offset) for offset in range(ahead + 1))
+
+
+def detach_partitions(before):
+    """
+    Отсоединяет от таблицы секции месяцев, закончившихся не позже before.
+
+    Отсоединение меняет только метаданные и не переписывает строки: секция остается отдельной таблицей,
+    которую можно выгрузить или удалить. Вне транзакции используется DETACH PARTITION ... CONCURRENTLY,
+    не блокирующий запись и чтение таблицы.
+
+    Каскадное удаление Django не видит строк отсоединенных секций, поэтому внешние ключи отсоединенной секции
+    на привычки и пользователей удаляются: иначе они запрещали бы удаление привычек и пользователей
+    с отметками в архивных месяцах.
+
+    Параметры:
+    before (datetime): граница; отсоединяются месяцы, целиком лежащие раньше нее.
+
+    Возврат:
+    - list[str]: имена отсоединенных секций.
+    """
+
+    concurrently = " CONCURRENTLY" if not connection.in_atomic_block else ""
+    detached = []
+    with connection.cursor() as cursor:
+        for name, month in sorted(list_partitions().items(), key=lambda item: item[1]):
+            if add_months(month, 1) <= before:
+                cursor.execute(f"ALTER TABLE {TABLE} DETACH PARTITION {name}{concurrently}")
+                drop_foreign_keys(cursor, name)
+                detached.append(name)
+    return detached
+
+
+def drop_foreign_keys(cursor, name):
+    """
+    Удаляет внешние ключи таблицы name.
+    """
+
+    cursor.execute("SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'", [name])
+    for constraint, in cursor.fetchall():
+        cursor.execute(f'ALTER TABLE {name} DROP CONSTRAINT "{constraint}"')
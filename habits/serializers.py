@@ -1,8 +1,13 @@
-from rest_framework import serializers
+from datetime import timedelta
 
-from habits.models import Habit
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+from habits.models import Habit, HabitCompletion
 from habits.validators import (RelatedHabitValidator, DurationValidator, PleasantHabitValidator, RewardValidator,
-                               PeriodicityValidator)
+                               PeriodicityValidator, CompletionTimeValidator, constraint_validation)
 from users.serializers import UserSerializer
 
 
@@ -11,7 +16,8 @@ class HabitSerializer(serializers.ModelSerializer):
     Сериализатор для модели Habit.
     Этот сериализатор используется для преобразования экземпляров модели Habit в формат, который можно легко передавать
     и сохранять.
-    Он включает поля для всех атрибутов модели привычки, а также вложенное представление связанного пользователя.
+    Он включает поля для всех атрибутов модели привычки, кроме служебных полей next_fire_at и updated_at,
+    а также вложенное представление связанного пользователя.
     Класс также включает список валидаторов для обеспечения соблюдения определенных правил,
     связанных с моделью привычки.
     """
@@ -25,7 +31,7 @@ class HabitSerializer(serializers.ModelSerializer):
         """
 
         model = Habit
-        fields = "__all__"
+        exclude = ("next_fire_at", "updated_at")
         validators = [
             RelatedHabitValidator("related_habit", "reward"),
             DurationValidator("duration"),
@@ -33,3 +39,203 @@ class HabitSerializer(serializers.ModelSerializer):
             RewardValidator("reward", "related_habit", "pleasant_habit_sign"),
             PeriodicityValidator("periodicity"),
         ]
+
+    def create(self, validated_data):
+        """
+        Создает привычку и рассчитывает время ее первого напоминания.
+        """
+
+        habit = Habit(**validated_data)
+        habit.reschedule()
+        with constraint_validation():
+            habit.save()
+        return habit
+
+    def update(self, instance, validated_data):
+        """
+        Обновляет привычку и пересчитывает время ее следующего напоминания.
+        """
+
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.reschedule()
+        with constraint_validation():
+            instance.save()
+        return instance
+
+
+class HabitBulkSerializer(HabitSerializer):
+    """
+    Сериализатор одной привычки в пакетных операциях.
+
+    Проверяет данные той же цепочкой валидаторов, что и HabitSerializer, но связанная привычка принимается как ID:
+    все связанные привычки пакета загружаются одним запросом после проверки, а не запросом на каждую привычку.
+    Владельцем всегда становится текущий пользователь.
+    """
+
+    related_habit = serializers.IntegerField(required=False, allow_null=True)
+
+    class Meta(HabitSerializer.Meta):
+        read_only_fields = ("owner",)
+
+
+class HabitCompletionSerializer(serializers.ModelSerializer):
+    """
+    Сериализатор отметки о выполнении привычки. Время выполнения по умолчанию — текущее.
+    """
+
+    class Meta:
+        model = HabitCompletion
+        fields = ("id", "habit", "completed_at")
+        read_only_fields = ("habit",)
+        extra_kwargs = {"completed_at": {"validators": [CompletionTimeValidator()]}}
+
+
+class HabitCompletionBulkSerializer(HabitCompletionSerializer):
+    """
+    Сериализатор одной отметки в пакетной записи: привычка принимается как ID, все привычки пакета
+    проверяются одним запросом.
+    """
+
+    habit = serializers.IntegerField()
+
+    class Meta(HabitCompletionSerializer.Meta):
+        read_only_fields = ()
+
+
+class CompletionRangeSerializer(serializers.Serializer):
+    """
+    Период выборки отметок о выполнении: полуинтервал [since, until), по умолчанию — последние 30 дней.
+    """
+
+    since = serializers.DateTimeField(required=False)
+    until = serializers.DateTimeField(required=False)
+
+    def validate(self, attrs):
+        attrs.setdefault("until", timezone.now())
+        attrs.setdefault("since", attrs["until"] - timedelta(days=30))
+        return attrs
+
+
+class ValuesSerializer:
+    """
+    Быстрая сериализация списков только для чтения из строк QuerySet.values().
+
+    Поля сериализатора разбираются один раз, а на каждый вызов для поля заранее выбирается преобразователь значения:
+    без преобразования для целых, логических, строковых полей и первичных ключей связей,
+    форматирование ISO 8601 с часовым поясом, определенным один раз на вызов, для дат со временем,
+    иначе to_representation самого поля DRF. Поэтому результат совпадает с выводом исходного сериализатора,
+    но без создания экземпляров модели и обхода полей через to_representation сериализатора для каждой строки.
+
+    Поддерживаются только поля, отображающие колонки модели. Поля, атрибута которых у модели нет,
+    пропускаются так же, как их пропускает DRF.
+
+    Атрибуты:
+    columns: список (ключ в ответе, колонка в values(), поле сериализатора).
+    """
+
+    IDENTITY_FIELDS = (
+        serializers.IntegerField,
+        serializers.BooleanField,
+        serializers.CharField,
+        serializers.PrimaryKeyRelatedField,
+    )
+
+    def __init__(self, serializer_class):
+        serializer = serializer_class()
+        model = serializer.Meta.model
+        model_fields = {field.name for field in model._meta.concrete_fields}
+        self.columns = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if field.source not in model_fields:
+                if hasattr(model, field.source):
+                    raise ImproperlyConfigured(
+                        f"Поле {name} сериализатора {serializer_class.__name__} не отображает колонку модели."
+                    )
+                continue
+            self.columns.append((name, field.source, field))
+
+    @property
+    def value_fields(self):
+        """
+        Возвращает колонки для QuerySet.values().
+        """
+
+        return [source for _, source, _ in self.columns]
+
+    def get_converter(self, field):
+        """
+        Возвращает преобразователь значения колонки для поля сериализатора или None, если он не нужен.
+        """
+
+        if isinstance(field, self.IDENTITY_FIELDS):
+            return None
+        if isinstance(field, serializers.DateTimeField):
+            return get_datetime_converter(field)
+        return field.to_representation
+
+    def to_representation(self, rows):
+        """
+        Преобразует строки values() в данные ответа.
+
+        Параметры:
+        rows (iterable[dict]): строки QuerySet.values(value_fields).
+
+        Возврат:
+        - list[dict]: данные в формате исходного сериализатора.
+        """
+
+        return list(self.iter_representation(rows))
+
+    def iter_representation(self, rows):
+        """
+        Преобразует строки values() в данные ответа по одной, не собирая их в список.
+
+        Используется для потоковой выдачи вместе с QuerySet.iterator().
+
+        Параметры:
+        rows (iterable[dict]): строки QuerySet.values(value_fields).
+
+        Возврат:
+        - generator[dict]: данные в формате исходного сериализатора.
+        """
+
+        columns = [(name, source, self.get_converter(field)) for name, source, field in self.columns]
+        return (
+            {
+                name: value if converter is None or value is None else converter(value)
+                for name, source, converter in columns
+                for value in (row[source],)
+            }
+            for row in rows
+        )
+
+
+def get_datetime_converter(field):
+    """
+    Возвращает преобразователь даты со временем, повторяющий DateTimeField.to_representation
+    для формата ISO 8601, но с часовым поясом поля, определенным один раз.
+
+    Параметры:
+    field (DateTimeField): поле сериализатора.
+
+    Возврат:
+    - callable: преобразователь значения.
+    """
+
+    output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() != ISO_8601:
+        return field.to_representation
+    field_timezone = field.timezone if hasattr(field, "timezone") else field.default_timezone()
+    if field_timezone is None:
+        return field.to_representation
+
+    def convert(value):
+        if value.tzinfo is None:
+            return field.to_representation(value)
+        value = value.astimezone(field_timezone).isoformat()
+        return value[:-6] + "Z" if value.endswith("+00:00") else value
+
+    return convert
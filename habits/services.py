@@ -1,6 +1,197 @@
+import math
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import NamedTuple, Optional
+
 import requests
+from requests.adapters import HTTPAdapter
+
+from config.settings import TELEGRAM_URL, TELEGRAM_TOKEN, TELEGRAM_TIMEOUT, TELEGRAM_MAX_WORKERS
+
+
+class DeliveryStatus:
+    """
+    Возможные результаты отправки сообщения в Telegram.
+
+    Атрибуты:
+    OK: сообщение доставлено.
+    RETRY: временная ошибка (таймаут, 429, 5xx), отправку можно повторить.
+    FAILED: постоянная ошибка, повторная отправка не поможет.
+    """
+
+    OK = "ok"
+    RETRY = "retry"
+    FAILED = "failed"
+
+
+class TelegramMessage(NamedTuple):
+    """
+    Сообщение для отправки в чат Telegram.
+    """
+
+    tg_chat_id: str
+    text: str
+
+
+class DeliveryResult(NamedTuple):
+    """
+    Результат отправки одного сообщения.
+
+    Атрибуты:
+    message: отправленное сообщение.
+    status: один из статусов DeliveryStatus.
+    retry_after: через сколько секунд можно повторить отправку, если Telegram его сообщил.
+    error: описание ошибки.
+    """
+
+    message: TelegramMessage
+    status: str
+    retry_after: Optional[int] = None
+    error: str = ""
+
+
+class TelegramDeliveryEngine:
+    """
+    Отправляет сообщения через API Telegram Bot, переиспользуя HTTP-соединения.
+
+    Сообщения пакета отправляются параллельно пулом потоков ограниченного размера,
+    каждый запрос ограничен таймаутом.
+
+    Атрибуты:
+    timeout: таймаут одного запроса в секундах.
+    max_workers: максимальное количество одновременных запросов.
+    base_url: адрес API Telegram Bot. По умолчанию — TELEGRAM_URL.
+    """
+
+    def __init__(self, timeout=TELEGRAM_TIMEOUT, max_workers=TELEGRAM_MAX_WORKERS, base_url=TELEGRAM_URL):
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.url = f"{base_url}{TELEGRAM_TOKEN}/sendMessage"
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="telegram")
+
+    def send(self, message):
+        """
+        Отправляет одно сообщение.
+
+        Параметры:
+        message (TelegramMessage): сообщение для отправки.
+
+        Возврат:
+        - DeliveryResult: результат отправки.
+        """
+
+        try:
+            response = self.session.post(
+                self.url, data={"chat_id": message.tg_chat_id, "text": message.text}, timeout=self.timeout,
+            )
+        except (requests.Timeout, requests.ConnectionError) as exc:
+            return DeliveryResult(message, DeliveryStatus.RETRY, error=str(exc))
+        except requests.RequestException as exc:
+            return DeliveryResult(message, DeliveryStatus.FAILED, error=str(exc))
+
+        if response.status_code == 200:
+            return DeliveryResult(message, DeliveryStatus.OK)
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = {}
+        error = payload.get("description") or response.reason or ""
+        if response.status_code == 429:
+            retry_after = (payload.get("parameters") or {}).get("retry_after") or response.headers.get("Retry-After")
+            retry_after = parse_retry_after(retry_after)
+            return DeliveryResult(message, DeliveryStatus.RETRY, retry_after=retry_after, error=error)
+        if response.status_code >= 500:
+            return DeliveryResult(message, DeliveryStatus.RETRY, error=error)
+        return DeliveryResult(message, DeliveryStatus.FAILED, error=error)
 
-from config.settings import TELEGRAM_URL, TELEGRAM_TOKEN
+    def send_batch(self, messages):
+        """
+        Отправляет пакет сообщений параллельно.
+
+        Параметры:
+        messages (list[TelegramMessage]): сообщения для отправки.
+
+        Возврат:
+        - list[DeliveryResult]: результаты в порядке исходных сообщений.
+        """
+
+        return list(self.executor.map(self.send, messages))
+
+    def close(self):
+        """
+        Останавливает пул потоков, дождавшись текущих отправок, и закрывает HTTP-соединения.
+        """
+
+        self.executor.shutdown()
+        self.session.close()
+
+
+def parse_retry_after(value):
+    """
+    Возвращает время ожидания в секундах из поля retry_after ответа Telegram или заголовка Retry-After.
+
+    Заголовок Retry-After по RFC 9110 содержит число секунд или дату HTTP. Некорректное значение
+    не прерывает отправку: возвращается None, и очередь использует свою задержку.
+
+    Параметры:
+    value (int | str): значение retry_after или заголовка Retry-After.
+
+    Возврат:
+    - int: время ожидания в секундах или None.
+    """
+
+    if value is None or value == "":
+        return None
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        pass
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return max(math.ceil((moment - datetime.now(timezone.utc)).total_seconds()), 0)
+
+
+_engine = None
+
+
+def get_delivery_engine():
+    """
+    Возвращает общий для процесса экземпляр TelegramDeliveryEngine.
+
+    Экземпляр создается при первом обращении, поэтому пул соединений открывается уже в процессе воркера.
+    """
+
+    global _engine
+    if _engine is None:
+        _engine = TelegramDeliveryEngine()
+    return _engine
+
+
+def configure_delivery_engine(**kwargs):
+    """
+    Заменяет общий для процесса экземпляр TelegramDeliveryEngine новым с указанными параметрами.
+
+    Используется, например, бенчмарком, чтобы направить отправку на локальный сервер.
+    Пул потоков и HTTP-соединения прежнего экземпляра закрываются.
+
+    Возврат:
+    - TelegramDeliveryEngine: новый экземпляр.
+    """
+
+    global _engine
+    if _engine is not None:
+        _engine.close()
+    _engine = TelegramDeliveryEngine(**kwargs)
+    return _engine
 
 
 def send_telegram_message(tg_chat_id, message):
@@ -11,10 +202,8 @@ def send_telegram_message(tg_chat_id, message):
     tg_chat_id (int): уникальный идентификатор целевого чата.
     message (str): Текст сообщения, которое будет отправлено.
 
-    Возврат: None
+    Возврат:
+    - DeliveryResult: результат отправки.
     """
-    params = {
-        "text": message,
-        "chat_id": tg_chat_id,
-    }
-    requests.get(f"{TELEGRAM_URL}{TELEGRAM_TOKEN}/sendMessage", params=params)
+
+    return get_delivery_engine().send(TelegramMessage(tg_chat_id, message))
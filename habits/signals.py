@@ -0,0 +1,92 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from habits import feed_cache, timing_wheel
+from habits.models import Habit
+from users.models import User
+
+
+@receiver(post_save, sender=User)
+def reschedule_owner_habits(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Синхронизирует расписание привычек пользователя с наличием у него ID телеграмм чата.
+
+    Если чат удален, привычки убираются из планировщика одним UPDATE.
+    Если чат появился, для незапланированных привычек рассчитывается время следующего напоминания.
+    """
+
+    if created or (update_fields is not None and "tg_chat_id" not in update_fields):
+        return
+    habits = Habit.objects.filter(owner=instance)
+    if not instance.tg_chat_id:
+        if timing_wheel.is_enabled():
+            habit_ids = list(habits.filter(next_fire_at__isnull=False).values_list("id", flat=True))
+            transaction.on_commit(lambda: timing_wheel.get_timing_wheel().remove(habit_ids))
+        habits.filter(next_fire_at__isnull=False).update(next_fire_at=None)
+        return
+    now = timezone.now()
+    unscheduled = list(habits.filter(next_fire_at__isnull=True))
+    for habit in unscheduled:
+        habit.owner = instance
+        habit.reschedule(now)
+    Habit.objects.bulk_update(unscheduled, ["next_fire_at"])
+    if timing_wheel.is_enabled():
+        schedule = {habit.pk: habit.next_fire_at for habit in unscheduled}
+        transaction.on_commit(lambda: timing_wheel.get_timing_wheel().schedule(schedule))
+
+
+@receiver(post_save, sender=Habit)
+def sync_habit_schedule(sender, instance, update_fields=None, **kwargs):
+    """
+    Обновляет время напоминания привычки в расписании Redis после фиксации транзакции.
+    """
+
+    if not timing_wheel.is_enabled() or (update_fields is not None and "next_fire_at" not in update_fields):
+        return
+    schedule = {instance.pk: instance.next_fire_at}
+    transaction.on_commit(lambda: timing_wheel.get_timing_wheel().sync(schedule))
+
+
+@receiver(post_delete, sender=Habit)
+def remove_habit_schedule(sender, instance, **kwargs):
+    """
+    Удаляет напоминание удаленной привычки из расписания Redis.
+    """
+
+    if timing_wheel.is_enabled():
+        habit_id = instance.pk
+        transaction.on_commit(lambda: timing_wheel.get_timing_wheel().remove([habit_id]))
+
+
+@receiver(post_save, sender=Habit)
+@receiver(post_delete, sender=Habit)
+def invalidate_published_feed(sender, instance, update_fields=None, **kwargs):
+    """
+    Сбрасывает кэш ленты опубликованных привычек после фиксации транзакции,
+    если изменение затронуло опубликованную привычку.
+
+    Сохранение только времени следующего напоминания ленту не меняет.
+    """
+
+    if update_fields is not None and set(update_fields) <= {"next_fire_at"}:
+        return
+    if instance.affects_published_feed:
+        transaction.on_commit(feed_cache.bump_version)
+    instance._loaded_is_published = instance.is_published
+
+
+def sync_bulk_changes(habits):
+    """
+    Выполняет для привычек, сохраненных через bulk_create или bulk_update, то же, что сигналы post_save:
+    синхронизирует расписание Redis и сбрасывает кэш ленты после фиксации транзакции.
+    """
+
+    if timing_wheel.is_enabled():
+        schedule = {habit.pk: habit.next_fire_at for habit in habits}
+        transaction.on_commit(lambda: timing_wheel.get_timing_wheel().sync(schedule))
+    if any(habit.affects_published_feed for habit in habits):
+        transaction.on_commit(feed_cache.bump_version)
+    for habit in habits:
+        habit._loaded_is_published = habit.is_published
@@ -0,0 +1,205 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from habits.models import Habit, HabitCompletion, HabitStats
+
+WINDOW_DAYS = 30
+UPDATE_FIELDS = ["current_streak", "longest_streak", "total_completions", "last_completed_on", "window_end",
+                 "day_counts"]
+
+
+def get_period(periodicity):
+    """
+    Возвращает допустимый разрыв серии в днях: как и напоминания, выполнения повторяются раз в periodicity дней.
+    """
+
+    return max(periodicity or 1, 1)
+
+
+def add_days(stats, days, period):
+    """
+    Учитывает в статистике дни с отметками.
+
+    Параметры:
+    stats (HabitStats): статистика привычки.
+    days (list[tuple]): пары (день, количество отметок), по возрастанию дней.
+    period (int): допустимый разрыв серии в днях.
+
+    Возврат:
+    - bool: False, если встретился день раньше последнего учтенного: серию нужно пересчитать по истории.
+    """
+
+    counts = (list(stats.day_counts) + [0] * WINDOW_DAYS)[:WINDOW_DAYS]
+    in_order = True
+    for day, count in days:
+        stats.total_completions += count
+
+        if stats.window_end is None or day > stats.window_end:
+            shift = WINDOW_DAYS if stats.window_end is None else min((day - stats.window_end).days, WINDOW_DAYS)
+            counts = ([0] * shift + counts)[:WINDOW_DAYS]
+            stats.window_end = day
+        offset = (stats.window_end - day).days
+        if offset < WINDOW_DAYS:
+            counts[offset] += count
+
+        last = stats.last_completed_on
+        if last is None or (day - last).days > period:
+            stats.current_streak = 1
+        elif day > last:
+            stats.current_streak += 1
+        elif day < last:
+            in_order = False
+            continue
+        stats.last_completed_on = max(day, last) if last else day
+        stats.longest_streak = max(stats.longest_streak, stats.current_streak)
+    stats.day_counts = counts
+    return in_order
+
+
+def record_completions(completions):
+    """
+    Обновляет статистику привычек по новым отметкам. Вызывается в транзакции записи отметок.
+
+    Строки статистики привычек пакета создаются одним INSERT ... ON CONFLICT DO NOTHING, захватываются одним
+    SELECT ... FOR UPDATE и сохраняются одним UPDATE, поэтому количество запросов не зависит от размера пакета
+    и истории. Если отметка добавлена задним числом раньше последнего дня с отметкой, статистика этой привычки
+    пересчитывается по истории.
+
+    Параметры:
+    completions (list[HabitCompletion]): записанные отметки.
+    """
+
+    days = defaultdict(Counter)
+    owners = {}
+    for completion in completions:
+        days[completion.habit_id][timezone.localdate(completion.completed_at)] += 1
+        owners[completion.habit_id] = completion.owner_id
+    HabitStats.objects.bulk_create(
+        [HabitStats(habit_id=habit_id, owner_id=owner_id) for habit_id, owner_id in owners.items()],
+        ignore_conflicts=True,
+    )
+    locked = (
+        HabitStats.objects.select_related("habit").only("habit__periodicity", *UPDATE_FIELDS, "owner_id")
+        .select_for_update(of=("self",)).filter(habit_id__in=days).order_by("habit_id")
+    )
+    updated, stale = [], []
+    for stats in locked:
+        if add_days(stats, sorted(days[stats.habit_id].items()), get_period(stats.habit.periodicity)):
+            updated.append(stats)
+        else:
+            stale.append(stats.habit_id)
+    HabitStats.objects.bulk_update(updated, UPDATE_FIELDS)
+    if stale:
+        rebuild_stats(Habit.objects.filter(pk__in=stale))
+
+
+def rebuild_stats(habits):
+    """
+    Пересчитывает статистику привычек по всей истории отметок.
+
+    Отметки читаются одним запросом, сгруппированными по привычке и дню; статистика записывается одним
+    INSERT ... ON CONFLICT DO UPDATE. Привычки без отметок получают нулевую статистику.
+    Вызывается в транзакции.
+
+    Параметры:
+    habits (QuerySet): привычки.
+
+    Возврат:
+    - int: количество пересчитанных привычек.
+    """
+
+    habits = list(habits.values_list("id", "owner_id", "periodicity"))
+    habit_ids = [habit_id for habit_id, _, _ in habits]
+    # Одновременная запись отметок ждет окончания пересчета и добавляет свои отметки к пересчитанной статистике.
+    list(HabitStats.objects.select_for_update().filter(habit_id__in=habit_ids).values_list("pk"))
+    days = defaultdict(list)
+    rows = (
+        HabitCompletion.objects.filter(habit_id__in=habit_ids)
+        .annotate(day=TruncDate("completed_at")).values_list("habit_id", "day")
+        .annotate(count=Count("id")).order_by("habit_id", "day")
+    )
+    for habit_id, day, count in rows:
+        days[habit_id].append((day, count))
+    stats = []
+    for habit_id, owner_id, periodicity in habits:
+        if owner_id is None:
+            continue
+        habit_stats = HabitStats(habit_id=habit_id, owner_id=owner_id, day_counts=[])
+        add_days(habit_stats, days[habit_id], get_period(periodicity))
+        stats.append(habit_stats)
+    HabitStats.objects.bulk_create(
+        stats, update_conflicts=True, unique_fields=["habit"], update_fields=["owner", *UPDATE_FIELDS],
+    )
+    return len(stats)
+
+
+def window_total(stats, today, days):
+    """
+    Возвращает количество отметок за последние days дней, включая today.
+    """
+
+    if stats.window_end is None:
+        return 0
+    shift = (today - stats.window_end).days
+    return sum(stats.day_counts[:max(days - shift, 0)])
+
+
+def get_stats_data(stats, periodicity, today=None):
+    """
+    Возвращает статистику привычки на сегодня.
+
+    Текущая серия обнуляется, если с последнего выполнения прошло больше допустимого разрыва.
+
+    Параметры:
+    stats (HabitStats): статистика привычки или None, если отметок еще не было.
+    periodicity (int): периодичность привычки.
+    today (date): текущий день. По умолчанию — timezone.localdate().
+
+    Возврат:
+    - dict: текущая и самая длинная серии, всего выполнений, день последнего выполнения,
+      выполнения за 7 и 30 дней.
+    """
+
+    today = today or timezone.localdate()
+    if stats is None:
+        stats = HabitStats()
+    active = stats.last_completed_on is not None and today - stats.last_completed_on <= timedelta(
+        days=get_period(periodicity))
+    return {
+        "current_streak": stats.current_streak if active else 0,
+        "longest_streak": stats.longest_streak,
+        "total_completions": stats.total_completions,
+        "last_completed_on": stats.last_completed_on,
+        "completions_7d": window_total(stats, today, 7),
+        "completions_30d": window_total(stats, today, WINDOW_DAYS),
+    }
+
+
+def get_summary(owner_id, today=None):
+    """
+    Возвращает сводную статистику привычек пользователя, прочитанную одним запросом из строк статистики.
+
+    Возврат:
+    - dict: количество привычек с отметками, всего выполнений, выполнения за 7 и 30 дней,
+      количество активных серий, лучшая текущая и самая длинная серии.
+    """
+
+    today = today or timezone.localdate()
+    rows = [
+        get_stats_data(stats, stats.habit.periodicity, today)
+        for stats in HabitStats.objects.select_related("habit").only("habit__periodicity", *UPDATE_FIELDS)
+        .filter(owner_id=owner_id)
+    ]
+    return {
+        "habits": len(rows),
+        "total_completions": sum(row["total_completions"] for row in rows),
+        "completions_7d": sum(row["completions_7d"] for row in rows),
+        "completions_30d": sum(row["completions_30d"] for row in rows),
+        "active_streaks": sum(1 for row in rows if row["current_streak"]),
+        "best_current_streak": max((row["current_streak"] for row in rows), default=0),
+        "longest_streak": max((row["longest_streak"] for row in rows), default=0),
+    }
@@ -1,51 +1,413 @@
 from datetime import datetime, timedelta
 import pytz
-from celery import shared_task
+from celery import group, shared_task
+from django.db import transaction
+from django.db.models import DurationField, F, FloatField, Func, IntegerField, Value
+from django.db.models.functions import Cast, Ceil, Greatest, Mod
 from config import settings
-from habits.models import Habit
-from habits.services import send_telegram_message
-from users.models import User
+from habits import outbox, partitions, timing_wheel
+from habits.models import DispatchWatermark, Habit
+
+WATERMARK_NAME = "reminders"
+
+
+def get_due_habits(end, shard=0, shards=1):
+    """
+    Возвращает привычки, время напоминания которых наступило к end.
+
+    Выборка выполняется одним запросом: диапазон по частичному индексу на поле next_fire_at,
+    в который попадают только привычки владельцев с ID телеграмм чата. В выборку попадают и привычки,
+    минута которых была пропущена (перезапуск воркера, опоздавший тик): после обработки время их
+    следующего напоминания переносится, и они уходят из выборки.
+    При shards > 1 возвращаются только привычки владельцев, для которых owner_id % shards == shard,
+    поэтому все напоминания одного пользователя обрабатывает один шард.
+
+    Параметры:
+    end (datetime): текущее время тика.
+    shard (int): номер шарда.
+    shards (int): количество шардов.
+
+    Возврат:
+    - QuerySet: привычки, по которым нужно отправить напоминание.
+    """
+
+    habits = (
+        Habit.objects.select_related("owner", "related_habit__owner")
+        .filter(next_fire_at__lte=end)
+        .exclude(owner__tg_chat_id="")
+    )
+    return filter_shard(habits, shard, shards)
+
+
+def filter_shard(habits, shard, shards):
+    """
+    Оставляет привычки владельцев шарда: owner_id % shards == shard.
+    """
+
+    if shards > 1:
+        habits = habits.alias(shard=Mod("owner_id", shards)).filter(shard=shard)
+    return habits
+
+
+class Epoch(Func):
+    """
+    Количество секунд в интервале (EXTRACT(EPOCH FROM ...) в PostgreSQL).
+    """
+
+    template = "EXTRACT(EPOCH FROM %(expressions)s)"
+    output_field = FloatField()
+
+
+class MakeInterval(Func):
+    """
+    Интервал из указанного количества дней (make_interval в PostgreSQL).
+    """
+
+    template = "make_interval(days => %(expressions)s)"
+    output_field = DurationField()
+
+
+def next_fire_at_after(moment):
+    """
+    Выражение для ближайшего времени напоминания не раньше указанного момента.
+
+    Рассчитывается в базе данных так же, как в Habit.get_next_fire_at:
+    next_fire_at сдвигается на минимальное целое число периодов, чтобы оказаться не раньше moment.
+
+    Параметры:
+    moment (datetime): момент, начиная с которого ищется ближайшее напоминание.
+
+    Возврат:
+    - Expression: выражение для UPDATE поля next_fire_at.
+    """
+
+    period_days = Greatest(F("periodicity"), 1)
+    periods = Greatest(
+        Ceil(Epoch(Value(moment) - F("next_fire_at")) / (period_days * 86400.0)),
+        0.0,
+        output_field=FloatField(),
+    )
+    return F("next_fire_at") + MakeInterval(Cast(periods, IntegerField()) * period_days)
+
+
+def reschedule_habits(habits, now):
+    """
+    Переносит время следующего напоминания сработавших привычек одним UPDATE.
+
+    Новое время рассчитывается в базе данных для всего пакета и оказывается позже текущей минуты.
+    Обновляется только поле next_fire_at, без записи остальных колонок каждой привычки.
+
+    Параметры:
+    habits (list[Habit]): сработавшие привычки.
+    now (datetime): текущее время, обрезанное до минуты.
+
+    Возврат:
+    - int: количество обновленных привычек.
+    """
+
+    return Habit.objects.filter(pk__in=[habit.pk for habit in habits]).update(
+        next_fire_at=next_fire_at_after(now + timedelta(minutes=1)),
+    )
+
+
+def skip_stale_habits(before, now, shard=0, shards=1):
+    """
+    Переносит без отправки напоминания, пропущенные дольше REMINDER_CATCHUP_LIMIT назад.
+
+    Параметры:
+    before (datetime): напоминания не позже этого момента считаются устаревшими.
+    now (datetime): текущее время, обрезанное до минуты.
+    shard (int): номер шарда.
+    shards (int): количество шардов.
+
+    Возврат:
+    - int: количество перенесенных привычек.
+    """
+
+    return filter_shard(Habit.objects.filter(next_fire_at__lte=before), shard, shards).update(
+        next_fire_at=next_fire_at_after(now + timedelta(minutes=1)),
+    )
+
+
+def render_habit_messages(habit):
+    """
+    Формирует тексты напоминаний по привычке.
+
+    Параметры:
+    habit (Habit): привычка, по которой отправляется напоминание.
+
+    Возврат:
+    - list[str]: тексты сообщений.
+    """
+
+    messages = []
+    if habit.pleasant_habit_sign:
+        messages.append(
+            f"Необходимо сделать: {habit.action}, "
+            f"За данное количество: {habit.duration} минут."
+        )
+    if habit.related_habit:
+        messages.append(
+            f"Необходимо сделать: {habit.action}, "
+            f"За данное количество: {habit.duration} минут, "
+            f"После этого можешь: {habit.related_habit}."
+        )
+    if habit.reward:
+        messages.append(
+            f"Необходимо сделать: {habit.action}, "
+            f"За данное количество: {habit.duration} минут, "
+            f"После этого получишь в награду: {habit.reward}."
+        )
+    return messages
+
+
+def enqueue_reminders(habits, now, drain=True):
+    """
+    Ставит в очередь напоминания по захваченным привычкам и переносит время их следующего напоминания.
+
+    Напоминания владельцев с включенной сводкой (reminder_digest) объединяются в одно сообщение на чат,
+    не длиннее REMINDER_DIGEST_MAX_LENGTH символов.
+
+    Вызывается внутри транзакции, в которой привычки захвачены.
+
+    Параметры:
+    habits (list[Habit]): привычки с загруженными владельцами.
+    now (datetime): текущее время, обрезанное до минуты.
+    drain (bool): запустить отправку очереди после фиксации транзакции.
+
+    Возврат: None
+    """
+
+    notifications = []
+    digest = []
+    for habit in habits:
+        target = digest if habit.owner.reminder_digest else notifications
+        target.extend(outbox.build_notifications(habit, render_habit_messages(habit)))
+    outbox.enqueue_notifications(notifications + outbox.build_digests(digest, settings.REMINDER_DIGEST_MAX_LENGTH))
+    reschedule_habits(habits, now)
+    if habits and drain:
+        transaction.on_commit(drain_outbox.delay)
+
+
+def dispatch_due_habits(end, shard=0, shards=1, drain=True):
+    """
+    Ставит в очередь напоминания по привычкам шарда, время которых наступило к end.
+
+    Привычки захватываются порциями по DISPATCH_BATCH_SIZE через SELECT ... FOR UPDATE SKIP LOCKED:
+    строки, которые уже обрабатывает другой воркер или пересекающийся тик, пропускаются,
+    а обработанные привычки уходят из окна выборки вместе с переносом next_fire_at.
+    Постановка в очередь и перенос времени следующего напоминания выполняются в одной транзакции
+    с захватом порции, поэтому напоминание не может потеряться или отправиться дважды.
+    Внутри минуты привычки упорядочены по владельцу, чтобы сводка пользователя не делилась между порциями.
+
+    Параметры:
+    end (datetime): текущее время тика.
+    shard (int): номер шарда.
+    shards (int): количество шардов.
+    drain (bool): запустить отправку очереди после фиксации транзакции.
+
+    Возврат:
+    - int: количество обработанных привычек.
+    """
+
+    now = end.replace(second=0, microsecond=0)
+    dispatched = 0
+    while True:
+        with transaction.atomic():
+            habits = list(
+                get_due_habits(end, shard, shards)
+                .select_for_update(skip_locked=True, of=("self",))
+                .order_by("next_fire_at", "owner_id", "id")[:settings.DISPATCH_BATCH_SIZE]
+            )
+            enqueue_reminders(habits, now, drain)
+        dispatched += len(habits)
+        if len(habits) < settings.DISPATCH_BATCH_SIZE:
+            return dispatched
+
+
+def dispatch_from_wheel(now, drain=True):
+    """
+    Ставит в очередь напоминания, забирая наступившие из расписания в Redis.
+
+    Привычки забираются из отсортированного множества атомарно порциями по DISPATCH_BATCH_SIZE,
+    поэтому несколько воркеров обрабатывают непересекающиеся наборы без опроса PostgreSQL.
+    Напоминания старше REMINDER_CATCHUP_LIMIT переносятся на следующий период без отправки.
+    После фиксации транзакции привычки возвращаются в расписание с новым временем напоминания;
+    если обработка порции завершилась ошибкой, они возвращаются со временем now для повторной попытки.
+
+    Параметры:
+    now (datetime): текущее время тика.
+    drain (bool): запустить отправку очереди после фиксации транзакции.
+
+    Возврат:
+    - int: количество обработанных привычек.
+    """
+
+    wheel = timing_wheel.get_timing_wheel()
+    stale_before = now - settings.REMINDER_CATCHUP_LIMIT
+    dispatched = 0
+    while True:
+        habit_ids = wheel.pop_due(now, settings.DISPATCH_BATCH_SIZE)
+        if not habit_ids:
+            return dispatched
+        try:
+            with transaction.atomic():
+                habits = list(
+                    Habit.objects.select_related("owner", "related_habit__owner")
+                    .filter(pk__in=habit_ids, next_fire_at__lte=now)
+                    .exclude(owner__tg_chat_id="")
+                    .select_for_update(of=("self",))
+                )
+                due = [habit for habit in habits if habit.next_fire_at > stale_before]
+                enqueue_reminders(due, now.replace(second=0, microsecond=0), drain)
+                reschedule_habits([habit for habit in habits if habit.next_fire_at <= stale_before],
+                                  now.replace(second=0, microsecond=0))
+                schedule = dict(Habit.objects.filter(pk__in=habit_ids).values_list("id", "next_fire_at"))
+                transaction.on_commit(lambda: wheel.sync(schedule))
+        except Exception:
+            wheel.schedule({habit_id: now for habit_id in habit_ids})
+            raise
+        dispatched += len(due)
 
 
 @shared_task
 def send_telegram():
     """
-    Эта функция отправляет напоминание пользователям об их привычках через Telegram.
-    Она сверяет время каждой привычки с текущим временем и отправляет напоминание, если они совпадают.
-    Функция также обновляет время действия привычки до следующего времени напоминания в зависимости от ее периодичности.
-    """
-
-    habits = Habit.objects.all()
-    users = User.objects.all()
-    for user in users:
-        if user.tg_chat_id:
-            for habit in habits:
-                habit_start_time = habit.time.replace(second=0, microsecond=0)
-                habit_time_now = datetime.now(
-                    pytz.timezone(settings.TIME_ZONE)
-                ).replace(second=0, microsecond=0)
-                if habit_start_time == habit_time_now:
-                    if habit.pleasant_habit_sign:
-                        send_telegram_message(
-                            habit.owner.tg_chat_id,
-                            f"Необходимо сделать: {habit.action}, "
-                            f"За данное количество: {habit.duration} минут.",
-                        )
-                    if habit.related_habit:
-                        send_telegram_message(
-                            habit.owner.tg_chat_id,
-                            f"Необходимо сделать: {habit.action}, "
-                            f"За данное количество: {habit.duration} минут, "
-                            f"После этого можешь: {habit.related_habit}.",
-                        )
-                    if habit.reward:
-                        send_telegram_message(
-                            habit.owner.tg_chat_id,
-                            f"Необходимо сделать: {habit.action}, "
-                            f"За данное количество: {habit.duration} минут, "
-                            f"После этого получишь в награду: {habit.reward}.",
-                        )
-                    habit.time = datetime.now(
-                        pytz.timezone(settings.TIME_ZONE)
-                    ) + timedelta(days=habit.periodicity)
-                    habit.save()
+    Эта функция ставит в очередь напоминания пользователям об их привычках через Telegram.
+
+    Окно делится на REMINDER_SHARDS шардов по владельцу, которые обрабатываются группой задач Celery.
+    Каждый шард обрабатывает все наступившие напоминания, поэтому напоминания не теряются,
+    если тик опоздал, был пропущен, воркер перезапускался или задача шарда завершилась ошибкой.
+    Если REMINDER_BACKEND = "redis", REMINDER_SHARDS задач забирают наступившие напоминания из расписания в Redis.
+    """
+
+    # Окно выровнено по минутам, как и время напоминаний.
+    now = datetime.now(pytz.timezone(settings.TIME_ZONE)).replace(second=0, microsecond=0)
+    shards = settings.REMINDER_SHARDS
+    if timing_wheel.is_enabled():
+        group(dispatch_wheel.s(now.isoformat()) for _ in range(shards)).apply_async()
+        return
+    group(dispatch_shard.s(now.isoformat(), shard, shards) for shard in range(shards)).apply_async()
+
+
+def get_shard_watermark(shard, end):
+    """
+    Возвращает отметку рассылки шарда.
+
+    При первом запуске шарда отметка создается с общей отметки рассылки, если она есть, иначе — с минуты до end.
+
+    Параметры:
+    shard (int): номер шарда.
+    end (datetime): время тика.
+
+    Возврат:
+    - DispatchWatermark: отметка рассылки шарда.
+    """
+
+    name = f"{WATERMARK_NAME}:{shard}"
+    watermark = DispatchWatermark.objects.filter(name=name).first()
+    if watermark is None:
+        initial = DispatchWatermark.objects.filter(name=WATERMARK_NAME).values_list("value", flat=True).first()
+        watermark, _ = DispatchWatermark.objects.get_or_create(
+            name=name, defaults={"value": initial or end - timedelta(minutes=1)},
+        )
+    return watermark
+
+
+@shared_task
+def dispatch_shard(end, shard, shards):
+    """
+    Ставит в очередь напоминания одного шарда, время которых наступило к end, и сдвигает отметку шарда.
+    Функция также переносит время следующего напоминания привычки в зависимости от ее периодичности,
+    не изменяя время старта привычки.
+
+    Отметка показывает, до какого времени шард обработан. Она хранится для каждого шарда и сдвигается
+    самой задачей, поэтому группе задач не нужен бэкенд результатов Celery, а ошибка одного шарда
+    не задерживает остальные. Если отметка отстала больше чем на REMINDER_CATCHUP_LIMIT (воркеры не работали),
+    напоминания старше этого срока переносятся на следующий период без отправки.
+
+    Параметры:
+    end (str): время тика в формате ISO 8601, обрезанное до минуты.
+    shard (int): номер шарда.
+    shards (int): количество шардов.
+
+    Возврат:
+    - int: количество обработанных привычек.
+    """
+
+    end = datetime.fromisoformat(end)
+    watermark = get_shard_watermark(shard, end)
+    stale_before = end - settings.REMINDER_CATCHUP_LIMIT
+    if watermark.value < stale_before:
+        skip_stale_habits(stale_before, end, shard, shards)
+    dispatched = dispatch_due_habits(end, shard, shards)
+    advance_watermark(watermark.name, end)
+    return dispatched
+
+
+@shared_task
+def dispatch_wheel(now):
+    """
+    Ставит в очередь наступившие напоминания из расписания в Redis.
+
+    Параметры:
+    now (str): время тика в формате ISO 8601.
+
+    Возврат:
+    - int: количество обработанных привычек.
+    """
+
+    return dispatch_from_wheel(datetime.fromisoformat(now))
+
+
+def advance_watermark(name, value):
+    """
+    Сдвигает отметку рассылки вперед после обработки окна.
+
+    Отметка никогда не сдвигается назад, даже если тики завершились не по порядку.
+
+    Параметры:
+    name (str): название отметки.
+    value (datetime): время тика.
+    """
+
+    DispatchWatermark.objects.filter(name=name, value__lt=value).update(value=value)
+
+
+@shared_task
+def drain_outbox():
+    """
+    Отправляет в Telegram уведомления из очереди, срок отправки которых наступил.
+    """
+
+    return outbox.drain_outbox()
+
+
+@shared_task
+def purge_outbox():
+    """
+    Задача Celery для удаления из очереди отправленных и недоставленных уведомлений старше
+    OUTBOX_RETENTION_DAYS дней.
+
+    Возврат:
+    - int: количество удаленных уведомлений.
+    """
+
+    return outbox.purge_notifications(datetime.now(pytz.timezone(settings.TIME_ZONE)))
+
+
+@shared_task
+def maintain_completion_partitions():
+    """
+    Задача Celery для обслуживания секций отметок о выполнении привычек: создает секции текущего и следующих
+    COMPLETION_PARTITIONS_AHEAD месяцев и отсоединяет секции старше COMPLETION_RETENTION_MONTHS месяцев.
+
+    Возврат:
+    - dict: имена созданных (created) и отсоединенных (detached) секций.
+    """
+
+    now = datetime.now(pytz.timezone(settings.TIME_ZONE))
+    created = partitions.ensure_future_partitions(now)
+    retention_start = partitions.get_retention_start(now)
+    detached = partitions.detach_partitions(retention_start) if retention_start else []
+    return {"created": created, "detached": detached}
@@ -1,8 +1,49 @@
+import csv
+import json
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from email.utils import format_datetime
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+
+import pytz
+import redis
+import requests
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.http import http_date
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APITestCase, APIClient
 
-from habits.models import Habit
+from habits import export, feed_cache, stats
+from habits.bulk import resolve_related_habits
+from habits.completions import save_completions
+from habits.fake_telegram import FakeTelegramServer
+from habits.importer import OWNER_NOT_FOUND, HabitImporter
+from habits.models import DispatchWatermark, Habit, HabitCompletion, HabitStats, NotificationOutbox
+from habits.partitions import (add_months, detach_partitions, ensure_partitions, list_partitions, month_start,
+                               partition_name)
+from habits.outbox import drain_outbox
+from habits.paginators import HabitPagination
+from habits.serializers import HabitBulkSerializer, HabitSerializer, ValuesSerializer
+from habits.services import (DeliveryResult, DeliveryStatus, TelegramDeliveryEngine, TelegramMessage,
+                             configure_delivery_engine)
+from habits.tasks import (advance_watermark, dispatch_due_habits, dispatch_from_wheel, dispatch_shard, get_due_habits,
+                          maintain_completion_partitions, purge_outbox, render_habit_messages, reschedule_habits,
+                          send_telegram)
+from habits.timing_wheel import RedisTimingWheel
+from habits.validators import (DurationValidator, PeriodicityValidator, PleasantHabitValidator, RelatedHabitValidator,
+                               RewardValidator, CompletionTimeValidator, constraint_validation)
 from users.models import User
 
 
@@ -17,6 +58,7 @@ class HabitTestCase(APITestCase):
         Создание привычки для тестирования.
         """
 
+        cache.clear()
         self.user = User.objects.create(email="admin@mail.com")
         self.user.set_password("123")
         self.user.save()
@@ -47,6 +89,7 @@ class HabitTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(Habit.objects.count(), 2)
         self.assertTrue(Habit.objects.all().exists())
+        self.assertEqual(Habit.objects.get(pk=response.json()["id"]).owner, self.user)
 
     def test_habit_list(self):
         """
@@ -57,7 +100,6 @@ class HabitTestCase(APITestCase):
         response = self.client.get(url)
         data = response.json()
         result = {
-            "count": 1,
             "next": None,
             "previous": None,
             "results": [
@@ -79,6 +121,49 @@ class HabitTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(data, result)
 
+    def test_habit_list_cursor_pagination(self):
+        """
+        Тест постраничного получения списка по курсору без OFFSET с размером страницы от клиента.
+        """
+
+        Habit.objects.bulk_create(
+            Habit(owner=self.user, action=f"Привычка {i}", place="Дом", time=self.habit.time, reward="Отдых")
+            for i in range(6)
+        )
+        expected = list(Habit.objects.filter(owner=self.user).order_by("id").values_list("id", flat=True))
+
+        ids = []
+        url = reverse("habits:habits_list") + "?page_size=3"
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                data = self.client.get(url).json()
+            self.assertFalse(any("OFFSET" in query["sql"] for query in queries))
+            self.assertLessEqual(len(data["results"]), 3)
+            ids.extend(habit["id"] for habit in data["results"])
+            url = data["next"]
+        self.assertEqual(ids, expected)
+
+        with mock.patch.object(HabitPagination, "max_page_size", 2):
+            data = self.client.get(reverse("habits:habits_published") + "?page_size=1000").json()
+        self.assertEqual(len(data["results"]), 2)
+
+    def test_values_serializer_matches_habit_serializer(self):
+        """
+        Тест побайтового совпадения JSON быстрой сериализации списка с выводом HabitSerializer.
+        """
+
+        Habit.objects.create(
+            owner=self.user, action="Зарядка", place="Дом", time="2024-07-13T10:30:15.123456+03:00",
+            related_habit=self.habit, periodicity=3, duration=timedelta(seconds=75), is_published=False,
+        )
+        Habit.objects.create(action="Без владельца", place="Дом", time="2024-07-13T10:00:00Z", reward="Отдых")
+        habits = Habit.objects.order_by("id")
+        values_serializer = ValuesSerializer(HabitSerializer)
+
+        fast = values_serializer.to_representation(habits.values(*values_serializer.value_fields))
+
+        self.assertEqual(JSONRenderer().render(fast), JSONRenderer().render(HabitSerializer(habits, many=True).data))
+
     def test_habit_retrieve(self):
         """
         Тест получения одной привычки.
@@ -103,6 +188,87 @@ class HabitTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(data["action"], "Позаниматься спортом с ребенком")
 
+    def test_habit_list_conditional_get(self):
+        """
+        Тест ответа 304 на список без выборки и сериализации привычек и смены ETag после изменения привычки.
+        """
+
+        url = reverse("habits:habits_list")
+        etag = self.client.get(url)["ETag"]
+
+        with mock.patch("habits.views.HabitSerializer.to_representation") as to_representation:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(len(queries), 1)
+        to_representation.assert_not_called()
+
+        self.client.patch(reverse("habits:habit_update", args=(self.habit.pk,)), {"place": "Дом"}, format="json")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_habit_list_ignores_if_modified_since(self):
+        """
+        Тест того, что список не отдает Last-Modified и не отвечает 304 по If-Modified-Since после удаления привычки.
+        """
+
+        url = reverse("habits:habits_list")
+        Habit.objects.create(owner=self.user, action="Чтение", place="Дом", time=timezone.now(), reward="Чай")
+        response = self.client.get(url)
+        self.assertNotIn("Last-Modified", response)
+
+        since = http_date(timezone.now().timestamp() + 60)
+        self.client.delete(reverse("habits:habit_delete", args=(self.habit.pk,)))
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_habit_retrieve_conditional_get(self):
+        """
+        Тест ответа 304 на привычку по ETag и Last-Modified.
+        """
+
+        url = reverse("habits:habit_retrieve", args=(self.habit.pk,))
+        response = self.client.get(url)
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code,
+                         status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]).status_code,
+                         status.HTTP_304_NOT_MODIFIED)
+
+    def test_habit_update_if_match(self):
+        """
+        Тест оптимистической блокировки: обновление по устаревшему ETag возвращает 412.
+        """
+
+        url = reverse("habits:habit_update", args=(self.habit.pk,))
+        etag = self.client.get(reverse("habits:habit_retrieve", args=(self.habit.pk,)))["ETag"]
+
+        response = self.client.patch(url, {"place": "Дом"}, format="json", HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+        response = self.client.patch(url, {"place": "Парк"}, format="json", HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.habit.refresh_from_db()
+        self.assertEqual(self.habit.place, "Дом")
+
+    def test_other_users_habit_is_not_found(self):
+        """
+        Тест поиска привычки только среди привычек пользователя: на чужую привычку возвращается 404.
+        """
+
+        other = User.objects.create(email="other@mail.com", username="other")
+        self.client.force_authenticate(user=other)
+
+        for response in (
+            self.client.get(reverse("habits:habit_retrieve", args=(self.habit.pk,))),
+            self.client.patch(reverse("habits:habit_update", args=(self.habit.pk,)), {"place": "Дом"}),
+            self.client.delete(reverse("habits:habit_delete", args=(self.habit.pk,))),
+        ):
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertTrue(Habit.objects.filter(pk=self.habit.pk, place="Парк им.Пушкина").exists())
+
     def test_habit_delete(self):
         """
         Тест удаления существующей привычки.
@@ -112,3 +278,1584 @@ class HabitTestCase(APITestCase):
         response = self.client.delete(url)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertEqual(Habit.objects.count(), 0)
+
+
+class SendTelegramTaskTestCase(TestCase):
+    """
+    Тесты для задачи отправки напоминаний в Telegram.
+    """
+
+    def setUp(self):
+        """
+        Создание пользователей с чатом и без, фиксация текущего времени.
+        """
+
+        self.now = datetime(2024, 7, 13, 10, 0, tzinfo=pytz.UTC)
+        self.user = User.objects.create(email="tg@mail.com", username="tg", tg_chat_id="100")
+        self.silent_user = User.objects.create(email="silent@mail.com", username="silent")
+
+    def create_habits(self, count, **kwargs):
+        """
+        Создание привычек, время напоминания которых не совпадает с текущей минутой.
+        """
+
+        Habit.objects.bulk_create(
+            Habit(
+                owner=self.user,
+                action=f"Привычка {i}",
+                place="Дом",
+                time=self.now + timedelta(hours=1),
+                next_fire_at=self.now + timedelta(hours=1),
+                reward="Отдых",
+                **kwargs,
+            )
+            for i in range(count)
+        )
+
+    def run_task(self):
+        dispatch_due_habits(self.now)
+        return list(NotificationOutbox.objects.all())
+
+    def test_sends_only_due_habits(self):
+        """
+        Тест отправки напоминаний по наступившим, в том числе пропущенным, привычкам владельцев с чатом
+        и переноса их следующего напоминания.
+        """
+
+        start = self.now - timedelta(days=2)
+        pleasant = Habit.objects.create(
+            owner=self.user, action="Выпить чай", place="Кухня", time=start, next_fire_at=self.now,
+            pleasant_habit_sign=True,
+        )
+        Habit.objects.create(
+            owner=self.user, action="Зарядка", place="Дом", time=self.now,
+            next_fire_at=self.now - timedelta(minutes=7), related_habit=pleasant,
+        )
+        Habit.objects.create(owner=self.silent_user, action="Бег", place="Парк", time=self.now, reward="Отдых")
+        missed = Habit.objects.create(
+            owner=self.user, action="Сон", place="Дом", time=self.now - timedelta(minutes=10),
+            next_fire_at=self.now - timedelta(minutes=10), reward="Отдых",
+        )
+        self.create_habits(3)
+
+        notifications = self.run_task()
+
+        self.assertEqual(len(notifications), 3)
+        self.assertTrue(all(notification.tg_chat_id == "100" for notification in notifications))
+        pleasant.refresh_from_db()
+        self.assertEqual(pleasant.time, start)
+        self.assertEqual(pleasant.next_fire_at, self.now + timedelta(days=1))
+        missed.refresh_from_db()
+        self.assertEqual(missed.next_fire_at, self.now + timedelta(days=1) - timedelta(minutes=10))
+        self.assertEqual(self.run_task(), notifications)
+
+    def test_digest_groups_reminders_per_chat(self):
+        """
+        Тест объединения напоминаний владельца со сводкой в сообщения не длиннее REMINDER_DIGEST_MAX_LENGTH.
+        """
+
+        self.user.reminder_digest = True
+        self.user.save(update_fields=["reminder_digest"])
+        self.create_habits(5)
+        Habit.objects.update(next_fire_at=self.now)
+        text_length = len(render_habit_messages(Habit.objects.select_related("related_habit").first())[0])
+
+        with mock.patch("config.settings.REMINDER_DIGEST_MAX_LENGTH", text_length * 3 + 4):
+            notifications = self.run_task()
+
+        self.assertEqual(len(notifications), 2)
+        self.assertEqual(sorted(n.text.count("\n\n") for n in notifications), [1, 2])
+        self.assertTrue(all(len(n.text) <= text_length * 3 + 4 for n in notifications))
+        self.assertEqual(len(self.run_task()), 2)
+
+        Habit.objects.update(next_fire_at=self.now)
+        self.assertEqual(len(self.run_task()), 2)
+
+    def test_repeated_tick_does_not_duplicate_notifications(self):
+        """
+        Тест идемпотентной постановки напоминаний в очередь при повторном запуске за ту же минуту.
+        """
+
+        Habit.objects.create(
+            owner=self.user, action="Зарядка", place="Дом", time=self.now, next_fire_at=self.now, reward="Отдых",
+        )
+        self.run_task()
+        Habit.objects.update(next_fire_at=self.now)
+        self.assertEqual(len(self.run_task()), 1)
+
+    def run_tick(self, now):
+        with mock.patch("habits.tasks.datetime", wraps=datetime) as mocked_datetime, \
+                mock.patch("habits.tasks.group") as mocked_group, \
+                mock.patch("config.settings.REMINDER_SHARDS", 3):
+            mocked_datetime.now.return_value = now
+            send_telegram()
+        return mocked_group
+
+    def test_send_telegram_fans_out_shards(self):
+        """
+        Тест запуска обработки шардов группой задач без бэкенда результатов с окном до начала текущей минуты.
+        """
+
+        mocked_group = self.run_tick(self.now + timedelta(seconds=5))
+
+        header, = mocked_group.call_args.args
+        self.assertEqual([signature.args for signature in header],
+                         [(self.now.isoformat(), shard, 3) for shard in range(3)])
+        mocked_group.return_value.apply_async.assert_called_once()
+
+    def test_dispatch_shard_advances_own_watermark(self):
+        """
+        Тест обработки шарда от его отметки рассылки и сдвига отметки самой задачей шарда:
+        отметка нового шарда начинается с общей отметки рассылки.
+        """
+
+        DispatchWatermark.objects.create(name="reminders", value=self.now - timedelta(minutes=5))
+        missed = Habit.objects.create(
+            owner=self.user, action="Зарядка", place="Дом", time=self.now,
+            next_fire_at=self.now - timedelta(minutes=3), reward="Отдых",
+        )
+        shard = self.user.pk % 3
+
+        self.assertEqual(dispatch_shard(self.now.isoformat(), (shard + 1) % 3, 3), 0)
+        self.assertEqual(dispatch_shard(self.now.isoformat(), shard, 3), 1)
+
+        self.assertEqual(DispatchWatermark.objects.get(name=f"reminders:{shard}").value, self.now)
+        self.assertEqual(DispatchWatermark.objects.get(name=f"reminders:{(shard + 1) % 3}").value, self.now)
+        missed.refresh_from_db()
+        self.assertEqual(missed.next_fire_at, self.now + timedelta(days=1) - timedelta(minutes=3))
+
+    def test_watermark_never_moves_back(self):
+        """
+        Тест того, что завершившийся позже старый тик не сдвигает отметку назад.
+        """
+
+        DispatchWatermark.objects.create(name="reminders:0", value=self.now)
+        advance_watermark("reminders:0", self.now - timedelta(minutes=1))
+        self.assertEqual(DispatchWatermark.objects.get(name="reminders:0").value, self.now)
+
+    def test_stale_reminders_are_skipped(self):
+        """
+        Тест переноса без отправки напоминаний, пропущенных дольше REMINDER_CATCHUP_LIMIT назад.
+        """
+
+        DispatchWatermark.objects.create(name="reminders:0", value=self.now - timedelta(days=1))
+        stale = Habit.objects.create(
+            owner=self.user, action="Зарядка", place="Дом", time=self.now - timedelta(hours=5),
+            next_fire_at=self.now - timedelta(hours=5), reward="Отдых",
+        )
+
+        self.assertEqual(dispatch_shard(self.now.isoformat(), 0, 1), 0)
+
+        stale.refresh_from_db()
+        self.assertEqual(stale.next_fire_at, self.now + timedelta(hours=19))
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+    def test_shards_split_due_habits_by_owner(self):
+        """
+        Тест того, что каждая привычка обрабатывается ровно одним шардом.
+        """
+
+        owners = [
+            User.objects.create(email=f"owner{i}@mail.com", username=f"owner{i}", tg_chat_id=str(i))
+            for i in range(4)
+        ]
+        for owner in owners:
+            Habit.objects.create(
+                owner=owner, action="Зарядка", place="Дом", time=self.now, next_fire_at=self.now, reward="Отдых",
+            )
+
+        dispatched = [dispatch_due_habits(self.now, shard, 3) for shard in range(3)]
+
+        self.assertEqual(dispatched, [sum(owner.pk % 3 == shard for owner in owners) for shard in range(3)])
+        self.assertEqual(NotificationOutbox.objects.count(), 4)
+        self.assertFalse(Habit.objects.filter(next_fire_at=self.now).exists())
+
+    def test_query_count_does_not_depend_on_table_size(self):
+        """
+        Тест постоянного количества запросов независимо от количества привычек.
+        """
+
+        Habit.objects.create(
+            owner=self.user, action="Зарядка", place="Дом", time=self.now, next_fire_at=self.now, reward="Отдых",
+        )
+        self.create_habits(5)
+        with CaptureQueriesContext(connection) as small_table:
+            self.run_task()
+
+        Habit.objects.filter(action="Зарядка").update(next_fire_at=self.now)
+        self.create_habits(200)
+        with self.assertNumQueries(len(small_table)):
+            self.run_task()
+
+
+class HabitScheduleTestCase(TestCase):
+    """
+    Тесты для расчета времени следующего напоминания.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create(email="tg@mail.com", username="tg", tg_chat_id="100")
+        self.habit = Habit(
+            owner=self.user, action="Зарядка", place="Дом", periodicity=3,
+            time=datetime(2024, 7, 1, 8, 30, 15, tzinfo=pytz.UTC),
+        )
+
+    def test_reschedule_keeps_start_time_in_future(self):
+        """
+        Тест того, что будущее время старта становится первым напоминанием.
+        """
+
+        self.habit.reschedule(datetime(2024, 6, 1, tzinfo=pytz.UTC))
+        self.assertEqual(self.habit.next_fire_at, datetime(2024, 7, 1, 8, 30, tzinfo=pytz.UTC))
+
+    def test_reschedule_moves_past_start_time_by_periodicity(self):
+        """
+        Тест переноса прошедшего времени старта на ближайшее напоминание с учетом периодичности.
+        """
+
+        self.habit.reschedule(datetime(2024, 7, 5, 12, 0, tzinfo=pytz.UTC))
+        self.assertEqual(self.habit.next_fire_at, datetime(2024, 7, 7, 8, 30, tzinfo=pytz.UTC))
+
+    def test_reschedule_skips_current_minute(self):
+        """
+        Тест того, что привычка, сохраненная в минуту своего напоминания, планируется на следующий период:
+        окно рассылки за текущую минуту могло уже пройти.
+        """
+
+        self.habit.reschedule(datetime(2024, 7, 1, 8, 30, 40, tzinfo=pytz.UTC))
+        self.assertEqual(self.habit.next_fire_at, datetime(2024, 7, 4, 8, 30, tzinfo=pytz.UTC))
+        self.habit.reschedule(datetime(2024, 7, 1, 8, 29, 59, tzinfo=pytz.UTC))
+        self.assertEqual(self.habit.next_fire_at, datetime(2024, 7, 1, 8, 30, tzinfo=pytz.UTC))
+
+    def test_bulk_reschedule_matches_python_schedule(self):
+        """
+        Тест совпадения пересчета одним UPDATE с расчетом Habit.get_next_fire_at, в том числе после простоя.
+        """
+
+        now = datetime(2024, 7, 13, 8, 30, tzinfo=pytz.UTC)
+        on_time = Habit.objects.create(
+            owner=self.user, action="Зарядка", place="Дом", periodicity=2, time=now, next_fire_at=now,
+        )
+        late = Habit.objects.create(
+            owner=self.user, action="Чтение", place="Дом", periodicity=3, time=now - timedelta(days=9, minutes=10),
+            next_fire_at=now - timedelta(days=9, minutes=10),
+        )
+
+        with self.assertNumQueries(1):
+            reschedule_habits([on_time, late], now)
+
+        for habit in (on_time, late):
+            expected = habit.get_next_fire_at(now + timedelta(minutes=1))
+            habit.refresh_from_db()
+            self.assertEqual(habit.next_fire_at, expected)
+
+    def test_owner_chat_changes_update_schedule(self):
+        """
+        Тест снятия привычек с расписания и возврата в него при изменении ID телеграмм чата.
+        """
+
+        self.habit.reschedule()
+        self.habit.save()
+
+        self.user.tg_chat_id = ""
+        self.user.save()
+        self.habit.refresh_from_db()
+        self.assertIsNone(self.habit.next_fire_at)
+
+        self.user.tg_chat_id = "200"
+        self.user.save()
+        self.habit.refresh_from_db()
+        self.assertIsNotNone(self.habit.next_fire_at)
+
+
+class TelegramDeliveryEngineTestCase(SimpleTestCase):
+    """
+    Тесты для движка доставки сообщений в Telegram.
+    """
+
+    def setUp(self):
+        self.engine = TelegramDeliveryEngine(timeout=1, max_workers=2)
+        self.message = TelegramMessage("100", "Привет")
+
+    def send_with_response(self, status_code, payload=None, headers=None):
+        response = mock.Mock(status_code=status_code, reason="", headers=headers or {})
+        response.json.return_value = payload or {}
+        with mock.patch.object(self.engine.session, "post", return_value=response) as mocked_post:
+            result = self.engine.send(self.message)
+        self.assertEqual(mocked_post.call_args.kwargs["timeout"], 1)
+        return result
+
+    def test_configure_closes_previous_engine(self):
+        """
+        Тест того, что замена общего экземпляра закрывает пул потоков и HTTP-соединения прежнего.
+        """
+
+        with mock.patch("habits.services._engine", self.engine):
+            with mock.patch.object(self.engine.session, "close", wraps=self.engine.session.close) as close:
+                engine = configure_delivery_engine(timeout=1, max_workers=1)
+        self.addCleanup(engine.close)
+        close.assert_called_once_with()
+        with self.assertRaises(RuntimeError):
+            self.engine.executor.submit(print)
+        self.assertIsNot(engine, self.engine)
+
+    def test_ok(self):
+        """
+        Тест успешной отправки.
+        """
+
+        result = self.send_with_response(200, {"ok": True})
+        self.assertEqual(result.status, DeliveryStatus.OK)
+
+    def test_rate_limited(self):
+        """
+        Тест ответа 429 с временем ожидания retry_after.
+        """
+
+        result = self.send_with_response(
+            429, {"ok": False, "description": "Too Many Requests", "parameters": {"retry_after": 7}},
+        )
+        self.assertEqual(result.status, DeliveryStatus.RETRY)
+        self.assertEqual(result.retry_after, 7)
+
+    def test_retry_after_header(self):
+        """
+        Тест заголовка Retry-After в секундах и в виде даты HTTP; некорректный заголовок не прерывает отправку.
+        """
+
+        result = self.send_with_response(429, headers={"Retry-After": "12"})
+        self.assertEqual(result.retry_after, 12)
+
+        moment = timezone.now() + timedelta(seconds=30)
+        result = self.send_with_response(429, headers={"Retry-After": format_datetime(moment, usegmt=True)})
+        self.assertTrue(0 < result.retry_after <= 30)
+
+        result = self.send_with_response(429, headers={"Retry-After": "скоро"})
+        self.assertEqual((result.status, result.retry_after), (DeliveryStatus.RETRY, None))
+
+    def test_server_error_is_retried(self):
+        """
+        Тест повторяемой ошибки сервера Telegram.
+        """
+
+        result = self.send_with_response(502)
+        self.assertEqual(result.status, DeliveryStatus.RETRY)
+
+    def test_client_error_is_permanent(self):
+        """
+        Тест постоянной ошибки запроса.
+        """
+
+        result = self.send_with_response(400, {"ok": False, "description": "Bad Request: chat not found"})
+        self.assertEqual(result.status, DeliveryStatus.FAILED)
+        self.assertEqual(result.error, "Bad Request: chat not found")
+
+    def test_timeout_is_retried(self):
+        """
+        Тест повторяемой ошибки по таймауту.
+        """
+
+        with mock.patch.object(self.engine.session, "post", side_effect=requests.Timeout("timeout")):
+            result = self.engine.send(self.message)
+        self.assertEqual(result.status, DeliveryStatus.RETRY)
+
+    def test_send_batch_keeps_order(self):
+        """
+        Тест сохранения порядка результатов пакетной отправки.
+        """
+
+        messages = [TelegramMessage(str(i), "Привет") for i in range(5)]
+        response = mock.Mock(status_code=200)
+        with mock.patch.object(self.engine.session, "post", return_value=response):
+            results = self.engine.send_batch(messages)
+        self.assertEqual([result.message for result in results], messages)
+
+
+@mock.patch("habits.outbox.time.sleep")
+class DrainOutboxTestCase(TestCase):
+    """
+    Тесты для отправки уведомлений из очереди.
+    """
+
+    def setUp(self):
+        self.engine = mock.Mock()
+        self.engine.send_batch.side_effect = lambda messages: [
+            DeliveryResult(message, DeliveryStatus.OK) for message in messages
+        ]
+        patcher = mock.patch("habits.outbox.get_delivery_engine", return_value=self.engine)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def enqueue(self, tg_chat_id, count):
+        NotificationOutbox.objects.bulk_create(
+            NotificationOutbox(tg_chat_id=tg_chat_id, text=f"Сообщение {i}", idempotency_key=f"{tg_chat_id}:{i}")
+            for i in range(count)
+        )
+
+    def test_sends_pending_notifications(self, mocked_sleep):
+        """
+        Тест отправки уведомлений и пометки их отправленными.
+        """
+
+        self.enqueue("1", 2)
+        self.enqueue("2", 1)
+
+        stats = drain_outbox()
+
+        self.assertEqual(stats["sent"], 3)
+        self.assertFalse(NotificationOutbox.objects.exclude(status=NotificationOutbox.STATUS_SENT).exists())
+        first_wave = self.engine.send_batch.call_args_list[0].args[0]
+        self.assertEqual(sorted(message.tg_chat_id for message in first_wave), ["1", "2"])
+        mocked_sleep.assert_called_once()
+
+    def test_per_chat_limit(self, mocked_sleep):
+        """
+        Тест ограничения количества сообщений в один чат за проход.
+        """
+
+        self.enqueue("1", 5)
+        with mock.patch("config.settings.TELEGRAM_PER_CHAT_LIMIT", 2):
+            stats = drain_outbox()
+        self.assertEqual(stats["sent"], 2)
+        self.assertEqual(NotificationOutbox.objects.filter(status=NotificationOutbox.STATUS_PENDING).count(), 3)
+
+    def test_retry_after_defers_remaining_waves(self, mocked_sleep):
+        """
+        Тест откладывания отправки на retry_after после ответа 429.
+        """
+
+        self.enqueue("1", 2)
+        self.engine.send_batch.side_effect = lambda messages: [
+            DeliveryResult(message, DeliveryStatus.RETRY, retry_after=15) for message in messages
+        ]
+
+        drain_outbox()
+
+        pending = NotificationOutbox.objects.filter(status=NotificationOutbox.STATUS_PENDING)
+        self.assertEqual(pending.count(), 2)
+        self.assertEqual(self.engine.send_batch.call_count, 1)
+        self.assertEqual(sorted(pending.values_list("attempts", flat=True)), [0, 1])
+        self.assertFalse(NotificationOutbox.objects.filter(next_attempt_at__lte=timezone.now()).exists())
+
+    def test_failed_and_exhausted_notifications(self, mocked_sleep):
+        """
+        Тест пометки недоставленными постоянных ошибок и исчерпавших попытки уведомлений.
+        """
+
+        self.enqueue("1", 1)
+        self.enqueue("2", 1)
+        NotificationOutbox.objects.filter(tg_chat_id="2").update(attempts=7)
+        self.engine.send_batch.side_effect = lambda messages: [
+            DeliveryResult(message, DeliveryStatus.FAILED if message.tg_chat_id == "1" else DeliveryStatus.RETRY)
+            for message in messages
+        ]
+
+        stats = drain_outbox()
+
+        self.assertEqual(stats["failed"], 2)
+
+    def test_error_keeps_delivered_waves(self, mocked_sleep):
+        """
+        Тест того, что ошибка отправки не откатывает статусы уже доставленных волн, захваченные записи
+        на время отправки уходят из очереди, а записи неначатых волн возвращаются в нее.
+        """
+
+        self.enqueue("1", 3)
+        calls = []
+
+        def send_batch(messages):
+            due = NotificationOutbox.objects.filter(
+                status=NotificationOutbox.STATUS_PENDING, next_attempt_at__lte=timezone.now(),
+            )
+            self.assertFalse(due.exists())
+            calls.append(messages)
+            if len(calls) == 2:
+                raise RuntimeError("Сбой воркера")
+            return [DeliveryResult(message, DeliveryStatus.OK) for message in messages]
+
+        self.engine.send_batch.side_effect = send_batch
+        with self.assertRaises(RuntimeError):
+            drain_outbox()
+
+        self.assertEqual(NotificationOutbox.objects.filter(status=NotificationOutbox.STATUS_SENT).count(), 1)
+        pending = NotificationOutbox.objects.filter(status=NotificationOutbox.STATUS_PENDING)
+        self.assertEqual(pending.filter(next_attempt_at__gt=timezone.now()).count(), 1)
+        self.assertEqual(pending.filter(next_attempt_at__lte=timezone.now()).count(), 1)
+
+    def test_purge_keeps_pending_and_recent_notifications(self, mocked_sleep):
+        """
+        Тест удаления порциями отправленных и недоставленных уведомлений старше срока хранения.
+        """
+
+        self.enqueue("1", 5)
+        notifications = list(NotificationOutbox.objects.order_by("id"))
+        old = timezone.now() - timedelta(days=31)
+        for notification, status_value, created_at in zip(notifications, [
+            NotificationOutbox.STATUS_SENT, NotificationOutbox.STATUS_FAILED, NotificationOutbox.STATUS_SENT,
+            NotificationOutbox.STATUS_PENDING, NotificationOutbox.STATUS_SENT,
+        ], [old, old, old, old, timezone.now()]):
+            NotificationOutbox.objects.filter(pk=notification.pk).update(status=status_value, created_at=created_at)
+
+        with mock.patch("config.settings.OUTBOX_RETENTION_DAYS", 0):
+            self.assertEqual(purge_outbox(), 0)
+        with mock.patch("config.settings.OUTBOX_RETENTION_DAYS", 30):
+            with mock.patch("config.settings.OUTBOX_PURGE_BATCH_SIZE", 2):
+                self.assertEqual(purge_outbox(), 3)
+        self.assertEqual(
+            list(NotificationOutbox.objects.order_by("id").values_list("pk", flat=True)),
+            [notifications[3].pk, notifications[4].pk],
+        )
+
+
+class FakeTelegramServerTestCase(SimpleTestCase):
+    """
+    Тесты для локальной замены API Telegram Bot.
+    """
+
+    def start_server(self, **kwargs):
+        server = FakeTelegramServer(**kwargs)
+        server.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server, TelegramDeliveryEngine(timeout=5, max_workers=4, base_url=server.url)
+
+    def test_delivers_messages(self):
+        """
+        Тест успешной отправки пакета сообщений.
+        """
+
+        server, engine = self.start_server()
+        results = engine.send_batch([TelegramMessage(str(i), "Привет") for i in range(10)])
+        self.assertTrue(all(result.status == DeliveryStatus.OK for result in results))
+        self.assertEqual(server.stats["ok"], 10)
+
+    def test_injects_rate_limits_and_errors(self):
+        """
+        Тест внедрения ответов 429 с retry_after и ошибок 5xx.
+        """
+
+        server, engine = self.start_server(error_429_rate=1, retry_after=3)
+        result = engine.send(TelegramMessage("1", "Привет"))
+        self.assertEqual((result.status, result.retry_after), (DeliveryStatus.RETRY, 3))
+
+        server.error_429_rate, server.error_5xx_rate = 0, 1
+        result = engine.send(TelegramMessage("1", "Привет"))
+        self.assertEqual((result.status, result.retry_after), (DeliveryStatus.RETRY, None))
+        self.assertEqual(server.stats, {"ok": 0, "rate_limited": 1, "errors": 1})
+
+
+def redis_available():
+    try:
+        return RedisTimingWheel().client.ping()
+    except redis.RedisError:
+        return False
+
+
+@skipUnless(redis_available(), "Redis недоступен")
+class TimingWheelTestCase(TestCase):
+    """
+    Тесты для расписания напоминаний в Redis.
+    """
+
+    def setUp(self):
+        self.now = datetime(2024, 7, 13, 10, 0, tzinfo=pytz.UTC)
+        self.wheel = RedisTimingWheel(key="test:habits:timing_wheel")
+        self.addCleanup(
+            self.wheel.client.delete,
+            self.wheel.key, self.wheel.rebuild_key, self.wheel.rebuilding_key, self.wheel.dirty_key,
+        )
+        patchers = [
+            mock.patch("config.settings.REMINDER_BACKEND", "redis"),
+            mock.patch("habits.timing_wheel._wheel", self.wheel),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.user = User.objects.create(email="tg@mail.com", username="tg", tg_chat_id="100")
+
+    def create_habit(self, next_fire_at, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Habit.objects.create(
+                owner=self.user, action="Зарядка", place="Дом", time=next_fire_at, next_fire_at=next_fire_at,
+                reward="Отдых", **kwargs,
+            )
+
+    def test_pop_due_is_atomic_and_ordered(self):
+        """
+        Тест выборки только наступивших напоминаний и их удаления из расписания.
+        """
+
+        self.wheel.schedule({1: self.now - timedelta(minutes=2), 2: self.now, 3: self.now + timedelta(minutes=1)})
+        self.assertEqual(self.wheel.pop_due(self.now, 10), [1, 2])
+        self.assertEqual(self.wheel.pop_due(self.now, 10), [])
+        self.assertEqual(len(self.wheel), 1)
+
+    def test_signals_keep_schedule_in_sync(self):
+        """
+        Тест синхронизации расписания при сохранении и удалении привычки.
+        """
+
+        habit = self.create_habit(self.now)
+        self.assertEqual(self.wheel.client.zscore(self.wheel.key, habit.pk), self.now.timestamp())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            habit.delete()
+        self.assertEqual(len(self.wheel), 0)
+
+    def test_dispatch_from_wheel(self):
+        """
+        Тест постановки наступивших напоминаний в очередь и возврата привычек в расписание с новым временем.
+        """
+
+        due = self.create_habit(self.now - timedelta(minutes=3))
+        stale = self.create_habit(self.now - timedelta(hours=2))
+        future = self.create_habit(self.now + timedelta(hours=1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            dispatched = dispatch_from_wheel(self.now, drain=False)
+
+        self.assertEqual(dispatched, 1)
+        self.assertEqual(list(NotificationOutbox.objects.values_list("habit", flat=True)), [due.pk])
+        for habit in (due, stale, future):
+            habit.refresh_from_db()
+            self.assertGreater(habit.next_fire_at, self.now)
+            self.assertEqual(self.wheel.client.zscore(self.wheel.key, habit.pk), habit.next_fire_at.timestamp())
+
+    def test_rebuild(self):
+        """
+        Тест пересборки расписания из базы данных.
+        """
+
+        habit = self.create_habit(self.now)
+        self.wheel.client.delete(self.wheel.key)
+        self.wheel.schedule({999: self.now})
+
+        call_command("rebuild_timing_wheel", stdout=StringIO())
+
+        self.assertEqual(self.wheel.client.zrange(self.wheel.key, 0, -1), [str(habit.pk).encode()])
+
+    def test_rebuild_keeps_changes_made_during_rebuild(self):
+        """
+        Тест того, что привычки, запланированные, удаленные и выбранные во время пересборки, не теряются
+        и не возвращаются в расписание.
+        """
+
+        self.wheel.schedule({1: self.now, 2: self.now, 3: self.now - timedelta(minutes=1)})
+
+        def rows():
+            yield 1, self.now
+            yield 2, self.now
+            yield 3, self.now - timedelta(minutes=1)
+            # Изменения расписания, пока строки читаются из базы данных.
+            self.wheel.schedule({4: self.now, 1: self.now + timedelta(hours=1)})
+            self.wheel.remove([2])
+            self.assertEqual(self.wheel.pop_due(self.now - timedelta(minutes=1), 10), [3])
+
+        self.assertEqual(self.wheel.rebuild(rows(), chunk_size=2), 2)
+        self.assertEqual(
+            self.wheel.client.zrange(self.wheel.key, 0, -1, withscores=True),
+            [(b"4", self.now.timestamp()), (b"1", (self.now + timedelta(hours=1)).timestamp())],
+        )
+
+        self.wheel.schedule({5: self.now})
+        self.assertFalse(self.wheel.client.exists(self.wheel.dirty_key, self.wheel.rebuilding_key))
+
+
+class PublishedFeedCacheTestCase(APITestCase):
+    """
+    Тесты для кэша ленты опубликованных привычек.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="tg@mail.com", username="tg")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.habit = Habit.objects.create(
+                owner=self.user, action="Зарядка", place="Дом", time=timezone.now(), reward="Отдых",
+            )
+            self.private = Habit.objects.create(
+                owner=self.user, action="Сон", place="Дом", time=timezone.now(), reward="Отдых", is_published=False,
+            )
+        self.url = reverse("habits:habits_published")
+
+    def test_second_request_is_served_from_cache(self):
+        """
+        Тест ответа из кэша без запросов к базе данных и счетчиков попаданий и промахов.
+        """
+
+        first = self.client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(self.url)
+
+        self.assertEqual(first["X-Cache"], "MISS")
+        self.assertEqual(second["X-Cache"], "HIT")
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(first.json(), second.json())
+        stats = StringIO()
+        call_command("published_cache_stats", stdout=stats)
+        self.assertIn("hits: 1, misses: 1", stats.getvalue())
+
+    def test_only_published_changes_invalidate_cache(self):
+        """
+        Тест сброса кэша при изменении опубликованной привычки и его сохранения при изменении скрытой.
+        """
+
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.private.action = "Чтение"
+            self.private.save()
+            self.habit.next_fire_at = timezone.now()
+            self.habit.save(update_fields=["next_fire_at"])
+        self.assertEqual(self.client.get(self.url)["X-Cache"], "HIT")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            habit = Habit.objects.get(pk=self.habit.pk)
+            habit.is_published = False
+            habit.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.json()["results"], [])
+
+    def test_stampede_waits_for_lock_holder(self):
+        """
+        Тест ожидания страницы, которую строит другой запрос, захвативший блокировку.
+        """
+
+        key = feed_cache.get_page_key("http://testserver/page")
+        cache.add(f"{key}:lock", 1)
+        build = mock.Mock(return_value={"results": []})
+
+        with mock.patch("habits.feed_cache.time.sleep", side_effect=lambda _: cache.set(key, {"results": [1]})):
+            data, hit = feed_cache.get_or_build("http://testserver/page", build)
+
+        self.assertEqual((data, hit), ({"results": [1]}, True))
+        build.assert_not_called()
+
+
+class QueryPlanTestCase(TestCase):
+    """
+    Тесты планов запросов к привычкам на заполненной таблице: ни один запрос не должен читать таблицу целиком.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now().replace(second=0, microsecond=0)
+        users = User.objects.bulk_create(
+            User(email=f"plan-{i}@mail.com", username=f"plan-{i}", tg_chat_id=str(i) if i % 2 else "")
+            for i in range(1000)
+        )
+        Habit.objects.bulk_create(
+            (
+                Habit(
+                    owner=users[i % len(users)], action=f"Привычка {i}", place="Дом", time=now, reward="Отдых",
+                    is_published=i % 10 == 0, next_fire_at=now + timedelta(minutes=i % 1440) if i % 2 else None,
+                )
+                for i in range(10000)
+            ),
+            batch_size=5000,
+        )
+        NotificationOutbox.objects.bulk_create(
+            (
+                NotificationOutbox(
+                    tg_chat_id="1", text="Напоминание", idempotency_key=f"plan:{i}",
+                    status=NotificationOutbox.STATUS_PENDING if i % 100 == 0 else NotificationOutbox.STATUS_SENT,
+                )
+                for i in range(10000)
+            ),
+            batch_size=5000,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE habits_habit, habits_notificationoutbox, users_user")
+        cls.now = now
+        cls.user = users[1]
+
+    def assertNoSeqScan(self, queryset, table="habits_habit"):
+        plan = queryset.explain()
+        self.assertNotIn(f"Seq Scan on {table}", plan, plan)
+
+    def test_published_feed(self):
+        """
+        Тест страниц ленты опубликованных привычек по частичному индексу.
+        """
+
+        published = Habit.objects.filter(is_published=True)
+        self.assertNoSeqScan(published.order_by("id")[:6])
+        self.assertNoSeqScan(published.filter(id__gt=published.order_by("id")[100].id).order_by("id")[:6])
+
+    def test_owner_list(self):
+        """
+        Тест страниц и валидаторов списка привычек пользователя по индексу (owner_id, id).
+        """
+
+        habits = Habit.objects.filter(owner=self.user)
+        self.assertNoSeqScan(habits.order_by("id")[:6])
+        self.assertNoSeqScan(habits.filter(id__gt=habits.order_by("id")[5].id).order_by("id")[:6])
+        self.assertNoSeqScan(habits.order_by().values("owner").annotate(count=Count("id"), last=Max("updated_at")))
+
+    def test_scheduler(self):
+        """
+        Тест выборки наступивших напоминаний и очереди уведомлений.
+        """
+
+        self.assertNoSeqScan(
+            get_due_habits(self.now).order_by("next_fire_at", "owner_id", "id")[:1000]
+        )
+        self.assertNoSeqScan(
+            NotificationOutbox.objects.filter(status=NotificationOutbox.STATUS_PENDING,
+                                              next_attempt_at__lte=timezone.now())
+            .order_by("next_attempt_at", "id")[:300],
+            table="habits_notificationoutbox",
+        )
+
+
+class QueryBudgetMixin:
+    """
+    Проверка бюджета запросов к базе данных: эндпоинт выполняет фиксированное количество запросов
+    независимо от объема данных.
+    """
+
+    def assertQueryBudget(self, budget, request, grow=None):
+        """
+        Проверяет, что request() выполняет ровно budget запросов, а после grow() — столько же.
+
+        Параметры:
+        budget (int): допустимое количество запросов.
+        request (callable): выполняет запрос к эндпоинту и возвращает ответ.
+        grow (callable): добавляет данные, от объема которых не должно зависеть количество запросов.
+        """
+
+        for _ in range(2 if grow else 1):
+            with self.assertNumQueries(budget):
+                response = request()
+            self.assertLess(response.status_code, 400, getattr(response, "data", None))
+            if grow:
+                grow()
+                grow = None
+
+
+class QueryBudgetTestCase(QueryBudgetMixin, APITestCase):
+    """
+    Тесты бюджетов запросов эндпоинтов привычек и пользователей.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="tg@mail.com", username="tg", tg_chat_id="100")
+        self.client.force_authenticate(user=self.user)
+        self.pleasant = Habit.objects.create(
+            owner=self.user, action="Чай", place="Кухня", time=timezone.now(), pleasant_habit_sign=True,
+        )
+        self.habit = Habit.objects.create(
+            owner=self.user, action="Зарядка", place="Дом", time=timezone.now(), related_habit=self.pleasant,
+        )
+
+    def grow_habits(self):
+        users = User.objects.bulk_create(
+            User(email=f"grow-{i}@mail.com", username=f"grow-{i}", tg_chat_id=str(i)) for i in range(10)
+        )
+        Habit.objects.bulk_create(
+            Habit(owner=owner, action="Бег", place="Парк", time=timezone.now(),
+                  related_habit=self.pleasant if owner == self.user else None)
+            for owner in users + [self.user] * 10
+        )
+
+    def test_habit_endpoints(self):
+        """
+        Тест фиксированного количества запросов эндпоинтов привычек.
+        """
+
+        self.assertQueryBudget(2, lambda: self.client.get(reverse("habits:habits_list")), self.grow_habits)
+        self.assertQueryBudget(1, lambda: self.client.get(reverse("habits:habits_published")))
+        self.assertQueryBudget(1, lambda: self.client.get(reverse("habits:habit_retrieve", args=(self.habit.pk,))))
+        self.assertQueryBudget(
+            6, lambda: self.client.patch(reverse("habits:habit_update", args=(self.habit.pk,)), {"place": "Сад"}),
+        )
+        self.assertQueryBudget(
+            3, lambda: self.client.post(reverse("habits:create"), {
+                "action": "Прогулка", "place": "Парк", "time": "2024-07-13T10:00:00Z", "reward": "Отдых",
+            }),
+        )
+        self.assertQueryBudget(6, lambda: self.client.delete(reverse("habits:habit_delete", args=(self.habit.pk,))))
+
+    def test_user_endpoints(self):
+        """
+        Тест фиксированного количества запросов эндпоинтов пользователей.
+        """
+
+        self.assertQueryBudget(1, lambda: self.client.get(reverse("users:users_list")), self.grow_habits)
+        self.assertQueryBudget(3, lambda: self.client.get(reverse("users:user_retrieve", args=(self.user.pk,))))
+
+
+class HabitsBulkTestCase(QueryBudgetMixin, APITestCase):
+    """
+    Тесты для пакетного создания, изменения и удаления привычек.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="tg@mail.com", username="tg", tg_chat_id="100")
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("habits:habits_bulk")
+
+    def make_items(self, count):
+        return [
+            {"action": f"Привычка {i}", "place": "Дом", "time": "2024-07-13T10:00:00Z", "reward": "Отдых"}
+            for i in range(count)
+        ]
+
+    def test_bulk_create(self):
+        """
+        Тест создания пакета привычек текущего пользователя фиксированным количеством запросов.
+        """
+
+        self.assertQueryBudget(3, lambda: self.client.post(self.url, self.make_items(5), format="json"))
+        self.assertQueryBudget(3, lambda: self.client.post(self.url, self.make_items(50), format="json"))
+
+        self.assertEqual(Habit.objects.filter(owner=self.user, next_fire_at__isnull=False).count(), 55)
+
+        version = feed_cache.get_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.url, self.make_items(1), format="json")
+        self.assertEqual(feed_cache.get_version(), version + 1)
+
+    def test_bulk_create_reports_item_errors(self):
+        """
+        Тест ошибок по элементам пакета: некорректный пакет не записывается целиком.
+        """
+
+        items = self.make_items(3)
+        items[1]["duration"] = "00:05:00"
+        items[2].update(reward=None, related_habit=999999, pleasant_habit_sign=True)
+
+        response = self.client.post(self.url, items, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = response.json()
+        self.assertEqual(errors[0], {})
+        self.assertIn("non_field_errors", errors[1])
+        self.assertIn("non_field_errors", errors[2])
+        self.assertFalse(Habit.objects.exists())
+
+    def test_related_habits_resolved_in_one_query(self):
+        """
+        Тест загрузки связанных привычек всего пакета одним запросом с ошибкой для несуществующего ID.
+        """
+
+        pleasant = Habit.objects.create(
+            owner=self.user, action="Чай", place="Кухня", time=timezone.now(), pleasant_habit_sign=True,
+        )
+        other = User.objects.create(email="other@mail.com", username="other")
+        foreign = Habit.objects.create(
+            owner=other, action="Чай", place="Кухня", time=timezone.now(), pleasant_habit_sign=True,
+        )
+        validated = [{"related_habit": pleasant.pk}, {"related_habit": pleasant.pk}, {"related_habit": 999999}, {},
+                     {"related_habit": foreign.pk}]
+        errors = [{}, {}, {}, {}, {}]
+
+        with self.assertNumQueries(1):
+            resolve_related_habits(validated, errors, self.user.id)
+
+        self.assertEqual(validated[:2], [{"related_habit": pleasant}] * 2)
+        self.assertEqual(errors[:2] + errors[3:4], [{}, {}, {}])
+        self.assertIn("related_habit", errors[2])
+        self.assertIn("related_habit", errors[4])
+
+    def test_related_habit_rules(self):
+        """
+        Тест проверки связанной привычки пакета: чужая привычка не найдена, неприятная привычка отклоняется
+        правилом сериализатора, нарушение ограничения базы данных возвращается для своего элемента.
+        """
+
+        unpleasant = Habit.objects.create(owner=self.user, action="Бег", place="Парк", time=timezone.now(),
+                                          reward="Отдых")
+        other = User.objects.create(email="other@mail.com", username="other")
+        foreign = Habit.objects.create(
+            owner=other, action="Чай", place="Кухня", time=timezone.now(), pleasant_habit_sign=True,
+        )
+        items = self.make_items(3)
+        items[1].update(reward=None, related_habit=foreign.pk)
+        items[2].update(reward=None, related_habit=unpleasant.pk)
+
+        errors = self.client.post(self.url, items, format="json").json()
+        self.assertEqual(errors[0], {})
+        self.assertIn("related_habit", errors[1])
+        self.assertEqual(errors[2], {"non_field_errors": [PleasantHabitValidator.message]})
+
+        response = self.client.patch(self.url, [{"id": unpleasant.pk, "place": "Сад"},
+                                                {"id": unpleasant.pk, "related_habit": unpleasant.pk}], format="json")
+        self.assertIn(PleasantHabitValidator.message, response.json()[1]["non_field_errors"])
+
+        with mock.patch.object(HabitBulkSerializer.Meta, "validators", []):
+            errors = self.client.post(self.url, items[::2], format="json").json()
+        self.assertEqual(errors, [{}, {"non_field_errors": [PleasantHabitValidator.message]}])
+        self.assertEqual(Habit.objects.count(), 2)
+
+    def test_bulk_update_and_delete(self):
+        """
+        Тест изменения и удаления пакета привычек только текущего пользователя.
+        """
+
+        self.client.post(self.url, self.make_items(3), format="json")
+        other = User.objects.create(email="other@mail.com", username="other")
+        foreign = Habit.objects.create(owner=other, action="Бег", place="Парк", time=timezone.now(), reward="Отдых")
+        ids = list(Habit.objects.filter(owner=self.user).values_list("id", flat=True))
+
+        response = self.client.patch(self.url, [{"id": ids[0], "place": "Сад"}, {"id": foreign.pk}], format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()[0], {})
+
+        self.assertQueryBudget(
+            6, lambda: self.client.patch(self.url, [{"id": pk, "place": "Сад"} for pk in ids], format="json"),
+        )
+        self.assertEqual(Habit.objects.filter(place="Сад").count(), 3)
+
+        response = self.client.delete(self.url, ids[:2] + [foreign.pk], format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.delete(self.url, ids[:2], format="json")
+        self.assertEqual(response.json(), {"deleted": 2})
+        self.assertEqual(list(Habit.objects.filter(owner=self.user).values_list("id", flat=True)), ids[2:])
+
+
+class HabitConstraintsTestCase(APITestCase):
+    """
+    Тесты ограничений и триггеров привычек в базе данных.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="tg@mail.com", username="tg")
+        self.other = User.objects.create(email="other@mail.com", username="other")
+        self.client.force_authenticate(user=self.user)
+        self.pleasant = Habit.objects.create(
+            owner=self.user, action="Чай", place="Кухня", time=timezone.now(), pleasant_habit_sign=True,
+        )
+        self.useful = Habit.objects.create(owner=self.user, action="Бег", place="Парк", time=timezone.now())
+        self.foreign = Habit.objects.create(
+            owner=self.other, action="Кофе", place="Кафе", time=timezone.now(), pleasant_habit_sign=True,
+        )
+
+    def test_check_constraints_map_to_validator_messages(self):
+        """
+        Тест проверок в базе данных и их сообщений валидаторов.
+        """
+
+        cases = [
+            ({"duration": timedelta(minutes=5)}, DurationValidator.message),
+            ({"periodicity": 0}, PeriodicityValidator.min_message),
+            ({"periodicity": 8}, PeriodicityValidator.message),
+            ({"reward": "Отдых", "related_habit": self.pleasant}, RelatedHabitValidator.message),
+        ]
+        for values, message in cases:
+            with self.subTest(values=values):
+                with self.assertRaises(ValidationError) as error:
+                    with constraint_validation():
+                        Habit.objects.filter(pk=self.useful.pk).update(**values)
+                self.assertEqual(error.exception.detail["non_field_errors"], [message])
+
+    def test_related_habit_must_be_pleasant_habit_of_same_owner(self):
+        """
+        Тест триггеров: связанная привычка должна быть приятной привычкой того же пользователя.
+        """
+
+        url = reverse("habits:habits_bulk")
+        item = {"action": "Зарядка", "place": "Дом", "time": "2024-07-13T10:00:00Z"}
+
+        with mock.patch.object(HabitBulkSerializer.Meta, "validators", []):
+            response = self.client.post(url, [{**item, "related_habit": self.useful.pk}], format="json")
+        self.assertEqual(response.json(), [{"non_field_errors": [PleasantHabitValidator.message]}])
+        with self.assertRaises(ValidationError) as error:
+            with constraint_validation():
+                Habit.objects.create(**item, owner=self.user, related_habit=self.foreign)
+        self.assertEqual(error.exception.detail["non_field_errors"], [PleasantHabitValidator.owner_message])
+        response = self.client.post(url, [{**item, "related_habit": self.pleasant.pk}], format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        with self.assertRaises(ValidationError):
+            with constraint_validation():
+                Habit.objects.filter(pk=self.pleasant.pk).update(pleasant_habit_sign=False)
+
+
+class HabitConstraintsConcurrencyTestCase(TransactionTestCase):
+    """
+    Тесты триггеров привычек при параллельных транзакциях.
+    """
+
+    def test_related_habit_change_waits_for_reference(self):
+        """
+        Тест того, что снятие признака приятной привычки ждет транзакцию, которая ссылается на нее,
+        и отклоняется после ее фиксации.
+        """
+
+        user = User.objects.create(email="tg@mail.com", username="tg")
+        pleasant = Habit.objects.create(
+            owner=user, action="Чай", place="Кухня", time=timezone.now(), pleasant_habit_sign=True,
+        )
+        errors = []
+
+        def unset_pleasant():
+            try:
+                Habit.objects.filter(pk=pleasant.pk).update(pleasant_habit_sign=False)
+            except IntegrityError as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        with transaction.atomic():
+            Habit.objects.create(owner=user, action="Бег", place="Парк", time=timezone.now(), related_habit=pleasant)
+            thread = threading.Thread(target=unset_pleasant)
+            thread.start()
+            thread.join(timeout=0.5)
+            # Изменение связанной привычки заблокировано FOR SHARE до фиксации ссылки.
+            self.assertTrue(thread.is_alive())
+        thread.join()
+
+        self.assertEqual(len(errors), 1)
+        pleasant.refresh_from_db()
+        self.assertTrue(pleasant.pleasant_habit_sign)
+
+
+class HabitsExportTestCase(APITestCase):
+    """
+    Тесты потоковой выгрузки привычек.
+    """
+
+    def setUp(self):
+        """
+        Создание пользователей с привычками и аутентификация клиента.
+        """
+
+        self.user = User.objects.create(email="export@mail.com", username="export", tg_chat_id="1")
+        self.other = User.objects.create(email="other@mail.com", username="other", tg_chat_id="2")
+        self.client.force_authenticate(user=self.user)
+        Habit.objects.bulk_create(
+            Habit(owner=owner, action=f"Привычка {i}", place="Дом", time=timezone.now(), reward="Чай",
+                  is_published=i % 2 == 0)
+            for i, owner in enumerate([self.user] * 5 + [self.other] * 3)
+        )
+        self.url = reverse("habits:habits_export")
+
+    def read_ndjson(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+
+    def test_export_ndjson(self):
+        """
+        Тест выгрузки привычек пользователя в формате NDJSON в том же виде, что и HabitSerializer.
+        """
+
+        rows = self.read_ndjson(self.client.get(self.url))
+        expected = HabitSerializer(Habit.objects.filter(owner=self.user).order_by("id"), many=True).data
+        self.assertEqual(rows, json.loads(JSONRenderer().render(expected)))
+
+    def test_export_csv(self):
+        """
+        Тест выгрузки привычек пользователя в формате CSV.
+        """
+
+        response = self.client.get(self.url, HTTP_ACCEPT="text/csv")
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="habits.csv"')
+        rows = list(csv.DictReader(b"".join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual({row["owner"] for row in rows}, {str(self.user.pk)})
+
+    def test_export_published(self):
+        """
+        Тест выгрузки всех опубликованных привычек: доступна только администратору.
+        """
+
+        response = self.client.get(self.url, {"scope": "published"})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        rows = self.read_ndjson(self.client.get(self.url, {"scope": "published"}))
+        self.assertEqual(len(rows), Habit.objects.filter(is_published=True).count())
+        self.assertTrue(all(row["is_published"] for row in rows))
+
+    def test_export_command(self):
+        """
+        Тест команды выгрузки привычек пользователя небольшими порциями курсора.
+        """
+
+        with tempfile.NamedTemporaryFile() as output:
+            call_command("export_habits", owner="other@mail.com", chunk_size=2, output=output.name, stderr=StringIO())
+            rows = [json.loads(line) for line in output.read().splitlines()]
+        self.assertEqual(len(rows), 3)
+        self.assertEqual({row["owner"] for row in rows}, {self.other.pk})
+
+
+class HabitsExportCursorTestCase(TransactionTestCase):
+    """
+    Тесты серверного курсора выгрузки вне транзакции теста (режим autocommit, как в запросе).
+    """
+
+    def test_cursor_is_not_holdable(self):
+        """
+        Тест того, что выгрузка читает курсор без WITH HOLD, и PostgreSQL выдает строки до окончания запроса.
+        """
+
+        user = User.objects.create(email="export@mail.com", username="export")
+        Habit.objects.bulk_create(
+            Habit(owner=user, action=f"Привычка {i}", place="Дом", time=timezone.now()) for i in range(3)
+        )
+        self.assertTrue(connection.get_autocommit())
+        lines = export.export_habits(export.get_export_queryset(owner_id=user.pk), "ndjson", chunk_size=1)
+        next(lines)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT is_holdable FROM pg_cursors")
+            self.assertEqual(cursor.fetchall(), [(False,)])
+        self.assertEqual(len(list(lines)), 2)
+        self.assertTrue(connection.get_autocommit())
+
+
+class HabitsImportTestCase(APITestCase):
+    """
+    Тесты импорта привычек через COPY.
+    """
+
+    def setUp(self):
+        """
+        Создание пользователей и аутентификация администратора.
+        """
+
+        cache.clear()
+        self.admin = User.objects.create(email="admin@mail.com", username="admin", is_staff=True)
+        self.user = User.objects.create(email="import@mail.com", username="import", tg_chat_id="1")
+        self.client.force_authenticate(user=self.admin)
+
+    def test_import_csv(self):
+        """
+        Тест импорта CSV: корректные строки загружаются пакетами, некорректные попадают в отчет с номером строки.
+        """
+
+        content = (
+            "owner,action,place,time,periodicity,reward,duration,is_published\n"
+            + "import@mail.com,Бег,Парк,2024-07-13T10:00:00Z,2,Чай,90,\n" * 5
+            + 'import@mail.com,"Бег\\t""с табом""\tи\\\\слэшем",Дом,2024-07-13T10:00:00Z,,,,false\n'
+            + "admin@mail.com,Чтение,Дом,2024-07-13T10:00:00Z,,,,\n"
+            + "nobody@mail.com,Бег,Парк,2024-07-13T10:00:00Z,,,,\n"
+            + "import@mail.com,Бег,Парк,2024-07-13T10:00:00Z,9,,,\n"
+            + "import@mail.com,Бег,Парк,2024-07-13T10:00:00Z,,,300,\n"
+            + "import@mail.com,,Парк,неверно,,,,\n"
+        )
+        version = feed_cache.get_version()
+        with tempfile.NamedTemporaryFile(suffix=".csv") as source:
+            source.write(content.encode())
+            source.flush()
+            with CaptureQueriesContext(connection) as queries:
+                with self.captureOnCommitCallbacks(execute=True):
+                    report = HabitImporter(batch_size=4).run(open(source.name, "rb"), "csv")
+
+        self.assertEqual((report["imported"], report["rejected"]), (7, 4))
+        self.assertEqual([reject["line"] for reject in report["rejects"]], [9, 10, 11, 12])
+        self.assertEqual(report["rejects"][0]["errors"], {"owner": [OWNER_NOT_FOUND]})
+        self.assertEqual(report["rejects"][1]["errors"], {"non_field_errors": [PeriodicityValidator.message]})
+        self.assertEqual(report["rejects"][2]["errors"], {"non_field_errors": [DurationValidator.message]})
+        self.assertEqual(set(report["rejects"][3]["errors"]), {"action", "time"})
+        # Пользователи пакета ищутся одним запросом, строки загружаются четырьмя запросами на пакет.
+        self.assertLessEqual(len(queries), 5 * 3)
+
+        habits = Habit.objects.filter(owner=self.user).order_by("id")
+        self.assertEqual(habits.count(), 6)
+        self.assertEqual(habits[0].duration, timedelta(seconds=90))
+        self.assertTrue(all(habit.next_fire_at for habit in habits))
+        self.assertEqual(habits.last().action, 'Бег\\t"с табом"\tи\\\\слэшем')
+        self.assertFalse(habits.last().is_published)
+        self.assertIsNone(Habit.objects.get(owner=self.admin).next_fire_at)
+        self.assertNotEqual(feed_cache.get_version(), version)
+
+    def test_import_constraint_error_per_row(self):
+        """
+        Тест того, что при нарушении ограничения базы данных отклоняется только нарушившая его строка пакета.
+        """
+
+        content = (
+            "owner,action,place,time,periodicity\n"
+            "import@mail.com,Бег,Парк,2024-07-13T10:00:00Z,2\n"
+            "import@mail.com,Бег,Парк,2024-07-13T10:00:00Z,9\n"
+            "import@mail.com,Бег,Парк,2024-07-13T10:00:00Z,3\n"
+        )
+        importer = HabitImporter(batch_size=10)
+        # Правила сериализатора отключены, чтобы строку отклонило ограничение в базе данных.
+        importer.validators = []
+        report = importer.run(BytesIO(content.encode()), "csv")
+
+        self.assertEqual((report["imported"], report["rejected"]), (2, 1))
+        self.assertEqual(report["rejects"], [
+            {"line": 3, "errors": {"non_field_errors": [PeriodicityValidator.message]}},
+        ])
+        self.assertEqual(
+            sorted(Habit.objects.filter(owner=self.user).values_list("periodicity", flat=True)), [2, 3]
+        )
+
+    def test_import_endpoint(self):
+        """
+        Тест загрузки файла NDJSON администратором; остальным пользователям импорт недоступен.
+        """
+
+        url = reverse("habits:habits_import")
+        lines = [
+            json.dumps({"owner": "import@mail.com", "action": "Бег", "place": "Парк", "time": "2024-07-13T10:00:00Z"}),
+            "{не json",
+            json.dumps({"owner": "import@mail.com", "action": "Чай", "place": "Дом", "time": "2024-07-13T10:00:00Z",
+                        "pleasant_habit_sign": True, "reward": "Торт"}),
+        ]
+        upload = SimpleUploadedFile("habits.ndjson", "\n".join(lines).encode())
+        response = self.client.post(url, {"file": upload}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data["imported"], response.data["rejected"]), (1, 2))
+        self.assertEqual(response.data["rejects"][1], {
+            "line": 3, "errors": {"non_field_errors": [RewardValidator.message]},
+        })
+        self.assertEqual(Habit.objects.filter(owner=self.user).count(), 1)
+
+        self.client.force_authenticate(user=self.user)
+        upload = SimpleUploadedFile("habits.ndjson", lines[0].encode())
+        response = self.client.post(url, {"file": upload}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class HabitCompletionTestCase(APITestCase):
+    """
+    Тесты отметок о выполнении привычек в секционированной по месяцам таблице.
+    """
+
+    def setUp(self):
+        """
+        Создание пользователей с привычками и аутентификация клиента.
+        """
+
+        self.user = User.objects.create(email="done@mail.com", username="done", tg_chat_id="1")
+        other = User.objects.create(email="other@mail.com", username="other", tg_chat_id="2")
+        self.client.force_authenticate(user=self.user)
+        self.habit = Habit.objects.create(owner=self.user, action="Бег", place="Парк", time=timezone.now())
+        self.foreign = Habit.objects.create(owner=other, action="Бег", place="Парк", time=timezone.now())
+        self.url = reverse("habits:habit_complete", args=(self.habit.pk,))
+
+    def get_partition(self, completion_id):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT tableoid::regclass::text FROM habits_habitcompletion WHERE id = %s",
+                           [completion_id])
+            return cursor.fetchone()[0]
+
+    def test_complete(self):
+        """
+        Тест отметки о выполнении: запись попадает в секцию своего месяца, чужая привычка не найдена.
+        """
+
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.get_partition(response.data["id"]), partition_name(month_start(timezone.now())))
+
+        response = self.client.post(reverse("habits:habit_complete", args=(self.foreign.pk,)))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.post(self.url, {"completed_at": timezone.now() + timedelta(hours=1)})
+        self.assertEqual(response.data, {"completed_at": [CompletionTimeValidator.future_message]})
+
+    def test_missing_partition(self):
+        """
+        Тест записи в месяц без секции: отметка отклоняется, секция при записи не создается.
+        """
+
+        completed_at = add_months(month_start(timezone.now()), -24)
+        message = CompletionTimeValidator.partition_message.format(completed_at)
+        response = self.client.post(self.url, {"completed_at": completed_at})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {"completed_at": [message]})
+
+        items = [{"habit": self.habit.pk}, {"habit": self.habit.pk, "completed_at": completed_at.isoformat()}]
+        response = self.client.post(reverse("habits:habit_completions_bulk"), items, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), [{}, {"completed_at": [message]}])
+        self.assertNotIn(partition_name(completed_at), list_partitions())
+        self.assertFalse(HabitCompletion.objects.exists())
+
+        ensure_partitions([completed_at])
+        response = self.client.post(self.url, {"completed_at": completed_at})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.get_partition(response.data["id"]), partition_name(completed_at))
+
+    def test_list_range(self):
+        """
+        Тест выборки отметок за период: только отметки привычки пользователя и только секции периода.
+        """
+
+        now = timezone.now()
+        HabitCompletion.objects.bulk_create(
+            [HabitCompletion(habit=self.habit, owner=self.user, completed_at=now - timedelta(days=days))
+             for days in (0, 1, 2, 40)]
+            + [HabitCompletion(habit=self.foreign, owner=self.foreign.owner, completed_at=now)]
+        )
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.data["results"]), 3)
+        response = self.client.get(self.url, {"since": (now - timedelta(days=50)).isoformat(), "page_size": 2})
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertEqual(len(self.client.get(response.data["next"]).data["results"]), 2)
+        response = self.client.get(reverse("habits:habit_complete", args=(self.foreign.pk,)))
+        self.assertEqual(response.data["results"], [])
+
+        start = month_start(now)
+        plan = HabitCompletion.objects.filter(
+            habit=self.habit, completed_at__gte=start, completed_at__lt=add_months(start, 1),
+        ).explain()
+        self.assertIn(partition_name(start), plan)
+        self.assertNotIn(partition_name(add_months(start, 1)), plan)
+
+    def test_bulk_complete(self):
+        """
+        Тест пакетной записи отметок одним INSERT; пакет с ошибкой не записывается.
+        """
+
+        url = reverse("habits:habit_completions_bulk")
+        now = timezone.now()
+        response = self.client.post(url, [{"habit": self.habit.pk}, {"habit": self.foreign.pk}], format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), [{}, {"habit": ["Привычка не найдена."]}])
+        self.assertFalse(HabitCompletion.objects.exists())
+
+        items = [{"habit": self.habit.pk, "completed_at": (now - timedelta(days=day)).isoformat()} for day in range(5)]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, items, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(sum(query["sql"].startswith('INSERT INTO "habits_habitcompletion"') for query in queries), 1)
+        self.assertEqual(HabitCompletion.objects.filter(habit=self.habit).count(), 5)
+
+    def test_maintain_partitions(self):
+        """
+        Тест задачи обслуживания секций: создание секций вперед и отсоединение старых секций.
+        """
+
+        now = timezone.now()
+        old = add_months(month_start(now), -6)
+        ensure_partitions([old])
+        save_completions([HabitCompletion(habit=self.habit, owner=self.user, completed_at=old)])
+        # Отложенные проверки внешних ключей записанной отметки выполняются до отсоединения секции.
+        connection.check_constraints()
+        with mock.patch("config.settings.COMPLETION_PARTITIONS_AHEAD", 5), \
+                mock.patch("config.settings.COMPLETION_RETENTION_MONTHS", 3):
+            result = maintain_completion_partitions()
+        self.assertIn(partition_name(add_months(month_start(now), 5)), result["created"])
+        self.assertIn(partition_name(old), result["detached"])
+        self.assertNotIn(partition_name(old), list_partitions())
+        self.assertIn(partition_name(add_months(month_start(now), -1)), list_partitions())
+        self.assertFalse(HabitCompletion.objects.filter(completed_at=old).exists())
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT count(*) FROM {partition_name(old)}")
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_delete_with_detached_completions(self):
+        """
+        Тест удаления привычки и пользователя с отметками в отсоединенной секции.
+        """
+
+        old = add_months(month_start(timezone.now()), -6)
+        ensure_partitions([old])
+        save_completions([HabitCompletion(habit=self.habit, owner=self.user, completed_at=old)])
+        # Отложенные проверки внешних ключей записанной отметки выполняются до отсоединения секции.
+        connection.check_constraints()
+        detach_partitions(add_months(old, 1))
+        self.habit.delete()
+        self.user.delete()
+        connection.check_constraints()
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT count(*) FROM {partition_name(old)}")
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+
+class HabitStatsTestCase(QueryBudgetMixin, APITestCase):
+    """
+    Тесты статистики выполнения привычек.
+    """
+
+    def setUp(self):
+        """
+        Создание пользователя с привычками и аутентификация клиента.
+        """
+
+        self.user = User.objects.create(email="stats@mail.com", username="stats", tg_chat_id="1")
+        self.client.force_authenticate(user=self.user)
+        self.habit = Habit.objects.create(owner=self.user, action="Бег", place="Парк", time=timezone.now())
+        self.weekly = Habit.objects.create(owner=self.user, action="Бассейн", place="Спорткомплекс",
+                                           time=timezone.now(), periodicity=3)
+        self.now = timezone.now()
+        self.today = timezone.localdate(self.now)
+
+    def complete(self, habit, *days_ago):
+        response = self.client.post(reverse("habits:habit_completions_bulk"), [
+            {"habit": habit.pk, "completed_at": (self.now - timedelta(days=days)).isoformat()} for days in days_ago
+        ], format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+
+    def get_stats(self, habit):
+        return HabitStats.objects.values(
+            "current_streak", "longest_streak", "total_completions", "last_completed_on", "window_end", "day_counts",
+        ).get(habit=habit)
+
+    def test_streaks_and_windows(self):
+        """
+        Тест серий и выполнений за 7 и 30 дней: разрыв серии зависит от периодичности привычки.
+        """
+
+        self.complete(self.habit, 10, 9, 8, 8, 5, 4)
+        self.complete(self.habit, 3, 1, 0)
+        response = self.client.get(reverse("habits:habit_stats", args=(self.habit.pk,)))
+        self.assertEqual(response.data, {
+            "habit": self.habit.pk, "current_streak": 2, "longest_streak": 3, "total_completions": 9,
+            "last_completed_on": self.today, "completions_7d": 5, "completions_30d": 9,
+        })
+        self.complete(self.weekly, 12, 9, 6, 3)
+        data = stats.get_stats_data(HabitStats.objects.get(habit=self.weekly), self.weekly.periodicity, self.today)
+        self.assertEqual((data["current_streak"], data["longest_streak"]), (4, 4))
+        data = stats.get_stats_data(HabitStats.objects.get(habit=self.weekly), self.weekly.periodicity,
+                                    self.today + timedelta(days=1))
+        self.assertEqual((data["current_streak"], data["completions_7d"]), (0, 1))
+        self.assertEqual(stats.get_stats_data(None, 1, self.today)["total_completions"], 0)
+
+    def test_incremental_matches_rebuild(self):
+        """
+        Тест совпадения статистики, обновляемой при записи отметок, в том числе задним числом,
+        со статистикой, пересчитанной по истории.
+        """
+
+        for days in ([40, 35], [20, 19, 18], [2], [19, 5], [1, 0, 0], [45]):
+            self.complete(self.habit, *days)
+        incremental = self.get_stats(self.habit)
+        call_command("rebuild_habit_stats", habit=[self.habit.pk], stdout=StringIO())
+        self.assertEqual(self.get_stats(self.habit), incremental)
+        self.assertEqual(incremental["total_completions"], 12)
+        self.assertEqual(incremental["longest_streak"], 3)
+
+    def test_query_budget(self):
+        """
+        Тест фиксированного количества запросов записи отметок и чтения статистики.
+        """
+
+        url = reverse("habits:habit_completions_bulk")
+        self.assertQueryBudget(
+            10, lambda: self.client.post(url, [{"habit": self.habit.pk}, {"habit": self.weekly.pk}], format="json"),
+        )
+        self.assertQueryBudget(
+            10, lambda: self.client.post(url, [{"habit": self.habit.pk}] * 20 + [{"habit": self.weekly.pk}] * 20,
+                                         format="json"),
+        )
+        self.assertQueryBudget(1, lambda: self.client.get(reverse("habits:habit_stats", args=(self.habit.pk,))))
+        self.assertQueryBudget(1, lambda: self.client.get(reverse("habits:habits_stats")))
+
+    def test_summary(self):
+        """
+        Тест сводной статистики привычек пользователя; статистика чужой привычки недоступна.
+        """
+
+        self.complete(self.habit, 2, 1, 0)
+        self.complete(self.weekly, 20)
+        response = self.client.get(reverse("habits:habits_stats"))
+        self.assertEqual(response.data, {
+            "habits": 2, "total_completions": 4, "completions_7d": 3, "completions_30d": 4,
+            "active_streaks": 1, "best_current_streak": 3, "longest_streak": 3,
+        })
+        foreign = Habit.objects.create(owner=User.objects.create(email="x@mail.com", username="x"), action="Бег",
+                                       place="Парк", time=timezone.now())
+        response = self.client.get(reverse("habits:habit_stats", args=(foreign.pk,)))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
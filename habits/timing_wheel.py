@@ -0,0 +1,203 @@
+import redis
+
+from config import settings
+
+# Пока идет пересборка (существует ключ KEYS[2]), каждый изменивший расписание скрипт записывает ID привычек
+# в множество KEYS[3], чтобы REBUILD_SWAP_SCRIPT перенес эти изменения в новое расписание.
+MARK_DIRTY = """
+local function mark_dirty(members)
+    if #members > 0 and redis.call('EXISTS', KEYS[2]) == 1 then
+        redis.call('SADD', KEYS[3], unpack(members))
+    end
+end
+"""
+
+# Атомарно выбирает и удаляет из множества участников со временем не позже ARGV[1], не больше ARGV[2] штук.
+POP_DUE_SCRIPT = MARK_DIRTY + """
+local members = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+if #members > 0 then
+    redis.call('ZREM', KEYS[1], unpack(members))
+end
+mark_dirty(members)
+return members
+"""
+
+# Добавляет или переносит участников: ARGV — пары (вес, участник).
+SCHEDULE_SCRIPT = MARK_DIRTY + """
+redis.call('ZADD', KEYS[1], unpack(ARGV))
+local members = {}
+for i = 2, #ARGV, 2 do
+    members[#members + 1] = ARGV[i]
+end
+mark_dirty(members)
+"""
+
+# Удаляет участников ARGV.
+REMOVE_SCRIPT = MARK_DIRTY + """
+redis.call('ZREM', KEYS[1], unpack(ARGV))
+mark_dirty(ARGV)
+"""
+
+# Переносит в пересобранное множество KEYS[4] участников, измененных во время пересборки, с их текущим весом
+# (или удаляет их, если в расписании их больше нет) и атомарно подменяет им расписание KEYS[1].
+REBUILD_SWAP_SCRIPT = """
+for _, member in ipairs(redis.call('SMEMBERS', KEYS[3])) do
+    local score = redis.call('ZSCORE', KEYS[1], member)
+    if score then
+        redis.call('ZADD', KEYS[4], score, member)
+    else
+        redis.call('ZREM', KEYS[4], member)
+    end
+end
+if redis.call('EXISTS', KEYS[4]) == 1 then
+    redis.call('RENAME', KEYS[4], KEYS[1])
+else
+    redis.call('DEL', KEYS[1])
+end
+redis.call('DEL', KEYS[2], KEYS[3])
+return redis.call('ZCARD', KEYS[1])
+"""
+# Количество участников в одном вызове скрипта: unpack() в Lua принимает ограниченное число аргументов.
+SCRIPT_CHUNK_SIZE = 1000
+# Время жизни признака пересборки: если пересборка прервалась, изменения перестают записываться.
+REBUILD_TIMEOUT = 60 * 60
+
+
+class RedisTimingWheel:
+    """
+    Расписание напоминаний в отсортированном множестве Redis.
+
+    Участник множества — ID привычки, вес — время следующего напоминания (Unix timestamp).
+    Используется вместо выборки из PostgreSQL, если REMINDER_BACKEND = "redis".
+
+    Атрибуты:
+    client: клиент Redis.
+    key: ключ отсортированного множества.
+    """
+
+    def __init__(self, client=None, key=None):
+        self.client = client or redis.Redis.from_url(settings.TIMING_WHEEL_REDIS_URL)
+        self.key = key or settings.TIMING_WHEEL_KEY
+        self.rebuild_key = f"{self.key}:rebuild"
+        self.rebuilding_key = f"{self.key}:rebuilding"
+        self.dirty_key = f"{self.key}:dirty"
+        self.pop_due_script = self.client.register_script(POP_DUE_SCRIPT)
+        self.schedule_script = self.client.register_script(SCHEDULE_SCRIPT)
+        self.remove_script = self.client.register_script(REMOVE_SCRIPT)
+        self.rebuild_swap_script = self.client.register_script(REBUILD_SWAP_SCRIPT)
+
+    @property
+    def write_keys(self):
+        """
+        Ключи скриптов, изменяющих расписание: расписание, признак пересборки и измененные во время нее привычки.
+        """
+
+        return [self.key, self.rebuilding_key, self.dirty_key]
+
+    def schedule(self, schedule):
+        """
+        Добавляет или переносит напоминания.
+
+        Параметры:
+        schedule (dict): ID привычки -> время следующего напоминания.
+        """
+
+        items = list(schedule.items())
+        for start in range(0, len(items), SCRIPT_CHUNK_SIZE):
+            args = []
+            for habit_id, fire_at in items[start:start + SCRIPT_CHUNK_SIZE]:
+                args += [fire_at.timestamp(), habit_id]
+            self.schedule_script(keys=self.write_keys, args=args)
+
+    def remove(self, habit_ids):
+        """
+        Удаляет напоминания привычек из расписания.
+        """
+
+        habit_ids = list(habit_ids)
+        for start in range(0, len(habit_ids), SCRIPT_CHUNK_SIZE):
+            self.remove_script(keys=self.write_keys, args=habit_ids[start:start + SCRIPT_CHUNK_SIZE])
+
+    def sync(self, schedule):
+        """
+        Приводит расписание привычек в соответствие с их next_fire_at: запланированные добавляются,
+        снятые с расписания (next_fire_at is None) удаляются.
+
+        Параметры:
+        schedule (dict): ID привычки -> next_fire_at или None.
+        """
+
+        self.schedule({habit_id: fire_at for habit_id, fire_at in schedule.items() if fire_at is not None})
+        self.remove([habit_id for habit_id, fire_at in schedule.items() if fire_at is None])
+
+    def pop_due(self, until, limit):
+        """
+        Атомарно забирает из расписания напоминания со временем не позже until.
+
+        Одновременные вызовы из разных воркеров получают непересекающиеся наборы привычек.
+
+        Параметры:
+        until (datetime): верхняя граница времени напоминания.
+        limit (int): максимальное количество привычек.
+
+        Возврат:
+        - list[int]: ID привычек.
+        """
+
+        members = self.pop_due_script(keys=self.write_keys, args=[until.timestamp(), limit])
+        return [int(member) for member in members]
+
+    def rebuild(self, rows, chunk_size=10000):
+        """
+        Полностью пересобирает расписание из переданных строк.
+
+        Новое множество собирается во временном ключе. Пока оно собирается, schedule(), remove() и pop_due()
+        запоминают ID измененных привычек; перед подменой расписания их текущие веса переносятся в новое множество,
+        поэтому привычки, созданные или измененные во время пересборки, не теряются. Перенос и подмена через RENAME
+        выполняются одним скриптом.
+
+        Параметры:
+        rows (iterable): пары (ID привычки, время следующего напоминания). Читаются после начала пересборки.
+        chunk_size (int): количество участников в одной команде ZADD.
+
+        Возврат:
+        - int: количество привычек в расписании.
+        """
+
+        self.client.delete(self.rebuild_key, self.dirty_key)
+        self.client.set(self.rebuilding_key, 1, ex=REBUILD_TIMEOUT)
+        chunk = {}
+        for habit_id, fire_at in rows:
+            chunk[habit_id] = fire_at.timestamp()
+            if len(chunk) >= chunk_size:
+                self.client.zadd(self.rebuild_key, chunk)
+                self.client.expire(self.rebuilding_key, REBUILD_TIMEOUT)
+                chunk = {}
+        if chunk:
+            self.client.zadd(self.rebuild_key, chunk)
+        return self.rebuild_swap_script(keys=[*self.write_keys, self.rebuild_key])
+
+    def __len__(self):
+        return self.client.zcard(self.key)
+
+
+_wheel = None
+
+
+def get_timing_wheel():
+    """
+    Возвращает общий для процесса экземпляр RedisTimingWheel.
+    """
+
+    global _wheel
+    if _wheel is None:
+        _wheel = RedisTimingWheel()
+    return _wheel
+
+
+def is_enabled():
+    """
+    Возвращает True, если расписание напоминаний хранится в Redis.
+    """
+
+    return settings.REMINDER_BACKEND == "redis"
@@ -1,7 +1,9 @@
 from django.urls import path
 from habits.apps import HabitsConfig
 from habits.views import (HabitsListAPIView, HabitsCreateAPIView, HabitsPublishedListAPIView, HabitsRetrieveAPIView,
-                          HabitsUpdateAPIView, HabitsDestroyAPIView)
+                          HabitsUpdateAPIView, HabitsDestroyAPIView, HabitsBulkAPIView, HabitsExportAPIView,
+                          HabitsImportAPIView, HabitCompletionsAPIView, HabitCompletionsBulkAPIView,
+                          HabitStatsAPIView, HabitsStatsSummaryAPIView)
 
 app_name = HabitsConfig.name
 
@@ -14,10 +16,24 @@ urlpatterns = [
     ),
     path("create/",
          HabitsCreateAPIView.as_view(), name="create"),
+    path("habits/bulk/",
+         HabitsBulkAPIView.as_view(), name="habits_bulk"),
+    path("habits/export/",
+         HabitsExportAPIView.as_view(), name="habits_export"),
+    path("habits/import/",
+         HabitsImportAPIView.as_view(), name="habits_import"),
+    path("habits/completions/bulk/",
+         HabitCompletionsBulkAPIView.as_view(), name="habit_completions_bulk"),
+    path("habits/stats/",
+         HabitsStatsSummaryAPIView.as_view(), name="habits_stats"),
     path("<int:pk>/",
          HabitsRetrieveAPIView.as_view(), name="habit_retrieve"),
     path("<int:pk>/update/",
          HabitsUpdateAPIView.as_view(), name="habit_update"),
+    path("<int:pk>/complete/",
+         HabitCompletionsAPIView.as_view(), name="habit_complete"),
+    path("<int:pk>/stats/",
+         HabitStatsAPIView.as_view(), name="habit_stats"),
     path("<int:pk>/delete/",
          HabitsDestroyAPIView.as_view(), name="habit_delete"),
 ]
@@ -1,6 +1,12 @@
+from contextlib import contextmanager
 from datetime import timedelta
 
+from django.db import IntegrityError, transaction
+from django.utils import timezone
 from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
+
+from habits.partitions import get_retention_start
 
 
 class RelatedHabitValidator:
@@ -13,14 +19,16 @@ class RelatedHabitValidator:
     reward: str
     """
 
+    message = ("В модели не должно быть заполнено одновременно и поле вознаграждения, "
+               "и поле связанной привычки. Можно заполнить только одно из двух полей.")
+
     def __init__(self, related_habit, reward):
         self.related_habit = related_habit
         self.reward = reward
 
     def __call__(self, habit):
         if habit.get(self.related_habit) and habit.get(self.reward):
-            raise ValidationError("В модели не должно быть заполнено одновременно и поле вознаграждения, "
-                                  "и поле связанной привычки. Можно заполнить только одно из двух полей.")
+            raise ValidationError(self.message)
 
 
 class DurationValidator:
@@ -32,19 +40,23 @@ class DurationValidator:
     duration: str
     """
 
+    max_duration = timedelta(seconds=120)
+    message = f"Время выполнения должно быть не больше {max_duration}."
+
     def __init__(self, duration):
         self.duration = duration
 
     def __call__(self, habit):
-        max_duration = timedelta(seconds=120)
         if (habit.get(self.duration)
-                and habit.get(self.duration) > max_duration):
-            raise ValidationError(f"Время выполнения должно быть не больше {max_duration}.")
+                and habit.get(self.duration) > self.max_duration):
+            raise ValidationError(self.message)
 
 
 class PleasantHabitValidator:
     """
-    Класс для проверки того, приятна ли привычка по определенному признаку.
+    Класс для проверки того, что связанная привычка приятная (по признаку приятной привычки).
+
+    Связанная привычка, переданная только как ID (сохраненная связь при пакетном изменении), не проверяется.
 
    Атрибуты
    ----------
@@ -52,14 +64,17 @@ class PleasantHabitValidator:
    pleasant_habit_sign : str
     """
 
+    message = "В связанные привычки могут попадать только привычки с признаком приятной привычки."
+    owner_message = "Связанная привычка должна принадлежать тому же пользователю."
+
     def __init__(self, related_habit, pleasant_habit_sign):
         self.related_habit = related_habit
         self.pleasant_habit_sign = pleasant_habit_sign
 
     def __call__(self, habit):
-        if (habit.get(self.related_habit)
-                and not habit.get(self.pleasant_habit_sign)):
-            raise ValidationError("В связанные привычки могут попадать только привычки с признаком приятной привычки.")
+        related_habit = habit.get(self.related_habit)
+        if related_habit and not getattr(related_habit, self.pleasant_habit_sign, True):
+            raise ValidationError(self.message)
 
 
 class PeriodicityValidator:
@@ -71,12 +86,18 @@ class PeriodicityValidator:
     periodicity: str
     """
 
+    message = "Нельзя выполнять привычку реже, чем 1 раз в 7 дней."
+    min_message = "Периодичность должна быть не меньше 1."
+
     def __init__(self, periodicity):
         self.periodicity = periodicity
 
     def __call__(self, habit):
-        if habit.get(self.periodicity) and habit.get(self.periodicity) > 7:
-            raise ValidationError("Нельзя выполнять привычку реже, чем 1 раз в 7 дней.")
+        periodicity = habit.get(self.periodicity)
+        if periodicity is not None and periodicity < 1:
+            raise ValidationError(self.min_message)
+        if periodicity and periodicity > 7:
+            raise ValidationError(self.message)
 
 
 class RewardValidator:
@@ -90,6 +111,8 @@ class RewardValidator:
     pleasant_habit_sign: str
     """
 
+    message = "У приятной привычки не может быть вознаграждения или связанной привычки."
+
     def __init__(self, reward, related_habit, pleasant_habit_sign):
         self.reward = reward
         self.related_habit = related_habit
@@ -99,4 +122,54 @@ class RewardValidator:
         if habit.get(self.pleasant_habit_sign) and (
                 habit.get(self.reward) or habit.get(self.related_habit)
         ):
-            raise ValidationError("У приятной привычки не может быть вознаграждения или связанной привычки.")
+            raise ValidationError(self.message)
+
+
+class CompletionTimeValidator:
+    """
+    Класс для проверки времени выполнения привычки: не в будущем и не раньше самого старого хранимого месяца
+    (COMPLETION_RETENTION_MONTHS).
+    """
+
+    future_message = "Время выполнения не может быть в будущем."
+    retention_message = "Отметки о выполнении хранятся с {}."
+    partition_message = "Отметки о выполнении за {:%Y-%m} не принимаются."
+
+    def __call__(self, value):
+        now = timezone.now()
+        if value > now:
+            raise ValidationError(self.future_message)
+        retention_start = get_retention_start(now)
+        if retention_start is not None and value < retention_start:
+            raise ValidationError(self.retention_message.format(retention_start.date()))
+
+
+# Сообщения валидаторов для ограничений и триггеров таблицы привычек в базе данных.
+CONSTRAINT_MESSAGES = {
+    "habit_duration_max": DurationValidator.message,
+    "habit_periodicity_min": PeriodicityValidator.min_message,
+    "habit_periodicity_max": PeriodicityValidator.message,
+    "habit_reward_xor_related": RelatedHabitValidator.message,
+    "habit_pleasant_without_reward": RewardValidator.message,
+    "habit_related_pleasant": PleasantHabitValidator.message,
+    "habit_related_same_owner": PleasantHabitValidator.owner_message,
+}
+
+
+@contextmanager
+def constraint_validation():
+    """
+    Выполняет запись в точке сохранения и превращает нарушение ограничения привычек в базе данных
+    в ValidationError с сообщением соответствующего валидатора.
+
+    Позволяет пакетным операциям записывать привычки одним запросом, полагаясь на проверку в базе данных.
+    """
+
+    try:
+        with transaction.atomic():
+            yield
+    except IntegrityError as exc:
+        constraint = getattr(getattr(exc.__cause__, "diag", None), "constraint_name", None)
+        if constraint not in CONSTRAINT_MESSAGES:
+            raise
+        raise ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [CONSTRAINT_MESSAGES[constraint]]}) from exc
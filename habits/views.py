@@ -1,12 +1,71 @@
-from rest_framework.generics import ListAPIView, CreateAPIView, RetrieveAPIView, UpdateAPIView, DestroyAPIView
-from rest_framework.permissions import IsAuthenticated
-from habits.models import Habit
-from habits.paginators import HabitPagination
-from habits.serializers import HabitSerializer
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from rest_framework.generics import (ListAPIView, ListCreateAPIView, CreateAPIView, RetrieveAPIView, UpdateAPIView,
+                                     DestroyAPIView)
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework import status
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.parsers import MultiPartParser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from habits import bulk, completions, conditional, export, feed_cache, importer, stats
+from habits.models import Habit, HabitCompletion
+from habits.paginators import CompletionPagination, HabitPagination
+from habits.serializers import (CompletionRangeSerializer, HabitCompletionSerializer, HabitSerializer,
+                                ValuesSerializer)
 from users.permissions import IsOwner
+from users.renderers import CSVRenderer, NDJSONRenderer
 
 
-class HabitsListAPIView(ListAPIView):
+class ValuesListMixin:
+    """
+    Примесь для списков привычек: страница выбирается через QuerySet.values() и сериализуется
+    ValuesSerializer, построенным один раз по serializer_class представления.
+    """
+
+    _values_serializers = {}
+
+    def get_values_serializer(self):
+        """
+        Возвращает общий для процесса ValuesSerializer для serializer_class представления.
+        """
+
+        serializer_class = self.get_serializer_class()
+        if serializer_class not in self._values_serializers:
+            self._values_serializers[serializer_class] = ValuesSerializer(serializer_class)
+        return self._values_serializers[serializer_class]
+
+    def list(self, request, *args, **kwargs):
+        """
+        Возвращает страницу списка, сериализованную из строк values() без создания экземпляров модели.
+        """
+
+        values_serializer = self.get_values_serializer()
+        queryset = self.filter_queryset(self.get_queryset()).values(*values_serializer.value_fields)
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(values_serializer.to_representation(queryset))
+        return self.get_paginated_response(values_serializer.to_representation(page))
+
+
+class OwnerQuerysetMixin:
+    """
+    Примесь для представлений одной привычки: привычка ищется только среди привычек текущего пользователя.
+
+    Поиск по pk и owner_id выполняется одним запросом по индексу (owner_id, id); чужая привычка не находится (404),
+    поэтому ее владелец никогда не загружается.
+    """
+
+    def get_queryset(self):
+        """
+        Возвращает привычки аутентифицированного пользователя.
+        """
+
+        return super().get_queryset().filter(owner_id=self.request.user.id)
+
+
+class HabitsListAPIView(ValuesListMixin, ListAPIView):
     """
     Представление списка привычек, принадлежащих аутентифицированному пользователю.
 
@@ -28,8 +87,22 @@ class HabitsListAPIView(ListAPIView):
         user = self.request.user
         return Habit.objects.filter(owner=user)
 
+    def list(self, request, *args, **kwargs):
+        """
+        Возвращает список привычек с заголовком ETag.
+
+        Если список не изменился с версии клиента (If-None-Match), возвращается 304 без выборки
+        и сериализации привычек. If-Modified-Since для списка не учитывается.
+        """
+
+        etag = conditional.get_list_validators(request, self.filter_queryset(self.get_queryset()))
+        not_modified = conditional.evaluate_preconditions(request, etag, None)
+        if not_modified is not None:
+            return not_modified
+        return conditional.set_validators(super().list(request, *args, **kwargs), etag, None)
+
 
-class HabitsPublishedListAPIView(ListAPIView):
+class HabitsPublishedListAPIView(ValuesListMixin, ListAPIView):
     """
     Представление списка опубликованных привычек.
 
@@ -51,6 +124,19 @@ class HabitsPublishedListAPIView(ListAPIView):
 
         return Habit.objects.filter(is_published=True)
 
+    def list(self, request, *args, **kwargs):
+        """
+        Возвращает страницу ленты из кэша, а при промахе строит ее и кэширует.
+
+        Ключ страницы включает версию кэша, которую увеличивает изменение любой опубликованной привычки.
+        Заголовок X-Cache показывает, был ли ответ взят из кэша (HIT) или построен заново (MISS).
+        """
+
+        data, hit = feed_cache.get_or_build(
+            request.build_absolute_uri(), lambda: super(HabitsPublishedListAPIView, self).list(request).data,
+        )
+        return Response(data, headers={"X-Cache": "HIT" if hit else "MISS"})
+
 
 class HabitsCreateAPIView(CreateAPIView):
     """
@@ -66,7 +152,7 @@ class HabitsCreateAPIView(CreateAPIView):
 
     def perform_create(self, serializer):
         """
-        Выполняет создание новой привычки.
+        Выполняет создание новой привычки, владельцем которой становится текущий пользователь.
 
         Параметры:
         - serializer (HabitSerializer): экземпляр сериализатора, содержащий проверенные данные о привычках.
@@ -74,18 +160,17 @@ class HabitsCreateAPIView(CreateAPIView):
         Возврат: None
         """
 
-        habit = serializer.save()
-        habit.owner = self.request.user
-        habit.save()
+        serializer.save(owner=self.request.user)
 
 
-class HabitsRetrieveAPIView(RetrieveAPIView):
+class HabitsRetrieveAPIView(OwnerQuerysetMixin, RetrieveAPIView):
     """
      Представление для получения подробной информации о конкретной привычке.
 
     Атрибуты:
     - serializer_class: Класс сериализатора, используемый для сериализации данных о привычках.
-    - queryset: Набор объектов привычек, из которого выбирается конкретная привычка.
+    - queryset: Набор объектов привычек, из которого выбирается конкретная привычка,
+      ограниченный привычками текущего пользователя.
     - permission_classes: Классы разрешений, необходимые для доступа к этому представлению.
     """
 
@@ -93,13 +178,26 @@ class HabitsRetrieveAPIView(RetrieveAPIView):
     queryset = Habit.objects.all()
     permission_classes = [IsAuthenticated, IsOwner]
 
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Возвращает привычку с заголовками ETag и Last-Modified или 304, если версия клиента актуальна.
+        """
 
-class HabitsUpdateAPIView(UpdateAPIView):
+        instance = self.get_object()
+        etag, last_modified = conditional.get_object_validators(instance)
+        not_modified = conditional.evaluate_preconditions(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+        return conditional.set_validators(Response(self.get_serializer(instance).data), etag, last_modified)
+
+
+class HabitsUpdateAPIView(OwnerQuerysetMixin, UpdateAPIView):
     """
     Представление для обновления информации о конкретной привычке.
 
     Атрибуты:
-    - queryset: Набор объектов привычек, из которого выбирается конкретная привычка для обновления.
+    - queryset: Набор объектов привычек, из которого выбирается конкретная привычка для обновления,
+      ограниченный привычками текущего пользователя.
     - serializer_class: Класс сериализатора, используемый для сериализации и десериализации данных о привычках.
     - permission_classes: Классы разрешений, необходимые для доступа к этому представлению.
     """
@@ -108,17 +206,249 @@ class HabitsUpdateAPIView(UpdateAPIView):
     serializer_class = HabitSerializer
     permission_classes = [IsAuthenticated, IsOwner]
 
+    def get_queryset(self):
+        """
+        Возвращает привычки с блокировкой строки до конца транзакции обновления.
+        Владелец загружается тем же запросом: он нужен для пересчета времени следующего напоминания.
+        """
+
+        return super().get_queryset().select_related("owner").select_for_update(of=("self",))
+
+    def update(self, request, *args, **kwargs):
+        """
+        Обновляет привычку с оптимистической блокировкой.
+
+        Если клиент передал If-Match (или If-Unmodified-Since) и привычка с тех пор изменилась,
+        возвращается 412. Проверка и сохранение выполняются в одной транзакции под блокировкой строки.
+        """
 
-class HabitsDestroyAPIView(DestroyAPIView):
+        partial = kwargs.pop("partial", False)
+        with transaction.atomic():
+            instance = self.get_object()
+            precondition_failed = conditional.evaluate_preconditions(
+                request, *conditional.get_object_validators(instance),
+            )
+            if precondition_failed is not None:
+                return precondition_failed
+            serializer = self.get_serializer(instance, data=request.data, partial=partial)
+            serializer.is_valid(raise_exception=True)
+            self.perform_update(serializer)
+        return conditional.set_validators(Response(serializer.data), *conditional.get_object_validators(instance))
+
+
+class HabitsDestroyAPIView(OwnerQuerysetMixin, DestroyAPIView):
     """
     Представление для удаления конкретной привычки.
 
     Атрибуты:
     - serializer_class: Класс сериализатора, используемый для сериализации и десериализации данных о привычках.
-    - queryset: Набор объектов привычек, из которого выбирается конкретная привычка для удаления.
+    - queryset: Набор объектов привычек, из которого выбирается конкретная привычка для удаления,
+      ограниченный привычками текущего пользователя.
     - permission_classes: Классы разрешений, необходимые для доступа к этому представлению.
     """
 
     serializer_class = HabitSerializer
-    queryset = Habit.objects.all()
+    queryset = Habit.objects.only("id", "owner_id", "is_published")
     permission_classes = [IsAuthenticated, IsOwner]
+
+
+class HabitsBulkAPIView(APIView):
+    """
+    Представление для пакетного создания (POST), изменения (PATCH) и удаления (DELETE) привычек пользователя.
+
+    Тело запроса — список: данных привычек для POST, изменений с id привычки для PATCH, ID привычек для DELETE.
+    Весь пакет проверяется целиком и записывается одним запросом в одной транзакции; если хотя бы один элемент
+    некорректен, ничего не записывается, а ответ 400 содержит список ошибок по элементам в порядке пакета.
+
+    Атрибуты:
+    - permission_classes: Классы разрешений, необходимые для доступа к этому представлению.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        """
+        Создает пакет привычек текущего пользователя.
+        """
+
+        habits = bulk.bulk_create_habits(request.user, request.data)
+        return Response(HabitSerializer(habits, many=True).data, status=status.HTTP_201_CREATED)
+
+    def patch(self, request):
+        """
+        Частично обновляет пакет привычек текущего пользователя.
+        """
+
+        habits = bulk.bulk_update_habits(request.user, request.data)
+        return Response(HabitSerializer(habits, many=True).data)
+
+    def delete(self, request):
+        """
+        Удаляет пакет привычек текущего пользователя.
+        """
+
+        return Response({"deleted": bulk.bulk_delete_habits(request.user, request.data)})
+
+
+class HabitsExportAPIView(APIView):
+    """
+    Представление для выгрузки всех привычек текущего пользователя одним потоковым ответом в формате NDJSON
+    (по умолчанию) или CSV (Accept: text/csv или ?format=csv).
+
+    С параметром ?scope=published администратор выгружает все опубликованные привычки.
+    Строки читаются серверным курсором и отправляются клиенту по мере выборки.
+
+    Атрибуты:
+    - permission_classes: Классы разрешений, необходимые для доступа к этому представлению.
+    - renderer_classes: поддерживаемые форматы выгрузки.
+    """
+
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [NDJSONRenderer, CSVRenderer]
+
+    def get(self, request):
+        """
+        Возвращает потоковую выгрузку привычек.
+        """
+
+        published = request.query_params.get("scope") == "published"
+        if published and not request.user.is_staff:
+            raise PermissionDenied("Выгрузка опубликованных привычек доступна только администраторам.")
+        queryset = export.get_export_queryset(owner_id=None if published else request.user.id, published=published)
+        export_format = request.accepted_renderer.format
+        response = StreamingHttpResponse(
+            export.export_habits(queryset, export_format), content_type=request.accepted_renderer.media_type,
+        )
+        response["Content-Disposition"] = f'attachment; filename="habits.{export_format}"'
+        return response
+
+
+class HabitsImportAPIView(APIView):
+    """
+    Представление для импорта привычек администратором из файла CSV или NDJSON (поле file формы multipart).
+
+    Формат берется из поля format или расширения файла. Владелец каждой привычки указывается почтой в колонке owner.
+    Файл загружается пакетами через COPY (habits.importer); ответ содержит количество загруженных
+    и отклоненных строк, строк в секунду и ошибки отклоненных строк.
+
+    Атрибуты:
+    - permission_classes: Классы разрешений, необходимые для доступа к этому представлению.
+    - parser_classes: поддерживаемые форматы тела запроса.
+    """
+
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        """
+        Импортирует привычки из загруженного файла.
+        """
+
+        upload = request.FILES.get("file")
+        if upload is None:
+            raise ValidationError({"file": ["Загрузите файл."]})
+        import_format = request.data.get("format") or upload.name.rsplit(".", 1)[-1].lower()
+        if import_format not in importer.IMPORT_FORMATS:
+            raise ValidationError({"format": [f"Поддерживаются форматы: {', '.join(importer.IMPORT_FORMATS)}."]})
+        return Response(importer.import_habits(upload.file, import_format))
+
+
+class HabitCompletionsAPIView(ListCreateAPIView):
+    """
+    Представление для отметок о выполнении привычки текущего пользователя.
+
+    POST отмечает выполнение (по умолчанию — сейчас), GET возвращает отметки за полуинтервал [since, until)
+    (по умолчанию — последние 30 дней) страницами от новых к старым. Выборка за период затрагивает только
+    секции нужных месяцев и индекс (habit_id, completed_at), поэтому ее стоимость не растет с историей.
+
+    Атрибуты:
+    - serializer_class: Класс сериализатора, используемый для сериализации данных.
+    - pagination_class: Класс нумерации страниц.
+    - permission_classes: Классы разрешений, необходимые для доступа к этому представлению.
+    """
+
+    serializer_class = HabitCompletionSerializer
+    pagination_class = CompletionPagination
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        """
+        Возвращает отметки привычки текущего пользователя за запрошенный период.
+        """
+
+        period = CompletionRangeSerializer(data=self.request.query_params)
+        period.is_valid(raise_exception=True)
+        return HabitCompletion.objects.filter(
+            habit_id=self.kwargs["pk"], owner_id=self.request.user.id,
+            completed_at__gte=period.validated_data["since"], completed_at__lt=period.validated_data["until"],
+        )
+
+    def perform_create(self, serializer):
+        serializer.instance = completions.complete_habit(self.request.user, self.kwargs["pk"],
+                                                         serializer.validated_data)
+
+
+class HabitCompletionsBulkAPIView(APIView):
+    """
+    Представление для пакетной записи отметок о выполнении привычек текущего пользователя.
+
+    Тело запроса — список отметок: ID привычки (habit) и необязательное время выполнения (completed_at).
+    Пакет проверяется целиком и записывается одним INSERT; если хотя бы один элемент некорректен,
+    ничего не записывается, а ответ 400 содержит список ошибок по элементам в порядке пакета.
+
+    Атрибуты:
+    - permission_classes: Классы разрешений, необходимые для доступа к этому представлению.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        """
+        Записывает пакет отметок.
+        """
+
+        created = completions.bulk_complete_habits(request.user, request.data)
+        return Response(HabitCompletionSerializer(created, many=True).data, status=status.HTTP_201_CREATED)
+
+
+class HabitStatsAPIView(APIView):
+    """
+    Представление для статистики привычки текущего пользователя: текущая и самая длинная серии,
+    всего выполнений, выполнения за 7 и 30 дней.
+
+    Статистика читается одним запросом из строки HabitStats, которая обновляется при записи отметок,
+    а не рассчитывается по истории.
+
+    Атрибуты:
+    - permission_classes: Классы разрешений, необходимые для доступа к этому представлению.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        """
+        Возвращает статистику привычки.
+        """
+
+        habit = get_object_or_404(Habit.objects.select_related("stats").only("id", "periodicity", "stats"),
+                                  pk=pk, owner_id=request.user.id)
+        habit_stats = getattr(habit, "stats", None)
+        return Response({"habit": habit.pk, **stats.get_stats_data(habit_stats, habit.periodicity)})
+
+
+class HabitsStatsSummaryAPIView(APIView):
+    """
+    Представление для сводной статистики всех привычек текущего пользователя.
+
+    Атрибуты:
+    - permission_classes: Классы разрешений, необходимые для доступа к этому представлению.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """
+        Возвращает сводную статистику привычек.
+        """
+
+        return Response(stats.get_summary(request.user.id))
@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from config import settings
+from users.models import User
+
+# Поля пользователя, которые хранятся в кэше, в порядке объявления в модели (этого требует Model.from_db).
+# Остальные поля загружаются из базы данных при первом обращении.
+CACHED_FIELDS = ("id", "is_superuser", "is_staff", "is_active", "email", "tg_chat_id", "reminder_digest")
+
+
+class LocalUserCache:
+    """
+    Небольшой LRU-кэш пользователей в памяти процесса с ограниченным временем жизни записей.
+
+    Атрибуты:
+    max_size: максимальное количество записей.
+    timeout: время жизни записи в секундах.
+    """
+
+    def __init__(self, max_size, timeout):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, user_id):
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, values = entry
+            if expires_at < time.monotonic():
+                del self.entries[user_id]
+                return None
+            self.entries.move_to_end(user_id)
+            return values
+
+    def set(self, user_id, values):
+        with self.lock:
+            self.entries[user_id] = (time.monotonic() + self.timeout, values)
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def delete(self, user_id):
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+local_cache = LocalUserCache(settings.AUTH_USER_LOCAL_CACHE_SIZE, settings.AUTH_USER_LOCAL_CACHE_TIMEOUT)
+
+
+def get_cache_key(user_id):
+    return f"users:auth:{user_id}"
+
+
+def invalidate_user(user_id):
+    """
+    Удаляет пользователя из кэша процесса и общего кэша.
+
+    Записи в кэшах других процессов истекают через AUTH_USER_LOCAL_CACHE_TIMEOUT.
+    """
+
+    local_cache.delete(str(user_id))
+    cache.delete(get_cache_key(user_id))
+
+
+def get_cached_user_values(user_id):
+    """
+    Возвращает значения CACHED_FIELDS пользователя из кэша процесса, общего кэша или базы данных.
+
+    Параметры:
+    user_id (str): ID пользователя из токена.
+
+    Возврат:
+    - tuple: значения полей или None, если пользователя нет.
+    """
+
+    user_id = str(user_id)
+    values = local_cache.get(user_id)
+    if values is None:
+        values = cache.get(get_cache_key(user_id))
+        if values is None:
+            values = User.objects.filter(pk=user_id).values_list(*CACHED_FIELDS).first()
+            if values is None:
+                return None
+            cache.set(get_cache_key(user_id), values, timeout=settings.AUTH_USER_CACHE_TIMEOUT)
+        local_cache.set(user_id, values)
+    return values
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    Аутентификация по JWT без запроса пользователя к базе данных на каждый запрос.
+
+    Пользователь собирается из полей CACHED_FIELDS, которые берутся из LRU-кэша процесса
+    (AUTH_USER_LOCAL_CACHE_TIMEOUT), общего кэша Django (Redis, AUTH_USER_CACHE_TIMEOUT) или,
+    при промахе, одним запросом к базе данных. Остальные поля пользователя отложены и загружаются
+    из базы данных при первом обращении, а save() такого пользователя записывает только загруженные поля.
+    Записи удаляются из кэша при сохранении и удалении пользователя.
+
+    Если AUTH_USER_CACHE = False или включена проверка отзыва токена по паролю, используется
+    обычная загрузка пользователя из базы данных.
+    """
+
+    def get_user(self, validated_token):
+        if not settings.AUTH_USER_CACHE or api_settings.CHECK_REVOKE_TOKEN:
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        values = get_cached_user_values(user_id)
+        if values is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        user = User.from_db(None, CACHED_FIELDS, values)
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
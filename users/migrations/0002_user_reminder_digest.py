@@ -0,0 +1,22 @@
+# Generated by Django 4.2 on 2026-10-18 07:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="reminder_digest",
+            field=models.BooleanField(
+                default=False,
+                help_text="Присылать все напоминания за минуту одним сообщением",
+                verbose_name="Сводка напоминаний",
+            ),
+        ),
+    ]
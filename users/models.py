@@ -23,6 +23,11 @@ class User(AbstractUser):
         verbose_name="город", **NULLABLE, help_text="Введите страну"
     )
     tg_chat_id = models.CharField(max_length=50, verbose_name='ID телеграмм чата')
+    reminder_digest = models.BooleanField(
+        default=False,
+        verbose_name="Сводка напоминаний",
+        help_text="Присылать все напоминания за минуту одним сообщением"
+    )
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []
 
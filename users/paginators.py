@@ -0,0 +1,18 @@
+from rest_framework.pagination import CursorPagination
+
+
+class UserPagination(CursorPagination):
+    """
+    Нумерация страниц списка пользователей по ключу (WHERE id > курсор ORDER BY id LIMIT n) без COUNT(*) и OFFSET.
+
+    Атрибуты:
+    page_size: количество пользователей на странице. По умолчанию — 50.
+    page_size_query_param: параметр запроса, используемый для указания размера страницы.
+    max_page_size: максимальное количество пользователей на странице.
+    ordering: поле, по которому упорядочиваются пользователи и строится курсор.
+    """
+
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+    ordering = "id"
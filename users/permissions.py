@@ -6,7 +6,7 @@ class IsOwner(permissions.BasePermission):
     Класс разрешений, проверяющий, является ли пользователь владельцем объекта.
 
     Этот класс наследуется от Permissions.BasePermission и переопределяет метод has_object_permission.
-    Он проверяет, соответствует ли атрибут владельца объекта атрибуту пользователя запроса.
+    Он проверяет, соответствует ли ID владельца объекта ID пользователя запроса, не загружая владельца из базы данных.
     Если они совпадают, метод возвращает True, указывая, что у пользователя есть разрешение на доступ к объекту.
     В противном случае возвращается «False».
     """
@@ -23,6 +23,6 @@ class IsOwner(permissions.BasePermission):
         Возврат:
         - bool: `True`, если пользователь является владельцем объекта, `False` в противном случае.
         """
-        if obj.owner == request.user:
+        if obj.owner_id == request.user.id:
             return True
         return False
@@ -0,0 +1,91 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Рендерер формата NDJSON: один JSON-объект на строку.
+
+    Выбирается заголовком Accept: application/x-ndjson или параметром ?format=ndjson.
+    Представление, поддерживающее потоковую выдачу, проверяет request.accepted_renderer.format
+    и возвращает StreamingHttpResponse со строками из render_rows().
+    Обычные ответы (например, ошибки) выводятся одной строкой.
+    """
+
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        rows = data if isinstance(data, list) else [data]
+        return b"".join(self.render_rows(rows))
+
+    @staticmethod
+    def render_rows(rows):
+        """
+        Преобразует строки в строки NDJSON по одной, не собирая ответ в памяти.
+
+        Параметры:
+        rows (iterable): словари для вывода.
+
+        Возврат:
+        - generator[bytes]: строки NDJSON.
+        """
+
+        for row in rows:
+            yield json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False).encode() + b"\n"
+
+
+class Echo:
+    """
+    Псевдобуфер для csv.writer: write() возвращает строку вместо записи, чтобы выводить CSV построчно.
+    """
+
+    def write(self, value):
+        return value
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    Рендерер формата CSV: строка заголовка, затем по строке на запись.
+
+    Выбирается заголовком Accept: text/csv или параметром ?format=csv.
+    Для потоковой выдачи представление использует render_rows().
+    """
+
+    media_type = "text/csv"
+    format = "csv"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        rows = data if isinstance(data, list) else [data]
+        return b"".join(self.render_rows(rows))
+
+    @staticmethod
+    def render_rows(rows, header=None):
+        """
+        Преобразует строки в строки CSV по одной, не собирая ответ в памяти.
+
+        Параметры:
+        rows (iterable): словари для вывода.
+        header (list): колонки. По умолчанию — ключи первой строки.
+
+        Возврат:
+        - generator[bytes]: строки CSV.
+        """
+
+        writer = csv.writer(Echo())
+        if header is not None:
+            yield writer.writerow(header).encode()
+        for row in rows:
+            if header is None:
+                header = list(row)
+                yield writer.writerow(header).encode()
+            yield writer.writerow([row[column] for column in header]).encode()
@@ -19,3 +19,13 @@ class UserSerializer(ModelSerializer):
     class Meta:
         model = User
         fields = "__all__"
+
+
+class UserListSerializer(ModelSerializer):
+    """
+    Сериализатор списка пользователей с явным набором легких полей: без пароля, групп и разрешений.
+    """
+
+    class Meta:
+        model = User
+        fields = ("id", "email", "first_name", "last_name", "phone", "city", "tg_chat_id", "is_active")
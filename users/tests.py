@@ -0,0 +1,196 @@
+import json
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APITransactionTestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from config import settings
+from users.authentication import get_cache_key, local_cache
+from users.models import User
+
+
+class CachedJWTAuthenticationTestCase(APITestCase):
+    """
+    Тесты аутентификации по JWT с кэшем пользователей.
+    """
+
+    def setUp(self):
+        """
+        Создание пользователя и заголовка авторизации с его токеном доступа.
+        """
+
+        cache.clear()
+        local_cache.clear()
+        self.user = User.objects.create(email="auth@mail.com", tg_chat_id="100")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+        self.url = reverse("habits:habits_list")
+
+    def get_user_queries(self):
+        """
+        Выполняет запрос к списку привычек и возвращает количество запросов к таблице пользователей.
+        """
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return sum('"users_user"' in query["sql"] for query in queries)
+
+    def test_cached_user(self):
+        """
+        Тест загрузки пользователя из базы данных только при первом запросе.
+        """
+
+        self.assertEqual(self.get_user_queries(), 1)
+        self.assertEqual(self.get_user_queries(), 0)
+
+        local_cache.clear()
+        self.assertEqual(self.get_user_queries(), 0)
+        self.assertIsNotNone(cache.get(get_cache_key(self.user.pk)))
+
+    def test_invalidate_on_save(self):
+        """
+        Тест удаления пользователя из кэша при сохранении и удалении.
+        """
+
+        self.get_user_queries()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.tg_chat_id = "200"
+            self.user.save()
+        self.assertIsNone(cache.get(get_cache_key(self.user.pk)))
+        self.assertEqual(self.get_user_queries(), 1)
+        self.assertEqual(cache.get(get_cache_key(self.user.pk))[5], "200")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_inactive_user(self):
+        """
+        Тест отказа в аутентификации неактивному пользователю.
+        """
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deferred_fields(self):
+        """
+        Тест сохранения пользователя, собранного из кэша: записываются только загруженные поля.
+        """
+
+        self.user.set_password("secret")
+        self.user.save()
+        response = self.client.get(reverse("users:user_retrieve", args=(self.user.pk,)))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        user = response.wsgi_request.user
+        self.assertIn("password", user.get_deferred_fields())
+        user.save()
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("secret"))
+
+    @mock.patch.object(settings, "AUTH_USER_CACHE", False)
+    def test_cache_disabled(self):
+        """
+        Тест загрузки пользователя из базы данных на каждый запрос при AUTH_USER_CACHE = False.
+        """
+
+        self.assertEqual(self.get_user_queries(), 1)
+        self.assertEqual(self.get_user_queries(), 1)
+
+
+class UserListTestCase(APITestCase):
+    """
+    Тесты списка пользователей.
+    """
+
+    def setUp(self):
+        """
+        Создание пользователей и аутентификация клиента.
+        """
+
+        self.users = User.objects.bulk_create(
+            User(email=f"list-{i}@mail.com", username=f"list-{i}", tg_chat_id=str(i), password="hash")
+            for i in range(7)
+        )
+        self.client.force_authenticate(user=self.users[0])
+        self.url = reverse("users:users_list")
+
+    def test_keyset_pages(self):
+        """
+        Тест постраничного вывода по ключу без пароля и без COUNT(*)/OFFSET.
+        """
+
+        ids = []
+        url = f"{self.url}?page_size=3"
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertFalse(any("OFFSET" in query["sql"] or "COUNT(" in query["sql"] for query in queries))
+            for row in response.data["results"]:
+                self.assertNotIn("password", row)
+                ids.append(row["id"])
+            url = response.data["next"]
+        self.assertEqual(ids, [user.pk for user in self.users])
+
+    def test_permissions(self):
+        """
+        Тест того, что список недоступен анонимному пользователю, а выгрузка NDJSON — не администратору.
+        """
+
+        response = self.client.get(self.url, HTTP_ACCEPT="application/x-ndjson")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=None)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_ndjson_stream(self):
+        """
+        Тест потокового вывода всех пользователей в формате NDJSON администратором.
+        """
+
+        self.users[0].is_staff = True
+        self.users[0].save()
+        response = self.client.get(self.url, HTTP_ACCEPT="application/x-ndjson")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual([row["id"] for row in rows], [user.pk for user in self.users])
+        self.assertEqual(set(rows[0]), {"id", "email", "first_name", "last_name", "phone", "city", "tg_chat_id",
+                                        "is_active"})
+
+        response = self.client.get(f"{self.url}?format=ndjson")
+        self.assertEqual(len(b"".join(response.streaming_content).splitlines()), len(self.users))
+
+
+class UserStreamCursorTestCase(APITransactionTestCase):
+    """
+    Тесты серверного курсора выгрузки пользователей вне транзакции теста (режим autocommit, как в запросе).
+    """
+
+    def test_cursor_is_not_holdable(self):
+        """
+        Тест того, что выгрузка NDJSON читает курсор без WITH HOLD, и строки выдаются до окончания запроса.
+        """
+
+        admin = User.objects.create(email="admin@mail.com", username="admin", is_staff=True)
+        User.objects.bulk_create(User(email=f"stream-{i}@mail.com", username=f"stream-{i}") for i in range(2))
+        self.client.force_authenticate(user=admin)
+        with mock.patch("config.settings.USERS_STREAM_CHUNK_SIZE", 1):
+            response = self.client.get(reverse("users:users_list"), HTTP_ACCEPT="application/x-ndjson")
+            lines = iter(response.streaming_content)
+            next(lines)
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT is_holdable FROM pg_cursors")
+                self.assertEqual(cursor.fetchall(), [(False,)])
+            self.assertEqual(len(list(lines)), 2)
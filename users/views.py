@@ -1,16 +1,52 @@
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from rest_framework.generics import CreateAPIView, ListAPIView, RetrieveAPIView, DestroyAPIView, UpdateAPIView
-from rest_framework.permissions import AllowAny
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.settings import api_settings
+
+from config import settings
 from users.models import User
-from users.serializers import UserSerializer
+from users.paginators import UserPagination
+from users.renderers import NDJSONRenderer
+from users.serializers import UserListSerializer, UserSerializer
 
 
 class UserListAPIView(ListAPIView):
     """
     Этот класс предоставляет конечную точку API для получения списка всех пользователей.
+
+    Список выводится страницами по ключу (UserPagination) и содержит только поля UserListSerializer.
+    С заголовком Accept: application/x-ndjson или параметром ?format=ndjson все пользователи выводятся потоком
+    NDJSON: строки читаются серверным курсором порциями по USERS_STREAM_CHUNK_SIZE, поэтому память
+    не зависит от количества пользователей.
+
+    Список доступен только авторизованным пользователям, потоковая выгрузка — только администраторам.
     """
 
-    queryset = User.objects.all()
-    serializer_class = UserSerializer
+    queryset = User.objects.only(*UserListSerializer.Meta.fields).order_by("id")
+    serializer_class = UserListSerializer
+    pagination_class = UserPagination
+    permission_classes = [IsAuthenticated]
+    renderer_classes = (*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer)
+
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format != NDJSONRenderer.format:
+            return super().list(request, *args, **kwargs)
+        if not request.user.is_staff:
+            raise PermissionDenied("Выгрузка всех пользователей доступна только администраторам.")
+        rows = self.filter_queryset(self.get_queryset()).values(*self.get_serializer_class().Meta.fields)
+        return StreamingHttpResponse(self.stream_rows(rows), content_type=NDJSONRenderer.media_type)
+
+    @staticmethod
+    def stream_rows(rows):
+        """
+        Выводит строки NDJSON, читая их серверным курсором в транзакции: в режиме autocommit Django объявляет
+        курсор WITH HOLD, и PostgreSQL выполняет весь запрос до выдачи первой строки.
+        """
+
+        with transaction.atomic():
+            yield from NDJSONRenderer.render_rows(rows.iterator(chunk_size=settings.USERS_STREAM_CHUNK_SIZE))
 
 
 class UserRetrieveAPIView(RetrieveAPIView):
@@ -18,7 +54,7 @@ class UserRetrieveAPIView(RetrieveAPIView):
     Этот класс предоставляет конечную точку API для получения информации о конкретном пользователе.
     """
 
-    queryset = User.objects.all()
+    queryset = User.objects.prefetch_related("groups", "user_permissions")
     serializer_class = UserSerializer
 
 